@@ -27,6 +27,72 @@ MAPS_API_KEY = config("API_KEY")
 
 DEFAULT_ADDRESS = config("DEFAULT_ADDRESS")
 
+# Distance cache: days a stored Maps API result stays fresh, and the size and
+# lifetime (seconds) of the per-process LRU in front of the table
+DISTANCE_CACHE_TTL = config("DISTANCE_CACHE_TTL", default=90, cast=int)
+DISTANCE_LRU_SIZE = config("DISTANCE_LRU_SIZE", default=256, cast=int)
+DISTANCE_LRU_TTL = config("DISTANCE_LRU_TTL", default=300, cast=int)
+
+# Distance Matrix client: connection pool size, connect/read timeouts
+# (seconds), total time googlemaps may spend retrying one request, and the
+# circuit breaker (consecutive failures before pausing calls, pause seconds)
+MAPS_POOL_SIZE = config("MAPS_POOL_SIZE", default=10, cast=int)
+MAPS_CONNECT_TIMEOUT = config("MAPS_CONNECT_TIMEOUT", default=3.0, cast=float)
+MAPS_READ_TIMEOUT = config("MAPS_READ_TIMEOUT", default=10.0, cast=float)
+MAPS_RETRY_TIMEOUT = config("MAPS_RETRY_TIMEOUT", default=15, cast=int)
+MAPS_BREAKER_THRESHOLD = config("MAPS_BREAKER_THRESHOLD", default=5, cast=int)
+MAPS_BREAKER_COOLDOWN = config("MAPS_BREAKER_COOLDOWN", default=60, cast=int)
+
+# Background mileage lookups: when enabled, game saves that miss the distance
+# cache are queued for `manage.py run_distance_worker` instead of calling the
+# Maps API inline. Failed lookups retry with exponential backoff starting at
+# DISTANCE_TASK_BACKOFF seconds, up to DISTANCE_TASK_MAX_ATTEMPTS tries.
+DISTANCE_LOOKUP_ASYNC = config("DISTANCE_LOOKUP_ASYNC", default=True, cast=bool)
+DISTANCE_TASK_MAX_ATTEMPTS = config("DISTANCE_TASK_MAX_ATTEMPTS", default=5, cast=int)
+DISTANCE_TASK_BACKOFF = config("DISTANCE_TASK_BACKOFF", default=60, cast=int)
+
+# Offline distance estimates: straight-line miles between geocoded addresses
+# are multiplied by this factor to approximate driving distance when the
+# Maps API is unavailable and for instant previews
+DISTANCE_ESTIMATE_FACTOR = config("DISTANCE_ESTIMATE_FACTOR", default=1.25, cast=float)
+
+# Seconds the per-user map of site mileage previews is cached, server-side
+# and (via Cache-Control) by the browser for `site_distance` answers
+DISTANCE_PREVIEW_TTL = config("DISTANCE_PREVIEW_TTL", default=300, cast=int)
+
+# Cache backend: local memory by default. Cached pages are keyed on
+# versions kept in the database (tracker.models.PageVersion), so each
+# process sees every other's changes. Set CACHE_BACKEND to
+# django.core.cache.backends.filebased.FileBasedCache (CACHE_LOCATION a
+# directory) or .db.DatabaseCache (a table from `manage.py createcachetable`)
+# to also share the rendered pages between processes, or to any other
+# Django backend.
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": config("CACHE_LOCATION", default=""),
+    }
+}
+
+# Seconds a user's rendered Game List and Stats data may be served from the
+# cache; saving or deleting their games, leagues or sites retires it sooner
+PAGE_CACHE_TTL = config("PAGE_CACHE_TTL", default=3600, cast=int)
+
+# Share of requests (0 to 1) timed by tracker.middleware.RequestTimingMiddleware:
+# query count and time, template and Maps API time are sent as a
+# Server-Timing header and logged to the "tracker.middleware" logger
+REQUEST_TIMING_SAMPLE_RATE = config(
+    "REQUEST_TIMING_SAMPLE_RATE", default=0.0, cast=float
+)
+
+# Delta sync API: seconds of changes re-sent before a client's token (for
+# transactions that committed after it was issued), and days deleted rows
+# are remembered; clients with older tokens get a full snapshot
+SYNC_TOKEN_OVERLAP = config("SYNC_TOKEN_OVERLAP", default=30, cast=int)
+SYNC_TOMBSTONE_DAYS = config("SYNC_TOMBSTONE_DAYS", default=90, cast=int)
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -46,6 +112,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "tracker.middleware.RequestTimingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -67,7 +134,8 @@ ROOT_URLCONF = "project.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # DjangoTemplates, timing renders for RequestTimingMiddleware
+        "BACKEND": "tracker.timing.TimedDjangoTemplates",
         "DIRS": [BASE_DIR / "tracker" / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -119,6 +187,10 @@ LANGUAGE_CODE = "en-us"
 
 TIME_ZONE = "UTC"
 
+# Zone imported calendar events are dated in, so a game whose start time is
+# exported in UTC or another TZID keeps the day it is played on locally
+IMPORT_TIME_ZONE = config("IMPORT_TIME_ZONE", default=TIME_ZONE)
+
 USE_I18N = True
 
 USE_TZ = True
@@ -1,6 +1,18 @@
 from django.contrib import admin
 
-from .models import Game, League, Profile, Site
+from .models import (
+    DistanceCache,
+    DistancePrefetch,
+    DistanceTask,
+    Game,
+    League,
+    Payment,
+    Profile,
+    Site,
+    StatsRollup,
+    Tombstone,
+    Trip,
+)
 
 
 @admin.register(Profile)
@@ -35,3 +47,43 @@ class SiteAdmin(admin.ModelAdmin):
 class LeagueAdmin(admin.ModelAdmin):
     list_display = ("organization", "assignor", "game_fee")
     search_fields = ("organization", "assignor")
+
+
+@admin.register(DistanceCache)
+class DistanceCacheAdmin(admin.ModelAdmin):
+    list_display = ("origin", "destination", "miles", "fetched_at")
+    search_fields = ("origin", "destination")
+
+
+@admin.register(DistanceTask)
+class DistanceTaskAdmin(admin.ModelAdmin):
+    list_display = ("game", "destination", "attempts", "run_after", "last_error")
+
+
+@admin.register(DistancePrefetch)
+class DistancePrefetchAdmin(admin.ModelAdmin):
+    list_display = ("user", "origin", "recompute_mileage", "attempts", "run_after")
+
+
+@admin.register(StatsRollup)
+class StatsRollupAdmin(admin.ModelAdmin):
+    list_display = ("user", "dimension", "key", "count", "total_fees", "unpaid_fees")
+    list_filter = ("dimension",)
+
+
+@admin.register(Trip)
+class TripAdmin(admin.ModelAdmin):
+    list_display = ("date", "user", "mileage", "mileage_paid", "game_count")
+    list_filter = ("mileage_paid", "route_pending")
+
+
+@admin.register(Payment)
+class PaymentAdmin(admin.ModelAdmin):
+    list_display = ("date", "user", "amount", "league", "assignor", "reconciled_at")
+    search_fields = ("assignor", "league__organization")
+
+
+@admin.register(Tombstone)
+class TombstoneAdmin(admin.ModelAdmin):
+    list_display = ("model", "object_id", "user_id", "deleted_at")
+    list_filter = ("model",)
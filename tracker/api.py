@@ -0,0 +1,107 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date
+
+from django.db.models import Count, Max, Q
+
+from tracker.filters import GameFilters
+from tracker.models import Game
+
+# Public field name -> the Game column or lookup it reads; only requested
+# fields are selected, so league and site are joined only when asked for
+GAME_FIELDS = {
+    "id": "id",
+    "date": "date",
+    "site": "site__name",
+    "site_id": "site_id",
+    "league": "league__organization",
+    "league_id": "league_id",
+    "assignor": "league__assignor",
+    "position": "position",
+    "fee": "fee",
+    "effective_fee": "effective_fee",
+    "fee_paid": "fee_paid",
+    "is_volunteer": "is_volunteer",
+    "mileage": "mileage",
+    "mileage_paid": "mileage_paid",
+    "mileage_pending": "mileage_pending",
+    "updated_at": "updated_at",
+}
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+
+
+class InvalidQuery(ValueError):
+    pass
+
+
+def make_cursor(day: date, pk: int) -> str:
+    """Opaque cursor for the position just after game ``pk`` on ``day``."""
+    return urlsafe_b64encode(f"{day.isoformat()},{pk}".encode()).decode()
+
+
+def read_cursor(cursor: str) -> tuple[date, int]:
+    try:
+        day, pk = urlsafe_b64decode(cursor.encode()).decode().split(",")
+        return date.fromisoformat(day), int(pk)
+    except ValueError:
+        raise InvalidQuery("Invalid cursor.") from None
+
+
+def _fields(param: str) -> list[str]:
+    if not param:
+        return list(GAME_FIELDS)
+    fields = list(dict.fromkeys(name.strip() for name in param.split(",")))
+    unknown = [name for name in fields if name not in GAME_FIELDS]
+    if unknown:
+        raise InvalidQuery(
+            f"Unknown fields: {', '.join(unknown)}."
+            f" Choose from: {', '.join(GAME_FIELDS)}."
+        )
+    return fields
+
+
+def _limit(param: str) -> int:
+    if not param:
+        return DEFAULT_LIMIT
+    if not param.isdigit() or not 1 <= int(param) <= MAX_LIMIT:
+        raise InvalidQuery(f"limit must be 1 to {MAX_LIMIT}.")
+    return int(param)
+
+
+def game_page(user, params) -> dict:
+    """One page of ``user``'s games, oldest first, for the API's query ``params``.
+
+    ``filter_*`` params select games as on the game list (all years and
+    paid states by default), ``fields`` is a comma-separated subset of
+    GAME_FIELDS, ``limit`` the page size and ``cursor`` the ``next`` value
+    of the previous page. Pages are keyed on (date, id) rather than an
+    OFFSET, so later pages cost the same as the first. Raises InvalidQuery.
+    """
+    fields = _fields(params.get("fields", ""))
+    limit = _limit(params.get("limit", ""))
+    filters = GameFilters.from_query(params, default_paid="all")
+    games = filters.apply(Game.objects.filter(user=user))
+    if params.get("cursor"):
+        day, pk = read_cursor(params["cursor"])
+        games = games.filter(Q(date__gt=day) | Q(date=day, pk__gt=pk))
+    # date and id come last for the cursor, whether or not they were asked for
+    columns = [GAME_FIELDS[name] for name in fields] + ["date", "id"]
+    rows = list(games.order_by("date", "pk").values_list(*columns)[: limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "results": [dict(zip(fields, row)) for row in rows],
+        "next": make_cursor(*rows[-1][-2:]) if more else None,
+    }
+
+
+def games_state(user, params) -> str:
+    """How many of ``user``'s games match ``params``' filters and when the
+    latest of them changed, as a string that moves with every page of
+    ``game_page`` for those filters (deletes lower the count).
+    """
+    filters = GameFilters.from_query(params, default_paid="all")
+    state = filters.apply(Game.objects.filter(user=user)).aggregate(
+        count=Count("id"), latest=Max("updated_at")
+    )
+    return f"{state['count']}:{state['latest']}"
@@ -0,0 +1,405 @@
+import json
+import math
+import time
+import tracemalloc
+from calendar import monthrange
+from dataclasses import asdict, dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from tracker.api import make_cursor
+from tracker.models import Game, League, Profile, Site
+from tracker.page_cache import invalidate_user_pages
+from tracker.stats import rebuild_stats
+from tracker.sync import make_token
+from tracker.trips import rebuild_trips
+from tracker.views import game_rows
+
+# Sport -> (months its season runs, positions worked)
+SPORTS = {
+    "Football": ([8, 9, 10, 11], ["Referee", "Umpire", "Line Judge", "Back Judge"]),
+    "Basketball": ([11, 12, 1, 2, 3], ["Referee", "Umpire"]),
+    "Baseball": ([3, 4, 5, 6, 7], ["Plate", "Base"]),
+    "Soccer": ([3, 4, 5, 9, 10, 11], ["Center", "Assistant"]),
+}
+LEAGUE_FEES = [35, 40, 45, 50, 55, 65, 75, 85]
+TOWNS = ["Nashville", "Franklin", "Brentwood", "Murfreesboro", "Smyrna", "Lebanon"]
+
+
+def _game_day(rng, year: int, months: list[int], today: date) -> date | None:
+    """A game date in one of ``months`` of ``year``'s season, mostly weekends."""
+    month = rng.choice(months)
+    day = date(year, month, rng.randint(1, monthrange(year, month)[1]))
+    if rng.random() < 0.7:
+        day += timedelta(days=(5 - day.weekday()) % 7)  # the Saturday after
+    # Schedules reach about a month ahead
+    return day if day <= today + timedelta(days=30) else None
+
+
+def _paid(rng, day: date, today: date) -> tuple[bool, bool]:
+    """(fee_paid, mileage_paid) for a game on ``day``: old games are mostly paid."""
+    age = (today - day).days
+    fee_odds = 0.97 if age > 60 else 0.5 if age > 14 else 0.05
+    mileage_odds = 0.85 if age > 90 else 0.2
+    return rng.random() < fee_odds, rng.random() < mileage_odds
+
+
+def seed_histories(
+    rng, n_users: int = 20, years: int = 10, games_per_year: int = 200
+) -> list[User]:
+    """Create benchmark users with realistic officiating histories.
+
+    Each ``bench-N`` user works a few leagues at a dozen or so sites over
+    ``years`` seasons, about ``games_per_year`` games a year (the first user
+    the most, the rest tapering off). Histories include doubleheaders,
+    multi-site days, volunteer games, fee overrides, and recent games left
+    unpaid. Trips and stats are rebuilt afterwards. Returns the users,
+    busiest first.
+    """
+    today = date.today()
+    leagues = League.objects.bulk_create(
+        League(
+            organization=f"Bench {sport} League {i}",
+            assignor=f"Bench Assignor {i % 6}",
+            game_fee=Decimal(rng.choice(LEAGUE_FEES)),
+            description=sport,
+        )
+        for i, sport in enumerate(list(SPORTS) * 3)
+    )
+    sites = Site.objects.bulk_create(
+        Site(
+            name=f"Bench Site {i}",
+            address=f"{100 + i} Bench Field Rd, {rng.choice(TOWNS)}, TN",
+        )
+        for i in range(60)
+    )
+    users = User.objects.bulk_create(
+        User(username=f"bench-{i}", password="!") for i in range(n_users)
+    )
+    # bulk_create skips the signal that gives each user a profile
+    Profile.objects.bulk_create(
+        Profile(
+            user=user,
+            home_address=f"{rng.randint(1, 999)} Home St",
+            city=rng.choice(TOWNS),
+            state="TN",
+        )
+        for user in users
+    )
+
+    games = []
+    for rank, user in enumerate(users):
+        target = round(years * games_per_year / (1 + rank * 0.25))
+        user_leagues = rng.sample(leagues, k=rng.randint(2, 4))
+        user_sites = rng.sample(sites, k=rng.randint(8, 20))
+        miles = {site.pk: round(rng.uniform(3, 45), 1) for site in user_sites}
+        made = 0
+        while made < target:
+            league = rng.choice(user_leagues)
+            months, positions = SPORTS[league.description]
+            day = _game_day(rng, today.year - rng.randrange(years), months, today)
+            if day is None:
+                continue
+            roll = rng.random()
+            # 70% single games, then doubleheaders, tripleheaders, two-site days
+            count = 1 if roll < 0.7 else 2 if roll < 0.9 else 3
+            day_sites = [rng.choice(user_sites)]
+            if roll >= 0.95:
+                day_sites.append(rng.choice(user_sites))
+            for n in range(count):
+                site = day_sites[n % len(day_sites)]
+                volunteer = rng.random() < 0.03
+                fee = None
+                if not volunteer and rng.random() < 0.1:
+                    fee = league.game_fee + rng.choice([-10, 10, 15])
+                fee_paid, mileage_paid = _paid(rng, day, today)
+                game = Game(
+                    user=user,
+                    date=day,
+                    site=site,
+                    league=league,
+                    position=rng.choice(positions),
+                    fee=fee,
+                    fee_paid=fee_paid and not volunteer,
+                    is_volunteer=volunteer,
+                    mileage=miles[site.pk],
+                    mileage_paid=mileage_paid,
+                )
+                game.update_effective_fee()
+                games.append(game)
+            made += count
+    Game.objects.bulk_create(games, batch_size=2000)
+
+    user_ids = {user.pk for user in users}
+    rebuild_trips(user_ids)
+    rebuild_stats(user_ids)
+    invalidate_user_pages(user_ids)
+    return users
+
+
+def list_memory(user) -> dict[str, float]:
+    """Peak KiB to read every one of ``user``'s games for the game list.
+
+    As the full Game instances, with their League, Site and Trip, the list
+    used to build, and as the GameRows it reads now.
+    """
+    games = Game.objects.filter(user=user).order_by("date", "site__name")
+    loads = {
+        "Game instances": lambda: list(games.select_related("league", "site", "trip")),
+        "GameRow": lambda: list(game_rows(games)),
+    }
+    peaks = {}
+    for name, load in loads.items():
+        tracemalloc.start()
+        try:
+            load()
+            peaks[name] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        finally:
+            tracemalloc.stop()
+    return peaks
+
+
+def delete_histories() -> int:
+    """Delete every benchmark user, league and site. Returns users deleted."""
+    users = User.objects.filter(username__startswith="bench-")
+    # Their owners are going too, so skip the per-game trip and stats refresh
+    games = Game.objects.filter(user__in=users)
+    games._raw_delete(games.db)
+    deleted = users.delete()[1]
+    League.objects.filter(organization__startswith="Bench ").delete()
+    Site.objects.filter(name__startswith="Bench Site ").delete()
+    return deleted.get("auth.User", 0)
+
+
+@dataclass
+class ViewResult:
+    name: str
+    status: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    queries: int
+    peak_kib: float
+
+
+def percentile(values: list[float], p: float) -> float:
+    """The nearest-rank ``p``th percentile of ``values``."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+def view_requests(user) -> dict[str, tuple[str, str, dict]]:
+    """(URL name, method, data) of a representative request to every view.
+
+    POSTs (``json`` ones send ``data`` as a JSON body, ``htmx`` ones come
+    from the game list's htmx controls) are rolled back after each run, so
+    every run does the same work.
+    """
+    game = Game.objects.filter(user=user, site__isnull=False).order_by("-date")[0]
+    week_ago = make_token(timezone.now() - timedelta(days=7))
+    return {
+        "home": ("home", "get", {}),
+        "profile_view": ("profile_view", "get", {}),
+        "profile_edit": ("profile_edit", "get", {}),
+        "game_list": ("game_list", "get", {}),
+        "game_list (all years)": (
+            "game_list",
+            "get",
+            {"filter_year": "", "filter_paid": "all"},
+        ),
+        "game_list (create)": ("game_list", "post", _game_data(game)),
+        "game_detail": ("game_detail", "get", {"pk": game.pk}),
+        "add_game": ("add_game", "get", {}),
+        "import_games": ("import_games", "get", {}),
+        "record_payment": (
+            "record_payment",
+            "post",
+            {"date": date.today().isoformat(), "amount": "500.00"},
+        ),
+        "edit_game": ("edit_game", "post", {"pk": game.pk, **_game_data(game)}),
+        "delete_game": ("delete_game", "post", {"pk": game.pk}),
+        "toggle_fee_paid": ("toggle_fee_paid", "post", {"pk": game.pk}),
+        "toggle_fee_paid (htmx)": (
+            "toggle_fee_paid",
+            "htmx",
+            # the page's summary comes along, so only the game's month is read
+            {
+                "pk": game.pk,
+                "summary_count": "0",
+                "summary_total_fees": "0",
+                "summary_paid_fees": "0",
+                "summary_unpaid_fees": "0",
+                "summary_total_mileage": "0",
+            },
+        ),
+        "game_month": ("game_month", "get", {"month": game.date.strftime("%Y-%m")}),
+        "mark_paid": ("mark_paid", "post", {"month": game.date.strftime("%Y-%m")}),
+        "site_distance": ("site_distance", "get", {"site": game.site_id}),
+        "distance_metrics": ("distance_metrics", "get", {}),
+        "game_stats": ("game_stats", "get", {}),
+        "export_games": ("export_games", "get", {"filter_year": ""}),
+        "export_stats": ("export_stats", "get", {}),
+        "api_games": ("api_games", "get", {}),
+        "api_games (sparse)": (
+            "api_games",
+            "get",
+            {
+                "fields": "date,fee,fee_paid",
+                "filter_paid": "unpaid",
+                "cursor": make_cursor(game.date - timedelta(days=365), 0),
+            },
+        ),
+        "sync_changes": ("sync_changes", "get", {}),
+        "sync_changes (week)": ("sync_changes", "get", {"token": week_ago}),
+        "sync_upload": (
+            "sync_upload",
+            "json",
+            {
+                "token": make_token(timezone.now()),
+                "changes": [
+                    {"action": "create", "ref": "new", "fields": _game_data(game)},
+                    {"action": "update", "id": game.pk, "fields": {"position": "R"}},
+                ],
+            },
+        ),
+    }
+
+
+def _game_data(game: Game) -> dict:
+    return {
+        "date": game.date.isoformat(),
+        "site": game.site_id,
+        "league": game.league_id or "",
+        "position": game.position or "",
+        "mileage": game.mileage,
+    }
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _request(client: Client, url_name: str, method: str, data: dict):
+    data = dict(data)
+    kwargs = {"pk": data.pop("pk")} if "pk" in data else {}
+    url = reverse(url_name, kwargs=kwargs)
+    # secure, or SECURE_SSL_REDIRECT answers every request with a redirect
+    if method == "get":
+        response = client.get(url, data, secure=True)
+    else:
+        try:
+            with transaction.atomic():
+                if method == "json":
+                    response = client.post(
+                        url, json.dumps(data), "application/json", secure=True
+                    )
+                elif method == "htmx":
+                    response = client.post(
+                        url, data, secure=True, headers={"HX-Request": "true"}
+                    )
+                else:
+                    response = client.post(url, data, secure=True)
+                raise _Rollback
+        except _Rollback:
+            pass
+    if response.streaming:
+        b"".join(response.streaming_content)
+    return response
+
+
+def benchmark_views(
+    user, repeat: int = 20, warmup: int = 2, warm_cache: bool = False
+) -> list[ViewResult]:
+    """Time every view for ``user``: latency percentiles, queries, peak memory.
+
+    Each request is timed ``repeat`` times after ``warmup`` untimed runs,
+    with the cache cleared first unless ``warm_cache``. One more run counts
+    queries and traces peak Python memory, so neither slows the timed runs.
+    The user is made staff for the duration, all inside a transaction that
+    is rolled back.
+    """
+    results = []
+    client = Client()
+    try:
+        with (
+            override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]),
+            transaction.atomic(),
+        ):
+            User.objects.filter(pk=user.pk).update(is_staff=True)
+            client.force_login(User.objects.get(pk=user.pk))
+            for name, (url_name, method, data) in view_requests(user).items():
+                timings = []
+                for run in range(warmup + repeat):
+                    if not warm_cache:
+                        cache.clear()
+                    started = time.perf_counter()
+                    _request(client, url_name, method, data)
+                    if run >= warmup:
+                        timings.append((time.perf_counter() - started) * 1000)
+                if not warm_cache:
+                    cache.clear()
+                tracemalloc.start()
+                try:
+                    with CaptureQueriesContext(connection) as queries:
+                        response = _request(client, url_name, method, data)
+                    peak = tracemalloc.get_traced_memory()[1]
+                finally:
+                    tracemalloc.stop()
+                results.append(
+                    ViewResult(
+                        name=name,
+                        status=response.status_code,
+                        p50_ms=round(percentile(timings, 50), 2),
+                        p95_ms=round(percentile(timings, 95), 2),
+                        p99_ms=round(percentile(timings, 99), 2),
+                        queries=len(queries),
+                        peak_kib=round(peak / 1024, 1),
+                    )
+                )
+            raise _Rollback
+    except _Rollback:
+        pass
+    return results
+
+
+def uncovered_url_names(user) -> set[str]:
+    """Named tracker URLs ``view_requests`` has no request for."""
+    from tracker.urls import urlpatterns
+
+    names = {pattern.name for pattern in urlpatterns if getattr(pattern, "name", None)}
+    return names - {url_name for url_name, _, _ in view_requests(user).values()}
+
+
+def as_baseline(results: list[ViewResult]) -> dict:
+    return {result.name: asdict(result) for result in results}
+
+
+def regressions(results: list[ViewResult], baseline: dict, tolerance: float):
+    """Ways ``results`` are worse than ``baseline``, as readable lines.
+
+    More queries than the baseline is always a regression; p95 latency and
+    peak memory are allowed ``tolerance`` (a fraction) of noise.
+    """
+    found = []
+    for result in results:
+        before = baseline.get(result.name)
+        if before is None:
+            continue
+        if result.queries > before["queries"]:
+            found.append(
+                f"{result.name}: {result.queries} queries (was {before['queries']})"
+            )
+        for field, unit in (("p95_ms", "ms"), ("peak_kib", "KiB")):
+            now, was = getattr(result, field), before[field]
+            if now > was * (1 + tolerance):
+                found.append(f"{result.name}: {field} {now} {unit} (was {was})")
+    return found
@@ -0,0 +1,78 @@
+import csv
+from itertools import groupby
+
+from tracker.models import StatsRollup
+from tracker.stats import TOTALS
+
+EXPORT_CHUNK_SIZE = 2000
+
+GAME_EXPORT_HEADER = [
+    "date",
+    "site",
+    "league",
+    "assignor",
+    "position",
+    "fee",
+    "fee_paid",
+    "is_volunteer",
+    "mileage_paid",
+    "trip_mileage",
+]
+STATS_EXPORT_HEADER = ["dimension", "key", *TOTALS]
+
+
+class Echo:
+    """File-like object whose ``write`` returns the line, for streaming csv."""
+
+    def write(self, value):
+        return value
+
+
+def game_export_rows(games):
+    """Yield the header and one row per game, ordered by date and site.
+
+    Games are read with ``.iterator()`` alongside their trip; each trip's
+    mileage is written on its first game so the column sums to the miles
+    driven.
+    """
+    yield GAME_EXPORT_HEADER
+    games = (
+        games.select_related("league", "site", "trip")
+        .order_by("date", "site__name", "id")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for _, trip_games in groupby(games, key=lambda g: g.date):
+        trip_games = list(trip_games)
+        trip = trip_games[0].trip
+        miles = trip.mileage if trip else 0.0
+        for i, game in enumerate(trip_games):
+            league = game.league
+            yield [
+                game.date.isoformat(),
+                game.site.name if game.site else "",
+                league.organization if league else "",
+                league.assignor if league else "",
+                game.position or "",
+                "" if game.effective_fee is None else f"{game.effective_fee:.2f}",
+                game.fee_paid,
+                game.is_volunteer,
+                game.mileage_paid,
+                miles if i == 0 else 0,
+            ]
+
+
+def stats_export_rows(user):
+    """Yield the header and one row per stats rollup bucket of ``user``."""
+    yield STATS_EXPORT_HEADER
+    yield from (
+        StatsRollup.objects.filter(user=user)
+        .order_by("dimension", "key")
+        .values_list("dimension", "key", *TOTALS)
+    )
+
+
+def stream_csv(rows):
+    """Encode ``rows`` as CSV lines, one string per row."""
+    writer = csv.writer(Echo())
+    for row in rows:
+        yield writer.writerow(row)
@@ -0,0 +1,86 @@
+from dataclasses import dataclass, replace
+from urllib.parse import urlencode
+
+from django.db.models import QuerySet
+
+FILTER_PARAMS = {
+    "year": "filter_year",
+    "league": "filter_league",
+    "assignor": "filter_assignor",
+    "position": "filter_position",
+    "site": "filter_site",
+    "paid": "filter_paid",
+}
+
+
+@dataclass(frozen=True)
+class GameFilters:
+    """Game list filters, as selected in the query string."""
+
+    year: str = ""
+    league: str = ""
+    assignor: str = ""
+    position: str = ""
+    site: str = ""
+    paid: str = "unpaid"
+
+    @classmethod
+    def from_query(
+        cls, params, default_year: str = "", default_paid: str = "unpaid"
+    ) -> "GameFilters":
+        return cls(
+            year=params.get("filter_year", default_year),
+            league=params.get("filter_league", ""),
+            assignor=params.get("filter_assignor", ""),
+            position=params.get("filter_position", ""),
+            site=params.get("filter_site", ""),
+            paid=(
+                "all" if params.get("filter_paid", default_paid) == "all" else "unpaid"
+            ),
+        )
+
+    def within(self, options: dict[str, list]) -> "GameFilters":
+        """Clear any dropdown value that isn't one of the available ``options``.
+
+        Mirrors a <select> falling back to its "All" option, so a stale
+        bookmark or the default year with no games shows everything instead of
+        an empty list.
+        """
+        cleared = {
+            name: ""
+            for name, values in options.items()
+            if getattr(self, name) and getattr(self, name) not in map(str, values)
+        }
+        return replace(self, **cleared)
+
+    def apply(self, games: QuerySet) -> QuerySet:
+        if self.year.isdigit():
+            games = games.filter(date__year=int(self.year))
+        if self.league:
+            games = games.filter(league__organization=self.league)
+        if self.assignor:
+            games = games.filter(league__assignor=self.assignor)
+        if self.position:
+            games = games.filter(position=self.position)
+        if self.site:
+            games = games.filter(site__name=self.site)
+        if self.paid == "unpaid":
+            games = games.filter(fee_paid=False, is_volunteer=False)
+        return games
+
+    def matches(self, row: dict) -> bool:
+        """Whether a grouped row from ``views._facet_rows`` passes these filters."""
+        return not (
+            (self.year.isdigit() and row["month"].year != int(self.year))
+            or (self.league and row["league__organization"] != self.league)
+            or (self.assignor and row["league__assignor"] != self.assignor)
+            or (self.position and row["position"] != self.position)
+            or (self.site and row["site__name"] != self.site)
+            or (self.paid == "unpaid" and (row["fee_paid"] or row["is_volunteer"]))
+        )
+
+    def querystring(self) -> str:
+        """Query string that reproduces these filters, e.g. for paging links."""
+        return urlencode(
+            {param: getattr(self, name) for name, param in FILTER_PARAMS.items()}
+        )
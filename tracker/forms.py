@@ -4,8 +4,10 @@ from django.contrib.auth.models import User
 
 # from django.urls import reverse
 # from django.forms import ModelForm, DateInput
-from tracker.models import Game, League, Profile, Site
-from tracker.utils import DistanceError, distance_miles
+from tracker.geo import estimate_miles
+from tracker.models import Game, League, Payment, Profile, Site
+from tracker.tasks import cancel_distance, enqueue_distance
+from tracker.utils import DistanceError, cached_distance_miles, distance_miles
 
 
 class UserForm(forms.ModelForm):
@@ -18,6 +20,13 @@ class UserForm(forms.ModelForm):
 
 
 class ProfileForm(forms.ModelForm):
+    recompute_mileage = forms.BooleanField(
+        required=False,
+        label="Recompute mileage on games not yet reimbursed",
+        help_text="Applies when the address changes, once the new distances "
+        "have been fetched.",
+    )
+
     class Meta:
         model = Profile
         fields = (
@@ -61,6 +70,13 @@ class ProfileForm(forms.ModelForm):
             "zip_code": "ZIP Code",
         }
 
+    def clean(self):
+        cleaned_data = super().clean()
+        # Read by the Profile post_save signal that queues the prefetch; set
+        # here because saving the User form already saves the profile
+        self.instance._recompute_mileage = cleaned_data.get("recompute_mileage")
+        return cleaned_data
+
 
 class DateInput(forms.DateInput):
     input_type = "date"
@@ -109,21 +125,35 @@ class GameForm(forms.ModelForm):
         mileage_changed = "mileage" in self.changed_data
         should_calculate = is_new or not mileage_changed
 
+        instance.mileage_pending = False
+        self._distance_origin = None
         if should_calculate and instance.site:
-            try:
-                destination = instance.site.address
-
-                # Get origin address from user profile or settings default
-                origin = settings.DEFAULT_ADDRESS
-                if self.user and hasattr(self.user, "profile"):
-                    profile_address = self.user.profile.full_address
-                    if profile_address:
-                        origin = profile_address
-
-                instance.mileage = distance_miles(origin, destination)
-            except DistanceError:
-                # If API call fails, set mileage to 0
-                instance.mileage = 0.0
+            destination = instance.site.address
+
+            # Get origin address from user profile or settings default
+            origin = settings.DEFAULT_ADDRESS
+            if self.user and hasattr(self.user, "profile"):
+                profile_address = self.user.profile.full_address
+                if profile_address:
+                    origin = profile_address
+
+            if settings.DISTANCE_LOOKUP_ASYNC:
+                # Use a cached distance if there is one, otherwise save now
+                # and let the distance worker fill mileage in
+                miles = cached_distance_miles(origin, destination)
+                if miles is not None:
+                    instance.mileage = miles
+                else:
+                    instance.mileage_pending = True
+                    self._distance_origin = origin
+                    if is_new:
+                        instance.mileage = estimate_miles(origin, destination) or 0.0
+            else:
+                try:
+                    instance.mileage = distance_miles(origin, destination)
+                except DistanceError:
+                    # If API call fails, estimate from coordinates (or 0)
+                    instance.mileage = estimate_miles(origin, destination) or 0.0
         elif should_calculate and not instance.site:
             # No site selected, set mileage to 0
             instance.mileage = 0.0
@@ -133,8 +163,16 @@ class GameForm(forms.ModelForm):
 
         if commit:
             instance.save()
+            self._save_m2m()
         return instance
 
+    def _save_m2m(self):
+        super()._save_m2m()
+        if self.instance.mileage_pending:
+            enqueue_distance(self.instance, self._distance_origin)
+        elif self.instance.pk:
+            cancel_distance(self.instance)
+
 
 class SiteForm(forms.ModelForm):
     class Meta:
@@ -146,3 +184,26 @@ class LeagueForm(forms.ModelForm):
     class Meta:
         model = League
         fields = ["organization", "assignor", "game_fee", "description"]
+
+
+class GameImportForm(forms.Form):
+    file = forms.FileField(
+        help_text="CSV with date, site, league, position, fee and fee_paid "
+        "columns, or an iCalendar (.ics) export"
+    )
+
+
+class PaymentForm(forms.ModelForm):
+    class Meta:
+        model = Payment
+        fields = ["date", "amount", "league", "assignor"]
+        widgets = {
+            "date": DateInput(),
+        }
+        labels = {
+            "league": "From League",
+            "assignor": "From Assignor",
+        }
+        help_texts = {
+            "assignor": "Leave blank to match games from any assignor",
+        }
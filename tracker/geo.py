@@ -0,0 +1,169 @@
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from tracker.models import DistanceCache, Location, Profile, Site
+from tracker.utils import maps_client, normalize_address
+
+EARTH_RADIUS_MI = 3958.8
+
+
+def haversine_many(origin: tuple[float, float], points: dict) -> dict:
+    """Great-circle miles from ``origin`` to each ``{key: (lat, lon)}`` point.
+
+    The origin's terms are computed once, so a whole site list costs one
+    pass of arithmetic.
+    """
+    lat1, lon1 = map(math.radians, origin)
+    cos_lat1 = math.cos(lat1)
+    miles = {}
+    for key, (lat, lon) in points.items():
+        lat2, lon2 = math.radians(lat), math.radians(lon)
+        a = (
+            math.sin((lat2 - lat1) / 2) ** 2
+            + cos_lat1 * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+        )
+        miles[key] = 2 * EARTH_RADIUS_MI * math.asin(math.sqrt(a))
+    return miles
+
+
+def coordinates(addresses) -> dict[str, tuple[float, float]]:
+    """Stored ``(lat, lon)`` of each geocoded address among ``addresses``."""
+    by_key = {normalize_address(a): a for a in addresses if a}
+    rows = Location.objects.filter(
+        address__in=list(by_key), latitude__isnull=False, longitude__isnull=False
+    ).values_list("address", "latitude", "longitude")
+    return {by_key[key]: (lat, lon) for key, lat, lon in rows}
+
+
+def estimate_miles_many(origin: str, destinations) -> dict[str, float]:
+    """Estimated driving miles from ``origin`` to each geocoded destination.
+
+    Straight-line distance scaled by DISTANCE_ESTIMATE_FACTOR; addresses
+    without coordinates are left out.
+    """
+    points = coordinates([origin, *destinations])
+    start = points.pop(origin, None)
+    if start is None:
+        return {}
+    factor = settings.DISTANCE_ESTIMATE_FACTOR
+    return {
+        address: round(miles * factor, 1)
+        for address, miles in haversine_many(start, points).items()
+    }
+
+
+def estimate_miles(origin: str, destination: str) -> float | None:
+    """Estimated driving miles between two addresses, or None if not geocoded."""
+    if normalize_address(origin) == normalize_address(destination):
+        return 0.0
+    return estimate_miles_many(origin, [destination]).get(destination)
+
+
+def site_estimates(origin: str) -> dict[int, float]:
+    """Estimated driving miles from ``origin`` to every geocoded Site, by pk."""
+    sites = list(Site.objects.values_list("pk", "address"))
+    miles = estimate_miles_many(origin, {address for _, address in sites})
+    return {pk: miles[address] for pk, address in sites if address in miles}
+
+
+def preview_site_miles(origin: str) -> dict[int, float]:
+    """Miles from ``origin`` to every Site, by pk, without calling the API.
+
+    Fresh DistanceCache entries win; other sites get their estimate, and
+    sites with neither are left out.
+    """
+    sites = list(Site.objects.values_list("pk", "address"))
+    fresh_since = timezone.now() - timedelta(days=settings.DISTANCE_CACHE_TTL)
+    cached = dict(
+        DistanceCache.objects.filter(
+            origin=normalize_address(origin), fetched_at__gte=fresh_since
+        ).values_list("destination", "miles")
+    )
+    estimates = estimate_miles_many(origin, {address for _, address in sites})
+    miles = {}
+    for pk, address in sites:
+        value = cached.get(normalize_address(address), estimates.get(address))
+        if value is not None:
+            miles[pk] = value
+    return miles
+
+
+def _settled() -> Q:
+    """Locations with coordinates, or whose failed geocode is still recent."""
+    retry_before = timezone.now() - timedelta(days=settings.DISTANCE_CACHE_TTL)
+    return Q(latitude__isnull=False) | Q(geocoded_at__gte=retry_before)
+
+
+def geocode(address: str, name: str = "") -> Location:
+    """The Location for ``address``, geocoding it on first use.
+
+    Addresses Google cannot resolve are stored without coordinates so they
+    are not retried until DISTANCE_CACHE_TTL days later. Raises
+    DistanceError if the request fails.
+    """
+    key = normalize_address(address)
+    location = Location.objects.filter(_settled(), address=key).first()
+    if location is not None:
+        return location
+    results = maps_client.geocode(address)
+    try:
+        point = results[0]["geometry"]["location"]
+        lat, lon = point["lat"], point["lng"]
+    except (IndexError, KeyError, TypeError):
+        lat = lon = None
+    location, _ = Location.objects.update_or_create(
+        address=key,
+        defaults={
+            "name": (name or address)[:100],
+            "latitude": lat,
+            "longitude": lon,
+            "geocoded_at": timezone.now(),
+        },
+    )
+    return location
+
+
+def _addresses(since=None) -> dict[str, str]:
+    """Site and Profile addresses, mapped to a label for their Location.
+
+    With ``since``, only those of rows saved at or after it.
+    """
+    profiles = Profile.objects.select_related("user")
+    sites = Site.objects.all()
+    if since is not None:
+        profiles = profiles.filter(updated_at__gte=since)
+        sites = sites.filter(updated_at__gte=since)
+    labels = {}
+    for profile in profiles:
+        if profile.full_address:
+            labels[profile.full_address] = f"Home of {profile.user}"
+    for name, address in sites.values_list("name", "address"):
+        labels[address] = name
+    return labels
+
+
+def geocode_missing(limit: int | None = None, since=None) -> int:
+    """Geocode Site and Profile addresses that have no Location yet.
+
+    With ``since``, only Sites and Profiles saved at or after it are
+    checked, so ``run_distance_worker`` does not rescan every address on
+    each pass. Returns the number of addresses geocoded. Raises
+    DistanceError on the first failed request (the Maps client's breaker
+    will be counting), so the caller can check the same rows again.
+    """
+    labels = _addresses(since)
+    if not labels:
+        return 0
+    known = set(
+        Location.objects.filter(
+            _settled(), address__in=[normalize_address(a) for a in labels]
+        ).values_list("address", flat=True)
+    )
+    missing = [a for a in labels if normalize_address(a) not in known]
+    for address in missing[:limit]:
+        geocode(address, labels[address])
+    return len(missing[:limit])
@@ -0,0 +1,240 @@
+import csv
+from dataclasses import dataclass, field
+from datetime import UTC, date, datetime
+from decimal import Decimal, InvalidOperation
+from itertools import batched
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.utils import timezone
+
+from tracker.geo import estimate_miles_many
+from tracker.models import Game, League, Site
+from tracker.page_cache import invalidate_user_pages
+from tracker.stats import rebuild_stats
+from tracker.trips import rebuild_trips
+from tracker.utils import DistanceError, distance_miles_many
+
+IMPORT_CHUNK_SIZE = 500
+IMPORT_FORMATS = ("csv", "ics")
+DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%Y%m%d")
+TRUE_VALUES = {"1", "true", "t", "yes", "y", "x", "paid"}
+
+# CSV header -> import field, for the column names assignor exports tend to use
+CSV_ALIASES = {
+    "location": "site",
+    "venue": "site",
+    "organization": "league",
+    "paid": "fee_paid",
+}
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    duplicates: int = 0
+    errors: list[str] = field(default_factory=list)
+
+
+def detect_format(filename: str) -> str:
+    """Import format for an uploaded file name; CSV unless it ends in .ics."""
+    return "ics" if filename.lower().endswith((".ics", ".ical")) else "csv"
+
+
+def parse_csv(lines):
+    """Yield ``(line_number, row)`` for each record of a CSV export."""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        fields = {}
+        for header, value in row.items():
+            if header is None:
+                continue
+            name = header.strip().lower().replace(" ", "_")
+            fields[CSV_ALIASES.get(name, name)] = (value or "").strip()
+        yield reader.line_num, fields
+
+
+def _unfold(lines):
+    """Join RFC 5545 folded lines, yielding ``(line_number, line)``."""
+    pending, pending_no = None, 0
+    for number, line in enumerate(lines, start=1):
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and pending is not None:
+            pending += line[1:]
+            continue
+        if pending is not None:
+            yield pending_no, pending
+        pending, pending_no = line, number
+    if pending is not None:
+        yield pending_no, pending
+
+
+def _ics_text(value: str) -> str:
+    return (
+        value.replace("\\n", " ")
+        .replace("\\N", " ")
+        .replace("\\,", ",")
+        .replace("\\;", ";")
+        .replace("\\\\", "\\")
+        .strip()
+    )
+
+
+def _ics_date(value: str, params: dict) -> str:
+    """DTSTART as a YYYYMMDD date in IMPORT_TIME_ZONE.
+
+    All-day (``VALUE=DATE``) and floating times keep their date; UTC
+    (``Z``) and ``TZID`` times are converted first, so an evening game
+    exported in UTC stays on its local day. Unreadable values are returned
+    as-is for ``_parse_date`` to reject.
+    """
+    if params.get("VALUE", "").upper() == "DATE" or "T" not in value:
+        return value[:8]
+    try:
+        start = datetime.strptime(value.rstrip("Zz"), "%Y%m%dT%H%M%S")
+    except ValueError:
+        return value
+    if value[-1:] in ("Z", "z"):
+        start = start.replace(tzinfo=UTC)
+    elif "TZID" in params:
+        try:
+            start = start.replace(tzinfo=ZoneInfo(params["TZID"].strip('"')))
+        except (ZoneInfoNotFoundError, ValueError):
+            # Calendar-specific zone names: read as local time
+            pass
+    if timezone.is_aware(start):
+        start = timezone.localtime(start, ZoneInfo(settings.IMPORT_TIME_ZONE))
+    return start.strftime("%Y%m%d")
+
+
+def parse_ics(lines):
+    """Yield ``(line_number, row)`` for each VEVENT of an iCalendar export.
+
+    DTSTART gives the date (see ``_ics_date``) and LOCATION the site;
+    SUMMARY is read as "League" or "League - Position".
+    """
+    event, start = None, 0
+    for number, line in _unfold(lines):
+        name, _, value = line.partition(":")
+        name, *params = name.split(";")
+        name = name.upper()
+        if name == "BEGIN" and value.upper() == "VEVENT":
+            event, start = {}, number
+        elif name == "END" and value.upper() == "VEVENT" and event is not None:
+            league, _, position = event.get("SUMMARY", "").partition(" - ")
+            yield (
+                start,
+                {
+                    "date": event.get("DTSTART", ""),
+                    "site": event.get("LOCATION", ""),
+                    "league": league.strip(),
+                    "position": position.strip(),
+                },
+            )
+            event = None
+        elif name == "DTSTART" and event is not None:
+            params = {k.upper(): v for k, _, v in (p.partition("=") for p in params)}
+            event[name] = _ics_date(value.strip(), params)
+        elif event is not None:
+            event[name] = _ics_text(value)
+
+
+def parse_games(lines, fmt: str):
+    return parse_ics(lines) if fmt == "ics" else parse_csv(lines)
+
+
+def _parse_date(value: str) -> date:
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognized date {value!r}")
+
+
+def _build_game(user, row: dict, sites: dict, leagues: dict) -> Game:
+    """Unsaved Game for one parsed row. Raises ValueError if it can't be read."""
+    site = sites.get(row.get("site", "").casefold())
+    if site is None:
+        raise ValueError(f"unknown site {row.get('site', '')!r}")
+    league = leagues.get(row.get("league", "").casefold())
+    if league is None:
+        raise ValueError(f"unknown league {row.get('league', '')!r}")
+    fee = row.get("fee", "").lstrip("$").replace(",", "")
+    try:
+        fee = Decimal(fee) if fee else None
+    except InvalidOperation:
+        raise ValueError(f"invalid fee {row['fee']!r}")
+    game = Game(
+        user=user,
+        date=_parse_date(row.get("date", "")),
+        site=site,
+        league=league,
+        position=row.get("position") or None,
+        fee=fee,
+        fee_paid=row.get("fee_paid", "").lower() in TRUE_VALUES,
+    )
+    # bulk_create skips Game.save()
+    game.update_effective_fee()
+    return game
+
+
+def import_games(user, rows, chunk_size: int = IMPORT_CHUNK_SIZE) -> ImportResult:
+    """Create ``user``'s games from parsed ``rows`` in chunks of ``chunk_size``.
+
+    Sites and leagues are matched by name (case-insensitively) from maps
+    loaded once, games already on the user's schedule are skipped, and each
+    chunk's distinct site addresses are looked up together before a single
+    ``bulk_create``.
+    """
+    result = ImportResult()
+    sites = {site.name.casefold(): site for site in Site.objects.all()}
+    leagues = {lg.organization.casefold(): lg for lg in League.objects.all()}
+    origin = settings.DEFAULT_ADDRESS
+    if hasattr(user, "profile") and user.profile.full_address:
+        origin = user.profile.full_address
+
+    for chunk in batched(rows, chunk_size):
+        games = []
+        for line, row in chunk:
+            try:
+                games.append(_build_game(user, row, sites, leagues))
+            except ValueError as e:
+                result.errors.append(f"Line {line}: {e}")
+        if not games:
+            continue
+
+        seen = set(
+            Game.objects.filter(
+                user=user,
+                date__range=(min(g.date for g in games), max(g.date for g in games)),
+            ).values_list("date", "site_id", "league_id", "position")
+        )
+        new_games = []
+        for game in games:
+            key = (game.date, game.site_id, game.league_id, game.position)
+            if key in seen:
+                result.duplicates += 1
+            else:
+                seen.add(key)
+                new_games.append(game)
+
+        addresses = {game.site.address for game in new_games}
+        try:
+            miles = distance_miles_many(origin, addresses)
+        except DistanceError as e:
+            miles = {}
+            result.errors.append(f"Distance lookup failed, mileage estimated: {e}")
+        unknown = addresses - miles.keys()
+        if unknown:
+            miles.update(estimate_miles_many(origin, unknown))
+        for game in new_games:
+            game.mileage = miles.get(game.site.address, 0.0)
+
+        result.created += len(Game.objects.bulk_create(new_games))
+
+    if result.created:
+        rebuild_trips({user.pk})
+        rebuild_stats({user.pk})
+        invalidate_user_pages({user.pk})
+    return result
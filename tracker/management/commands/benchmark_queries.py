@@ -0,0 +1,162 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Case, DecimalField, F, Q, Sum, When
+from django.test import RequestFactory
+from django.urls import reverse
+
+from tracker import views
+from tracker.models import Game, League, Site, StatsRollup
+from tracker.stats import rebuild_stats
+from tracker.trips import rebuild_trips
+
+POSITIONS = ["Referee", "Umpire", "Line Judge", "Back Judge", "Field Judge", ""]
+
+# How fees were summed before Game.effective_fee: a CASE per row over a JOIN
+LEGACY_FEE = Case(
+    When(fee__isnull=False, then=F("fee")),
+    default=F("league__game_fee"),
+    output_field=DecimalField(max_digits=6, decimal_places=2),
+)
+
+
+def _fee_sums(fee) -> dict:
+    """The fee aggregates a stats rollup row is built from."""
+    return dict(
+        total_fees=Sum(fee),
+        paid_fees=Sum(fee, filter=Q(fee_paid=True)),
+        unpaid_fees=Sum(fee, filter=Q(fee_paid=False, is_volunteer=False)),
+    )
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed synthetic games inside a rolled-back transaction and report query "
+        "plans and timings for game_list, game_stats and toggle_fee_paid, with "
+        "and without the composite Game indexes, and fee rollup aggregates over "
+        "Game.effective_fee against the CASE expression it replaced."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=500)
+        parser.add_argument("--games", type=int, default=100_000)
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Timed runs per view (best is kept)"
+        )
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        try:
+            with transaction.atomic():
+                user = self.seed(rng, options["users"], options["games"])
+                self.report("with composite indexes", user, options["repeat"])
+                with connection.cursor() as cursor:
+                    for index in Game._meta.indexes:
+                        cursor.execute(
+                            f"DROP INDEX {connection.ops.quote_name(index.name)}"
+                        )
+                self.report("without composite indexes", user, options["repeat"])
+                raise _Rollback
+        except _Rollback:
+            pass
+        self.stdout.write(self.style.SUCCESS("Benchmark data rolled back."))
+
+    def seed(self, rng, n_users: int, n_games: int) -> User:
+        """Create users, leagues, sites and games; return the busiest user."""
+        # Not "bench-" or "Bench Site": seed_benchmark's data may already
+        # hold those unique names
+        users = User.objects.bulk_create(
+            User(username=f"qbench-{i}") for i in range(n_users)
+        )
+        leagues = League.objects.bulk_create(
+            League(
+                organization=f"Bench League {i}",
+                assignor=f"Bench Assignor {i % 7}",
+                game_fee=Decimal(rng.choice([35, 45, 50, 65, 80])),
+            )
+            for i in range(20)
+        )
+        sites = Site.objects.bulk_create(
+            Site(name=f"QBench Site {i}", address=f"{i} Bench St, Nashville, TN")
+            for i in range(50)
+        )
+        start = date.today() - timedelta(days=365 * 6)
+        # Skew towards a few heavy users, as real histories are uneven
+        cum_weights = list(accumulate(1 / (rank + 1) for rank in range(n_users)))
+        games = [
+            Game(
+                user=rng.choices(users, cum_weights=cum_weights)[0],
+                date=start + timedelta(days=rng.randrange(365 * 6)),
+                league=rng.choice(leagues),
+                site=rng.choice(sites),
+                position=rng.choice(POSITIONS),
+                fee=Decimal(rng.choice([40, 55])) if rng.random() < 0.1 else None,
+                fee_paid=rng.random() < 0.8,
+                is_volunteer=rng.random() < 0.05,
+                mileage=round(rng.uniform(0, 60), 1),
+            )
+            for _ in range(n_games)
+        ]
+        for game in games:
+            game.update_effective_fee()
+        Game.objects.bulk_create(games, batch_size=2000)
+        rebuild_trips({u.pk for u in users})
+        rebuild_stats({u.pk for u in users})
+        self.stdout.write(f"Seeded {n_games} games across {n_users} users.")
+        return users[0]
+
+    def report(self, label: str, user: User, repeat: int):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {label} =="))
+        games = Game.objects.filter(user=user)
+        game = games.filter(fee_paid=False).first() or games.first()
+        plans = {
+            "game_list facets": views._facet_rows(games),
+            "game_list page": games.order_by("date", "site__name").values_list(
+                *views.GAME_ROW_COLUMNS
+            ),
+            "game_stats": StatsRollup.objects.filter(user=user).order_by("key"),
+            "toggle_fee_paid": Game.objects.filter(pk=game.pk, user=user),
+        }
+        for name, qs in plans.items():
+            self.stdout.write(f"{name}:\n  " + qs.explain().replace("\n", "\n  "))
+
+        factory = RequestFactory()
+        requests = {
+            "game_list": (views.game_list, factory.get(reverse("game_list")), {}),
+            "game_stats": (views.game_stats, factory.get(reverse("game_stats")), {}),
+            "toggle_fee_paid": (
+                views.toggle_fee_paid,
+                factory.post(reverse("toggle_fee_paid", args=[game.pk])),
+                {"pk": game.pk},
+            ),
+        }
+        for name, (view, request, kwargs) in requests.items():
+            request.user = user
+            best = min(self._time(view, request, kwargs) for _ in range(repeat))
+            self.stdout.write(f"{name}: {best * 1000:.1f} ms")
+
+        # Every user's fee rollup, as rebuild_stats groups it
+        for name, fee in (("effective_fee", "effective_fee"), ("CASE", LEGACY_FEE)):
+            rollup = Game.objects.values("user_id").annotate(**_fee_sums(fee))
+            best = min(self._time(list, rollup.all(), {}) for _ in range(repeat))
+            self.stdout.write(f"fee rollup ({name}): {best * 1000:.1f} ms")
+
+    @staticmethod
+    def _time(view, request, kwargs) -> float:
+        # Every run renders: a cached page would hide the queries under test
+        cache.clear()
+        started = time.perf_counter()
+        view(request, **kwargs)
+        return time.perf_counter() - started
@@ -0,0 +1,97 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from tracker.benchmarks import (
+    as_baseline,
+    benchmark_views,
+    list_memory,
+    regressions,
+    uncovered_url_names,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time every tracker view for one user (default: the busiest bench-N user "
+        "from `manage.py seed_benchmark`), reporting latency percentiles, query "
+        "counts and peak memory, and compare against a stored baseline. Run with "
+        "DEBUG=False (after collectstatic) so the debug toolbar stays out of the "
+        "timings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Username to benchmark")
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument(
+            "--warm-cache",
+            action="store_true",
+            help="Keep the page cache between runs instead of clearing it",
+        )
+        parser.add_argument(
+            "--baseline",
+            default=str(Path(settings.BASE_DIR) / "benchmark_baseline.json"),
+            help="Baseline file to compare against (or write)",
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Write these results as the new baseline",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.5,
+            help="Allowed p95 latency and peak memory growth over the baseline",
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.annotate(games=Count("game"))
+        if options["user"]:
+            user = users.filter(username=options["user"]).first()
+        else:
+            user = users.filter(username__startswith="bench-").order_by("-games")
+            user = user.first()
+        if user is None or not user.games:
+            raise CommandError(
+                "No user with games to benchmark; run `manage.py seed_benchmark`."
+            )
+
+        results = benchmark_views(
+            user, options["repeat"], options["warmup"], options["warm_cache"]
+        )
+        self.stdout.write(f"{user.username}: {user.games} games\n")
+        self.stdout.write(
+            f"{'view':<24}{'status':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'queries':>9}{'peak KiB':>10}"
+        )
+        for r in results:
+            self.stdout.write(
+                f"{r.name:<24}{r.status:>7}{r.p50_ms:>9.1f}{r.p95_ms:>9.1f}{r.p99_ms:>9.1f}"
+                f"{r.queries:>9}{r.peak_kib:>10.1f}"
+            )
+        peaks = list_memory(user)
+        self.stdout.write(
+            f"\nGame list rows for all {user.games} games, peak KiB: "
+            + ", ".join(f"{name} {kib:.1f}" for name, kib in peaks.items())
+        )
+        uncovered = uncovered_url_names(user)
+        if uncovered:
+            self.stderr.write(f"Not benchmarked: {', '.join(sorted(uncovered))}")
+
+        baseline = Path(options["baseline"])
+        if options["save_baseline"]:
+            baseline.write_text(json.dumps(as_baseline(results), indent=2) + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {baseline}."))
+        elif baseline.exists():
+            found = regressions(
+                results, json.loads(baseline.read_text()), options["tolerance"]
+            )
+            if found:
+                raise CommandError("Regressions:\n  " + "\n  ".join(found))
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {baseline}."))
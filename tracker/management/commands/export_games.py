@@ -0,0 +1,38 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from tracker.exports import game_export_rows, stats_export_rows, stream_csv
+from tracker.filters import GameFilters
+from tracker.models import Game
+
+
+class Command(BaseCommand):
+    help = "Write a user's games, or their stats rollup, as CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", required=True, help="Username to export")
+        parser.add_argument("--year", default="", help="Only games from this year")
+        parser.add_argument(
+            "--stats", action="store_true", help="Export the stats rollup instead"
+        )
+        parser.add_argument(
+            "-o", "--output", help="File to write (default: standard output)"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user {options['user']!r}.")
+        if options["stats"]:
+            rows = stats_export_rows(user)
+        else:
+            filters = GameFilters(year=options["year"], paid="all")
+            rows = game_export_rows(filters.apply(Game.objects.filter(user=user)))
+
+        if options["output"]:
+            with open(options["output"], "w", newline="") as out:
+                out.writelines(stream_csv(rows))
+        else:
+            for line in stream_csv(rows):
+                self.stdout.write(line, ending="")
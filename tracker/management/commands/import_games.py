@@ -0,0 +1,45 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from tracker.importers import (
+    IMPORT_CHUNK_SIZE,
+    IMPORT_FORMATS,
+    detect_format,
+    import_games,
+    parse_games,
+)
+
+
+class Command(BaseCommand):
+    help = "Import a user's games from a CSV or iCalendar export."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or .ics file to import")
+        parser.add_argument("--user", required=True, help="Username to import for")
+        parser.add_argument(
+            "--format",
+            choices=IMPORT_FORMATS,
+            help="File format (default: guessed from the file extension)",
+        )
+        parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user {options['user']!r}.")
+        fmt = options["format"] or detect_format(options["path"])
+        with open(options["path"], encoding="utf-8-sig", newline="") as lines:
+            with transaction.atomic():
+                result = import_games(
+                    user, parse_games(lines, fmt), chunk_size=options["chunk_size"]
+                )
+        for error in result.errors:
+            self.stderr.write(error)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {result.created} games, skipped {result.duplicates} "
+                f"duplicates and {len(result.errors)} errors."
+            )
+        )
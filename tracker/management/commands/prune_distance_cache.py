@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tracker.models import DistanceCache
+from tracker.utils import distance_lru
+
+
+class Command(BaseCommand):
+    help = "Delete cached distances older than DISTANCE_CACHE_TTL days."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.DISTANCE_CACHE_TTL,
+            help="Maximum age in days (default: DISTANCE_CACHE_TTL)",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        deleted, _ = DistanceCache.objects.filter(fetched_at__lt=cutoff).delete()
+        distance_lru.clear()
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} cached distances."))
@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tracker.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete records of deleted games, sites and leagues older than "
+        "SYNC_TOMBSTONE_DAYS days; sync clients older than that get a full "
+        "snapshot instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.SYNC_TOMBSTONE_DAYS,
+            help="Maximum age in days (default: SYNC_TOMBSTONE_DAYS)",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        deleted, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} tombstones."))
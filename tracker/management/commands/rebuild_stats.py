@@ -0,0 +1,26 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from tracker.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-user stats rollup table from games."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            action="append",
+            dest="usernames",
+            help="Only rebuild this user's stats (may be repeated)",
+        )
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options["usernames"]:
+            users = User.objects.filter(username__in=options["usernames"])
+            user_ids = set(users.values_list("id", flat=True))
+            if len(user_ids) != len(set(options["usernames"])):
+                raise CommandError("Unknown username in --user.")
+        written = rebuild_stats(user_ids)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} stats rows."))
@@ -0,0 +1,58 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tracker.geo import geocode_missing
+from tracker.tasks import run_distance_tasks, run_prefetch_tasks, run_route_tasks
+from tracker.utils import DistanceError
+
+# Rows saved just before a geocode pass may commit after it has read them
+GEOCODE_OVERLAP = timedelta(minutes=1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill in pending game mileage from the DistanceTask queue, warm "
+        "distances from changed home addresses, plan pending multi-site trip "
+        "routes and geocode new Site and Profile addresses."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true", help="Work the due tasks and exit"
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=5.0,
+            help="Seconds to wait when the queue is empty (default: 5)",
+        )
+
+    def handle(self, *args, **options):
+        # Every address on the first pass, then those saved since the last one
+        # that finished
+        geocoded_since = None
+        while True:
+            done = run_distance_tasks()
+            if done:
+                self.stdout.write(f"Processed {done} distance tasks.")
+            prefetched = run_prefetch_tasks()
+            if prefetched:
+                self.stdout.write(f"Prefetched distances for {prefetched} users.")
+            routed = run_route_tasks()
+            if routed:
+                self.stdout.write(f"Planned {routed} trip routes.")
+            started = timezone.now()
+            try:
+                located = geocode_missing(since=geocoded_since)
+            except DistanceError:
+                pass  # the same rows are checked again next pass
+            else:
+                geocoded_since = started - GEOCODE_OVERLAP
+                if located:
+                    self.stdout.write(f"Geocoded {located} addresses.")
+            if options["once"]:
+                return
+            time.sleep(options["sleep"])
@@ -0,0 +1,53 @@
+import random
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from tracker.benchmarks import delete_histories, seed_histories
+from tracker.models import Game
+
+
+class Command(BaseCommand):
+    help = (
+        "Create bench-N users with realistic multi-season officiating histories "
+        "for `manage.py benchmark_views`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20)
+        parser.add_argument(
+            "--years", type=int, default=10, help="Seasons of history per user"
+        )
+        parser.add_argument(
+            "--games-per-year",
+            type=int,
+            default=200,
+            help="Games a year for the busiest user; the rest taper off",
+        )
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--clear", action="store_true", help="Delete existing benchmark data first"
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options["clear"]:
+                deleted = delete_histories()
+                self.stdout.write(f"Deleted {deleted} benchmark users.")
+            elif User.objects.filter(username__startswith="bench-").exists():
+                raise CommandError("Benchmark data already exists; pass --clear.")
+            users = seed_histories(
+                random.Random(options["seed"]),
+                options["users"],
+                options["years"],
+                options["games_per_year"],
+            )
+        games = Game.objects.filter(user__in=users)
+        busiest = games.filter(user=users[0]).count()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded {games.count()} games for {len(users)} users "
+                f"({users[0].username} has {busiest})."
+            )
+        )
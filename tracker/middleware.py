@@ -0,0 +1,63 @@
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from tracker.timing import collecting
+
+logger = logging.getLogger(__name__)
+
+# Server-Timing metric name for each measured component
+SERVER_TIMING_NAMES = {"db": "db", "template": "tpl", "maps": "maps"}
+
+
+class RequestTimingMiddleware:
+    """Time a sample of requests: queries, template rendering and Maps calls.
+
+    REQUEST_TIMING_SAMPLE_RATE of requests (0 to 1) get a ``Server-Timing``
+    header and one ``tracker.middleware`` log line with the view name, the
+    database query count and time, template render time and Maps API time.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.REQUEST_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+        started = time.perf_counter()
+        with collecting() as timings, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timings.query))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        metrics = [
+            f"{SERVER_TIMING_NAMES[name]};dur={seconds * 1000:.1f}"
+            f';desc="{timings.counts[name]} calls"'
+            for name, seconds in timings.seconds.items()
+        ]
+        metrics.append(f"total;dur={total * 1000:.1f}")
+        response["Server-Timing"] = ", ".join(metrics)
+
+        match = request.resolver_match
+        fields = {
+            "view": match.view_name if match else "",
+            "method": request.method,
+            "status": response.status_code,
+            "total_ms": round(total * 1000, 1),
+            "db_queries": timings.counts.get("db", 0),
+            "db_ms": round(timings.seconds.get("db", 0.0) * 1000, 1),
+            "template_ms": round(timings.seconds.get("template", 0.0) * 1000, 1),
+            "maps_calls": timings.counts.get("maps", 0),
+            "maps_ms": round(timings.seconds.get("maps", 0.0) * 1000, 1),
+        }
+        logger.info(
+            " ".join(f"{key}=%s" for key in fields),
+            *fields.values(),
+            extra={"timing": fields},
+        )
+        return response
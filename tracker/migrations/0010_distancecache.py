@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 16:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tracker", "0009_add_fee_to_game"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="site",
+            options={"ordering": ["name"]},
+        ),
+        migrations.CreateModel(
+            name="DistanceCache",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("origin", models.CharField(max_length=500)),
+                ("destination", models.CharField(max_length=500)),
+                ("miles", models.FloatField()),
+                ("fetched_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("origin", "destination"), name="unique_distance_pair"
+                    )
+                ],
+            },
+        ),
+    ]
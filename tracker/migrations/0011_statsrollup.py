@@ -0,0 +1,114 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_stats(apps, schema_editor):
+    # Frozen copy of tracker.stats.rollup_rows against the historical models
+    Game = apps.get_model("tracker", "Game")
+    StatsRollup = apps.get_model("tracker", "StatsRollup")
+    eff_fee = models.Case(
+        models.When(fee__isnull=False, then=models.F("fee")),
+        default=models.F("league__game_fee"),
+        output_field=models.DecimalField(max_digits=6, decimal_places=2),
+    )
+    annotations = dict(
+        count=models.Count("id"),
+        total_fees=models.Sum(eff_fee),
+        paid_fees=models.Sum(eff_fee, filter=models.Q(fee_paid=True)),
+        unpaid_fees=models.Sum(
+            eff_fee, filter=models.Q(fee_paid=False, is_volunteer=False)
+        ),
+        total_mileage=models.Sum("mileage"),
+    )
+    dimensions = {
+        "year": "date__year",
+        "league": "league__organization",
+        "assignor": "league__assignor",
+        "position": "position",
+        "site": "site__name",
+    }
+    games = Game.objects.filter(user__isnull=False).order_by()
+    buckets = {}
+    for dimension, lookup in dimensions.items():
+        for row in games.values("user_id", lookup).annotate(**annotations):
+            key = "" if row[lookup] is None else str(row[lookup])
+            totals = buckets.setdefault(
+                (row["user_id"], dimension, key), dict.fromkeys(annotations, 0)
+            )
+            for name in annotations:
+                totals[name] += row[name] or 0
+    StatsRollup.objects.bulk_create(
+        StatsRollup(user_id=user_id, dimension=dimension, key=key, **totals)
+        for (user_id, dimension, key), totals in buckets.items()
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tracker", "0010_distancecache"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StatsRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "dimension",
+                    models.CharField(
+                        choices=[
+                            ("year", "Year"),
+                            ("league", "League"),
+                            ("assignor", "Assignor"),
+                            ("position", "Position"),
+                            ("site", "Site"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("key", models.CharField(blank=True, max_length=100)),
+                ("count", models.PositiveIntegerField(default=0)),
+                (
+                    "total_fees",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=10),
+                ),
+                (
+                    "paid_fees",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=10),
+                ),
+                (
+                    "unpaid_fees",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=10),
+                ),
+                ("total_mileage", models.FloatField(default=0.0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "dimension", "key"),
+                        name="unique_stats_rollup",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,153 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:41, squashed from 0014-0016
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_trips(apps, schema_editor):
+    # Frozen copy of tracker.trips.rebuild_trips without route planning:
+    # every day's mileage is the home -> sites -> home loop, driving to each
+    # site separately until run_distance_worker plans the route_pending
+    # multi-site days. Rollup mileage is then re-summed from each game's
+    # share of its trip.
+    Game = apps.get_model("tracker", "Game")
+    Profile = apps.get_model("tracker", "Profile")
+    StatsRollup = apps.get_model("tracker", "StatsRollup")
+    Trip = apps.get_model("tracker", "Trip")
+    games = Game.objects.filter(user__isnull=False)
+
+    origins = {}
+    for p in Profile.objects.all():
+        parts = [p.home_address, p.city, p.state, p.zip_code]
+        origins[p.user_id] = ", ".join(filter(None, parts)) or p.location
+    days = {}
+    for game in games.select_related("site").order_by("user_id", "date").iterator():
+        legs = days.setdefault((game.user_id, game.date), {})
+        site, miles, paid, count = legs.get(game.site_id, (game.site, 0, True, 0))
+        legs[game.site_id] = (
+            site,
+            max(miles, game.mileage),
+            paid and game.mileage_paid,
+            count + 1,
+        )
+    trips = []
+    for (user_id, day), legs in days.items():
+        sites = sorted(
+            (leg[0] for leg in legs.values() if leg[0]), key=lambda s: s.name
+        )
+        if len(sites) > 1:
+            mileage = round(2 * sum(leg[1] for leg in legs.values()), 1)
+        else:
+            mileage = round(2 * max(leg[1] for leg in legs.values()), 1)
+        trips.append(
+            Trip(
+                user_id=user_id,
+                date=day,
+                origin=origins.get(user_id) or settings.DEFAULT_ADDRESS,
+                route=[site.pk for site in sites],
+                route_pending=len(sites) > 1,
+                mileage=mileage,
+                mileage_paid=mileage > 0 and all(leg[2] for leg in legs.values()),
+                game_count=sum(leg[3] for leg in legs.values()),
+            )
+        )
+    Trip.objects.bulk_create(trips, batch_size=1000)
+    same_day = Trip.objects.filter(
+        user_id=models.OuterRef("user_id"), date=models.OuterRef("date")
+    )
+    games.update(trip=models.Subquery(same_day.values("pk")[:1]))
+
+    share = models.Case(
+        models.When(
+            trip__game_count__gt=0,
+            then=models.F("trip__mileage") / models.F("trip__game_count"),
+        ),
+        default=0.0,
+        output_field=models.FloatField(),
+    )
+    dimensions = {
+        "year": "date__year",
+        "league": "league__organization",
+        "assignor": "league__assignor",
+        "position": "position",
+        "site": "site__name",
+    }
+    for dimension, lookup in dimensions.items():
+        miles = {}
+        for row in (
+            games.order_by()
+            .values("user_id", lookup)
+            .annotate(total_mileage=models.Sum(share))
+        ):
+            key = (row["user_id"], "" if row[lookup] is None else str(row[lookup]))
+            miles[key] = miles.get(key, 0) + (row["total_mileage"] or 0)
+        for (user_id, key), total in miles.items():
+            StatsRollup.objects.filter(
+                user_id=user_id, dimension=dimension, key=key
+            ).update(total_mileage=total)
+
+
+class Migration(migrations.Migration):
+    replaces = [
+        ("tracker", "0014_trip"),
+        ("tracker", "0015_trip_route"),
+        ("tracker", "0016_trip_unique_trip_day"),
+    ]
+
+    dependencies = [
+        ("tracker", "0013_game_mileage_pending_distancetask"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Trip",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("origin", models.CharField(blank=True, max_length=500)),
+                ("route", models.JSONField(blank=True, default=list)),
+                ("route_pending", models.BooleanField(default=False)),
+                ("mileage", models.FloatField(default=0.0)),
+                ("mileage_paid", models.BooleanField(default=False)),
+                ("game_count", models.PositiveSmallIntegerField(default=0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["date"],
+            },
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="trip",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="games",
+                to="tracker.trip",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="trip",
+            constraint=models.UniqueConstraint(
+                fields=("user", "date"), name="unique_trip_day"
+            ),
+        ),
+        migrations.RunPython(backfill_trips, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tracker", "0014_trip_squashed_0016_trip_unique_trip_day"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="location",
+            name="geocoded_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name="location",
+            name="address",
+            field=models.CharField(db_index=True, max_length=500),
+        ),
+        migrations.AlterField(
+            model_name="location",
+            name="latitude",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="location",
+            name="longitude",
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:11
+
+from django.db import migrations, models
+
+
+def fill_effective_fee(apps, schema_editor):
+    Game = apps.get_model("tracker", "Game")
+    League = apps.get_model("tracker", "League")
+    Game.objects.filter(fee__isnull=False).update(effective_fee=models.F("fee"))
+    league_fee = League.objects.filter(pk=models.OuterRef("league_id"))
+    Game.objects.filter(fee__isnull=True).update(
+        effective_fee=models.Subquery(league_fee.values("game_fee")[:1])
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tracker", "0019_payment"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="effective_fee",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, editable=False, max_digits=6, null=True
+            ),
+        ),
+        migrations.RunPython(fill_effective_fee, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tracker", "0021_sync_tokens"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PageVersion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("user_id", models.IntegerField()),
+                ("scope", models.CharField(max_length=7)),
+                ("version", models.BigIntegerField()),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user_id", "scope"), name="unique_page_version"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.contrib.auth.models import User
 from django.db import models
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.utils import timezone
 
 
 class Profile(models.Model):
@@ -24,6 +25,8 @@ class Profile(models.Model):
 
     # Legacy field - kept for backwards compatibility
     location = models.CharField(max_length=100, blank=True)
+    # Lets run_distance_worker geocode only homes changed since its last pass
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         if self.first_name and self.last_name:
@@ -56,15 +59,40 @@ def save_user_profile(sender, instance, **kwargs):
 
 
 class Location(models.Model):
+    """Geocoded coordinates of a normalized Site or Profile address.
+
+    Latitude and longitude are null when the address could not be geocoded.
+    """
+
     name = models.CharField(max_length=100)
-    latitude = models.FloatField()
-    longitude = models.FloatField()
-    address = models.CharField(max_length=255)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    address = models.CharField(max_length=500, db_index=True)
+    geocoded_at = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
         return self.name
 
 
+class DistanceCache(models.Model):
+    """Driving distance between two normalized addresses, cached from the Maps API."""
+
+    origin = models.CharField(max_length=500)
+    destination = models.CharField(max_length=500)
+    miles = models.FloatField()
+    fetched_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["origin", "destination"], name="unique_distance_pair"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.origin} -> {self.destination} ({self.miles} mi)"
+
+
 class Game(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True)
     date = models.DateField()
@@ -73,22 +101,129 @@ class Game(models.Model):
     # Many-to-One: many games can belong to the same league/organization
     league = models.ForeignKey("League", on_delete=models.SET_NULL, null=True)
     fee = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    # fee, or the league's game_fee when unset; kept current on save and by
+    # the League signals so aggregates are a plain SUM over this table
+    effective_fee = models.DecimalField(
+        max_digits=6, decimal_places=2, null=True, blank=True, editable=False
+    )
     fee_paid = models.BooleanField(default=False)
     is_volunteer = models.BooleanField(default=False)
     mileage = models.FloatField(default=0.0)
     mileage_paid = models.BooleanField(default=False)
+    # True while a DistanceTask is waiting to fill in mileage
+    mileage_pending = models.BooleanField(default=False)
     position = models.CharField(max_length=50, blank=True, null=True)
+    # Day's trip this game was driven on, kept current by signals
+    trip = models.ForeignKey(
+        "Trip", on_delete=models.SET_NULL, null=True, blank=True, related_name="games"
+    )
+    # Deposit this game's fee was reconciled against
+    payment = models.ForeignKey(
+        "Payment",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="games",
+    )
+    # Read by sync clients for changes since their last token; bulk
+    # UPDATEs of synced fields must set it too
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Game on {self.date} at {self.site}"
 
+    def update_effective_fee(self):
+        """Set ``effective_fee`` from ``fee`` and the league's ``game_fee``."""
+        if self.fee is not None:
+            self.effective_fee = self.fee
+        else:
+            self.effective_fee = self.league.game_fee if self.league else None
+
+    def save(self, *args, **kwargs):
+        self.update_effective_fee()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            extra = {"updated_at"}
+            if {"fee", "league"} & set(update_fields):
+                extra.add("effective_fee")
+            kwargs["update_fields"] = {*update_fields, *extra}
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ["date"]
+        indexes = [
+            models.Index(fields=["user", "date"], name="game_user_date_idx"),
+            models.Index(
+                fields=["user", "fee_paid", "is_volunteer"], name="game_user_paid_idx"
+            ),
+            models.Index(fields=["user", "league"], name="game_user_league_idx"),
+            models.Index(fields=["user", "position"], name="game_user_position_idx"),
+            models.Index(fields=["user", "updated_at"], name="game_user_updated_idx"),
+        ]
+
+
+class Trip(models.Model):
+    """One day's drive from home to every site the user worked, and back."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    date = models.DateField()
+    origin = models.CharField(max_length=500, blank=True)
+    # Site ids in visiting order
+    route = models.JSONField(default=list, blank=True)
+    # True while a multi-site route is waiting on uncached distances
+    route_pending = models.BooleanField(default=False)
+    mileage = models.FloatField(default=0.0)
+    mileage_paid = models.BooleanField(default=False)
+    game_count = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ["date"]
+        constraints = [
+            models.UniqueConstraint(fields=["user", "date"], name="unique_trip_day")
+        ]
+
+    def __str__(self):
+        return f"Trip on {self.date} ({self.mileage} mi)"
+
+
+class DistanceTask(models.Model):
+    """Queued mileage lookup for a game, worked by ``run_distance_worker``."""
+
+    game = models.OneToOneField(Game, on_delete=models.CASCADE)
+    origin = models.CharField(max_length=500)
+    destination = models.CharField(max_length=500)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now, db_index=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Mileage for game {self.game_id} (attempt {self.attempts + 1})"
+
+
+class DistancePrefetch(models.Model):
+    """Queued warm-up of distances from a user's new home address to their sites.
+
+    Worked by ``run_distance_worker``; with ``recompute_mileage`` the user's
+    games whose mileage is not yet paid are updated to the new distances.
+    """
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE)
+    origin = models.CharField(max_length=500)
+    recompute_mileage = models.BooleanField(default=False)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now, db_index=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Distances from {self.origin} for {self.user}"
 
 
 class Site(models.Model):
     name = models.CharField(max_length=100, unique=True, blank=False, null=False)
     address = models.CharField(max_length=255, blank=False, null=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ["name"]
@@ -104,6 +239,109 @@ class League(models.Model):
     assignor = models.CharField(max_length=100, blank=False, null=False)
     game_fee = models.DecimalField(max_digits=6, decimal_places=2, blank=False)
     description = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.organization
+
+
+class StatsRollup(models.Model):
+    """Per-user game totals for one stats dimension value, kept current by signals."""
+
+    DIMENSION_CHOICES = [
+        ("year", "Year"),
+        ("league", "League"),
+        ("assignor", "Assignor"),
+        ("position", "Position"),
+        ("site", "Site"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES)
+    key = models.CharField(max_length=100, blank=True)
+    count = models.PositiveIntegerField(default=0)
+    total_fees = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    paid_fees = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    unpaid_fees = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    total_mileage = models.FloatField(default=0.0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "dimension", "key"], name="unique_stats_rollup"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.dimension}={self.key or '—'} ({self.count} games)"
+
+
+class Payment(models.Model):
+    """A lump-sum deposit from a league or assignor, matched to unpaid games."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    date = models.DateField()
+    amount = models.DecimalField(max_digits=8, decimal_places=2)
+    # Payer: narrows the games the deposit can be matched against
+    league = models.ForeignKey(League, on_delete=models.SET_NULL, null=True, blank=True)
+    assignor = models.CharField(max_length=100, blank=True)
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-date"]
+
+    def __str__(self):
+        payer = self.league or self.assignor or "Unknown payer"
+        return f"${self.amount} from {payer} on {self.date}"
+
+
+class Tombstone(models.Model):
+    """A deleted Game, Site or League, kept so sync clients can drop it too."""
+
+    MODEL_CHOICES = [
+        ("game", "Game"),
+        ("site", "Site"),
+        ("league", "League"),
+    ]
+
+    model = models.CharField(max_length=10, choices=MODEL_CHOICES)
+    object_id = models.PositiveIntegerField()
+    # Owner of a deleted game; sites and leagues are shared. Not a foreign
+    # key, since deleting a user deletes their games along with it
+    user_id = models.IntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user_id", "deleted_at"], name="tombstone_user_deleted_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} deleted {self.deleted_at}"
+
+
+class PageVersion(models.Model):
+    """Version of one scope of a user's cached pages, bumped when it changes.
+
+    Held in the database rather than the cache so every process, web
+    worker or distance worker, sees the same versions.
+    """
+
+    # Not a foreign key: games deleted along with their user still bump it
+    user_id = models.IntegerField()
+    # "pages", "months" (every month fragment) or one month as "YYYY-MM"
+    scope = models.CharField(max_length=7)
+    version = models.BigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user_id", "scope"], name="unique_page_version"
+            )
+        ]
+
+    def __str__(self):
+        return f"user {self.user_id} {self.scope} v{self.version}"
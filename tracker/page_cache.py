@@ -0,0 +1,116 @@
+import hashlib
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+
+from tracker.models import PageVersion
+
+# PageVersion scopes: every page, every month fragment, or one "YYYY-MM" month
+PAGES = "pages"
+MONTHS = "months"
+
+
+def _versions(user_id: int, scopes) -> dict[str, int]:
+    """``user_id``'s version of each of ``scopes``, 0 if never bumped."""
+    found = dict(
+        PageVersion.objects.filter(user_id=user_id, scope__in=scopes).values_list(
+            "scope", "version"
+        )
+    )
+    return {scope: found.get(scope, 0) for scope in scopes}
+
+
+def page_version(user_id: int) -> int:
+    """Current version of ``user_id``'s cached pages."""
+    return _versions(user_id, [PAGES])[PAGES]
+
+
+def _bump(scopes) -> None:
+    """Give each (user_id, scope) of ``scopes`` a new version.
+
+    Versions live in the database, not the cache, so a bump made by any
+    process (another web worker, or run_distance_worker) retires every
+    process's cached copies, and it takes effect when the transaction
+    making the change commits.
+    """
+    version = time.time_ns()
+    PageVersion.objects.bulk_create(
+        [
+            PageVersion(user_id=uid, scope=scope, version=version)
+            for uid, scope in scopes
+        ],
+        update_conflicts=True,
+        unique_fields=["user_id", "scope"],
+        update_fields=["version"],
+    )
+
+
+def invalidate_user_pages(user_ids) -> None:
+    """Retire every cached page of ``user_ids``; stale entries simply expire."""
+    _bump({(uid, scope) for uid in user_ids if uid for scope in (PAGES, MONTHS)})
+
+
+def invalidate_user_months(days) -> None:
+    """Retire the pages of the users in ``(user_id, day)`` pairs, but only
+    those days' months of their ``cached_months`` fragments.
+
+    For changes known to touch only those days' games; anything wider
+    goes through ``invalidate_user_pages``.
+    """
+    days = [(uid, day) for uid, day in days if uid]
+    _bump(
+        {(uid, PAGES) for uid, _ in days} | {(uid, f"{day:%Y-%m}") for uid, day in days}
+    )
+
+
+def cached_page(user_id: int, name: str, variant: str, build):
+    """``build()`` for one of ``user_id``'s pages, cached until it changes.
+
+    ``variant`` (e.g. the query string) tells apart renderings of the same
+    page. Entries live for PAGE_CACHE_TTL seconds at most and are retired
+    early by ``invalidate_user_pages``.
+    """
+    digest = hashlib.md5(variant.encode()).hexdigest()
+    key = f"pages:{name}:{user_id}:{page_version(user_id)}:{digest}"
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, settings.PAGE_CACHE_TTL)
+    return value
+
+
+def _month_versions(user_id: int, months) -> dict[date, str]:
+    scopes = {month: f"{month:%Y-%m}" for month in months}
+    versions = _versions(user_id, [MONTHS, *scopes.values()])
+    return {
+        month: f"{versions[MONTHS]}.{versions[scope]}"
+        for month, scope in scopes.items()
+    }
+
+
+def cached_months(user_id: int, name: str, variants: dict, render) -> dict[date, str]:
+    """Per-month fragments of one of ``user_id``'s pages, each cached alone.
+
+    ``variants`` maps each month (its first day) to what tells apart its
+    renderings. ``render(months)`` returns the fragments missing from the
+    cache, keyed by month, so they can be built together. A month's entry
+    is retired by ``invalidate_user_months`` for that month, or by
+    ``invalidate_user_pages``; other months stay cached.
+    """
+    versions = _month_versions(user_id, variants)
+    keys = {
+        month: f"pages:{name}:{user_id}:{versions[month]}:"
+        + hashlib.md5(variant.encode()).hexdigest()
+        for month, variant in variants.items()
+    }
+    found = cache.get_many(keys.values())
+    missing = [month for month in variants if keys[month] not in found]
+    if missing:
+        fresh = render(missing)
+        cache.set_many(
+            {keys[month]: fresh[month] for month in missing}, settings.PAGE_CACHE_TTL
+        )
+        found.update((keys[month], fresh[month]) for month in missing)
+    return {month: found[keys[month]] for month in variants}
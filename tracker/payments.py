@@ -0,0 +1,166 @@
+from decimal import Decimal
+from math import gcd, isqrt
+
+from django.db import transaction
+from django.db.models import BooleanField, Exists, ExpressionWrapper, OuterRef, Q
+from django.utils import timezone
+
+from tracker.models import Game, Payment, Trip
+from tracker.page_cache import invalidate_user_pages
+from tracker.stats import rebuild_stats
+
+# Largest target, in units of the fees' common divisor, best_subset searches
+# exactly: $100,000 at one-cent granularity, about 1.2 MiB per set of sums
+MAX_SUBSET_TARGET = 10_000_000
+
+
+def mark_paid(
+    games, fees: bool = True, mileage: bool = False, payment: Payment | None = None
+) -> dict[str, int]:
+    """Mark ``games`` fee and/or mileage paid with one UPDATE per field.
+
+    Volunteer games owe no fee and are left alone; fees marked paid are
+    linked to ``payment`` when given. ``update()`` skips the Game signals,
+    so the owners' rollups, cached pages and the touched trips'
+    ``mileage_paid`` are refreshed here. Returns the number of games
+    changed, keyed by field.
+    """
+    changed = {"fee_paid": 0, "mileage_paid": 0}
+    user_ids = set(games.values_list("user_id", flat=True).distinct())
+    with transaction.atomic():
+        if fees:
+            owed = games.filter(fee_paid=False, is_volunteer=False)
+            values = {"fee_paid": True, "updated_at": timezone.now()}
+            if payment is not None:
+                values["payment"] = payment
+            changed["fee_paid"] = owed.update(**values)
+            if changed["fee_paid"]:
+                rebuild_stats(user_ids)
+        if mileage:
+            owed = games.filter(mileage_paid=False)
+            trip_ids = set(owed.values_list("trip_id", flat=True).distinct())
+            changed["mileage_paid"] = owed.update(
+                mileage_paid=True, updated_at=timezone.now()
+            )
+            if changed["mileage_paid"]:
+                _refresh_trips_paid(trip_ids - {None})
+    if any(changed.values()):
+        invalidate_user_pages(user_ids)
+    return changed
+
+
+def _refresh_trips_paid(trip_ids) -> None:
+    """Recompute ``mileage_paid`` on trips ``trip_ids`` in one UPDATE."""
+    unpaid = Game.objects.filter(trip=OuterRef("pk"), mileage_paid=False)
+    Trip.objects.filter(pk__in=trip_ids).update(
+        mileage_paid=ExpressionWrapper(
+            Q(mileage__gt=0) & ~Exists(unpaid), output_field=BooleanField()
+        )
+    )
+
+
+def cents(amount: Decimal) -> int:
+    """``amount`` dollars as a whole number of cents."""
+    return int(amount.quantize(Decimal("0.01")) * 100)
+
+
+def _oldest_first(target: int, items) -> list[int]:
+    """Indexes of ``items`` taken in order whenever the next one still fits."""
+    chosen = []
+    for index, value in items:
+        if value <= target:
+            chosen.append(index)
+            target -= value
+    return chosen
+
+
+def best_subset(target: int, values: list[int]) -> list[int]:
+    """Indexes of ``values`` summing closest to ``target`` without going over.
+
+    A subset-sum over the values' common divisor: every reachable sum is a
+    bit of one integer, so each value costs a shift and an OR. Earlier
+    values are preferred when several subsets reach the same sum, and
+    values after the first exact match are not looked at.
+
+    Only every ``stride``-th set of sums is kept; backtracking rebuilds one
+    block at a time from them, so memory grows with the square root of the
+    number of values. Targets over MAX_SUBSET_TARGET divisor units take
+    values oldest first instead.
+    """
+    items = [(i, value) for i, value in enumerate(values) if 0 < value <= target]
+    if not items:
+        return []
+    # No subset sums past every value, so sums beyond that need no bits
+    target = min(target, sum(value for _, value in items))
+    step = gcd(*(value for _, value in items))
+    if target // step > MAX_SUBSET_TARGET:
+        return _oldest_first(target, items)
+    target //= step
+    mask = (1 << target + 1) - 1
+    sizes = [value // step for _, value in items]
+    stride = isqrt(len(items)) + 1
+    # checkpoints[b]: the sums the first b * stride items can make
+    checkpoints = [1]
+    sums, count = 1, 0
+    for size in sizes:
+        sums = (sums | sums << size) & mask
+        count += 1
+        if count % stride == 0:
+            checkpoints.append(sums)
+        if sums >> target & 1:
+            break
+    total = sums.bit_length() - 1
+    chosen = []
+    for block in range(count // stride, -1, -1):
+        first, last = block * stride, min(block * stride + stride, count)
+        # reach[k - first]: the sums the first k items can make
+        reach = [checkpoints[block]]
+        for size in sizes[first : last - 1]:
+            reach.append((reach[-1] | reach[-1] << size) & mask)
+        for k in range(last - 1, first - 1, -1):
+            if total and not reach[k - first] >> total & 1:
+                chosen.append(items[k][0])
+                total -= sizes[k]
+    return sorted(chosen)
+
+
+def outstanding_games(payment: Payment):
+    """Unpaid games ``payment`` could cover, oldest first.
+
+    Limited to the payer's league or assignor when set, and to games played
+    on or before the deposit.
+    """
+    games = Game.objects.filter(
+        user_id=payment.user_id,
+        fee_paid=False,
+        is_volunteer=False,
+        date__lte=payment.date,
+    )
+    if payment.league_id:
+        games = games.filter(league_id=payment.league_id)
+    if payment.assignor:
+        games = games.filter(league__assignor=payment.assignor)
+    return games.filter(effective_fee__gt=0).order_by("date", "pk")
+
+
+def reconcile(payment: Payment) -> list[Game]:
+    """Mark paid the oldest unpaid games whose fees best add up to ``payment``.
+
+    The matched fees sum to the amount exactly when some set of games can,
+    and otherwise come as close as possible without exceeding it. Games are
+    locked, matched and marked in one transaction. Returns the matched
+    games.
+    """
+    with transaction.atomic():
+        games = list(outstanding_games(payment).select_for_update(of=("self",)))
+        chosen = best_subset(
+            cents(payment.amount), [cents(game.effective_fee) for game in games]
+        )
+        matched = [games[i] for i in chosen]
+        mark_paid(
+            Game.objects.filter(pk__in=[game.pk for game in matched]),
+            payment=payment,
+        )
+        payment.reconciled_at = timezone.now()
+        payment.save(update_fields=["reconciled_at"])
+    return matched
@@ -0,0 +1,35 @@
+from itertools import permutations
+
+# A Distance Matrix request holds 100 elements: home plus 9 stops, squared
+MAX_ROUTE_STOPS = 9
+# Orderings are tried exhaustively up to this many stops (7! = 5040)
+MAX_EXACT_STOPS = 7
+
+
+def route_miles(origin: str, stops, miles: dict) -> float:
+    """Length of the loop origin -> each of ``stops`` in order -> origin.
+
+    ``miles`` maps (from, to) address pairs to miles; a missing pair raises
+    KeyError.
+    """
+    path = [origin, *stops, origin]
+    return round(sum(miles[leg] for leg in zip(path, path[1:])), 1)
+
+
+def plan_route(origin: str, stops, miles: dict) -> tuple[list[str], float]:
+    """Shortest origin -> ``stops`` -> origin ordering and its length in miles.
+
+    Every ordering is tried for up to MAX_EXACT_STOPS stops; longer days
+    use nearest-neighbour from the origin. Raises KeyError if ``miles`` is
+    missing a pair the route needs.
+    """
+    stops = list(dict.fromkeys(stops))
+    if len(stops) <= MAX_EXACT_STOPS:
+        best = min(permutations(stops), key=lambda p: route_miles(origin, p, miles))
+        return list(best), route_miles(origin, best, miles)
+    order, here, left = [], origin, set(stops)
+    while left:
+        here = min(left, key=lambda stop: (miles[here, stop], stop))
+        order.append(here)
+        left.remove(here)
+    return order, route_miles(origin, order, miles)
@@ -0,0 +1,193 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from tracker.geo import geocode
+from tracker.models import Game, League, Profile, Site, Tombstone
+from tracker.page_cache import invalidate_user_months, invalidate_user_pages
+from tracker.stats import rebuild_stats, stats_keys
+from tracker.tasks import enqueue_prefetch, prefetch_distances
+from tracker.trips import rebuild_trips, refresh_trips, trip_key
+from tracker.utils import DistanceError, forget_address, normalize_address
+
+PROFILE_ADDRESS_FIELDS = {"home_address", "city", "state", "zip_code", "location"}
+
+
+@receiver(pre_save, sender=Site)
+def forget_old_site_address(sender, instance, **kwargs):
+    if not instance.pk:
+        return
+    old = Site.objects.filter(pk=instance.pk).values_list("address", flat=True).first()
+    if old and normalize_address(old) != normalize_address(instance.address):
+        forget_address(old)
+
+
+@receiver(pre_save, sender=Profile)
+def forget_old_profile_address(sender, instance, update_fields=None, **kwargs):
+    instance._address_changed = False
+    if not instance.pk:
+        return
+    if update_fields is not None and not PROFILE_ADDRESS_FIELDS & set(update_fields):
+        return
+    old = Profile.objects.filter(pk=instance.pk).first()
+    if old is None:
+        return
+    old_address = old.full_address
+    if normalize_address(old_address) != normalize_address(instance.full_address):
+        instance._address_changed = bool(instance.full_address)
+        if old_address:
+            forget_address(old_address)
+
+
+@receiver(post_save, sender=Profile)
+def prefetch_new_address_distances(sender, instance, raw=False, **kwargs):
+    if raw or not getattr(instance, "_address_changed", False):
+        return
+    recompute = getattr(instance, "_recompute_mileage", False)
+    if not settings.DISTANCE_LOOKUP_ASYNC:
+        try:
+            prefetch_distances(instance.user_id, instance.full_address, recompute)
+            return
+        except DistanceError:
+            pass  # retried by run_distance_worker
+    enqueue_prefetch(instance.user, instance.full_address, recompute)
+
+
+@receiver(post_save, sender=Site)
+@receiver(post_save, sender=Profile)
+def geocode_saved_address(sender, instance, raw=False, **kwargs):
+    # With async lookups run_distance_worker geocodes new addresses instead
+    if raw or settings.DISTANCE_LOOKUP_ASYNC:
+        return
+    if sender is Site:
+        address, name = instance.address, instance.name
+    else:
+        address, name = instance.full_address, f"Home of {instance.user}"
+    if address:
+        try:
+            geocode(address, name)
+        except DistanceError:
+            pass  # estimates stay unavailable until the next save or worker run
+
+
+@receiver(pre_save, sender=Game)
+def remember_game_stats_keys(sender, instance, raw=False, **kwargs):
+    old = None
+    if instance.pk and not raw:
+        games = Game.objects.select_related("league", "site")
+        old = games.filter(pk=instance.pk).first()
+    instance._stats_before = (
+        (old.user_id, stats_keys(old), trip_key(old)) if old else None
+    )
+
+
+@receiver(post_save, sender=Game)
+def refresh_game_stats(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    trips = {trip_key(instance)}
+    buckets = {instance.user_id: stats_keys(instance)}
+    before = getattr(instance, "_stats_before", None)
+    if before:
+        old_user_id, old_buckets, old_trip = before
+        trips.add(old_trip)
+        buckets.setdefault(old_user_id, set()).update(old_buckets)
+    games = refresh_trips(trips, buckets)
+    instance.trip_id = next((g.trip_id for g in games if g.pk == instance.pk), None)
+    # Only the old and new dates' games (and trips) changed
+    invalidate_user_months(trips)
+
+
+@receiver(post_delete, sender=Game)
+def refresh_deleted_game_stats(sender, instance, **kwargs):
+    refresh_trips({trip_key(instance)}, {instance.user_id: stats_keys(instance)})
+    invalidate_user_months({trip_key(instance)})
+
+
+@receiver(post_delete, sender=Game)
+@receiver(post_delete, sender=Site)
+@receiver(post_delete, sender=League)
+def record_tombstone(sender, instance, **kwargs):
+    Tombstone.objects.create(
+        model=sender._meta.model_name,
+        object_id=instance.pk,
+        user_id=instance.user_id if sender is Game else None,
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_new_user_pages(sender, instance, created, raw=False, **kwargs):
+    # A reused pk must not be served a deleted user's cached pages
+    if created and not raw:
+        invalidate_user_pages({instance.pk})
+
+
+def _stats_user_ids(field: str, pk: int) -> set[int]:
+    """Users with games pointing at the League or Site ``pk`` via ``field``."""
+    games = Game.objects.filter(**{field: pk}, user__isnull=False)
+    return set(games.values_list("user_id", flat=True))
+
+
+def _remember_stats_users(instance, field: str, watched: tuple[str, ...]):
+    """Stash the users whose rollups change with ``instance``'s ``watched`` fields."""
+    instance._stats_users = None
+    if not instance.pk:
+        return
+    old = type(instance).objects.filter(pk=instance.pk).values(*watched).first()
+    if old and any(old[name] != getattr(instance, name) for name in watched):
+        instance._stats_users = _stats_user_ids(field, instance.pk)
+
+
+@receiver(pre_save, sender=League)
+def remember_league_stats_users(sender, instance, raw=False, **kwargs):
+    if not raw:
+        watched = ("organization", "assignor", "game_fee")
+        _remember_stats_users(instance, "league", watched)
+
+
+@receiver(pre_save, sender=Site)
+def remember_site_stats_users(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _remember_stats_users(instance, "site", ("name", "address"))
+
+
+@receiver(pre_delete, sender=League)
+@receiver(pre_delete, sender=Site)
+def remember_deleted_stats_users(sender, instance, **kwargs):
+    field = "league" if sender is League else "site"
+    instance._stats_users = _stats_user_ids(field, instance.pk)
+
+
+@receiver(post_save, sender=League)
+@receiver(post_delete, sender=League)
+def sync_league_effective_fees(sender, instance, raw=False, **kwargs):
+    # Runs before the rollups are rebuilt; games with their own fee keep it
+    if raw:
+        return
+    games = Game.objects.filter(fee__isnull=True)
+    if kwargs["signal"] is post_delete:
+        # the delete already cleared these games' league
+        games.filter(league__isnull=True, effective_fee__isnull=False).update(
+            effective_fee=None, updated_at=timezone.now()
+        )
+    else:
+        games.filter(league=instance).exclude(effective_fee=instance.game_fee).update(
+            effective_fee=instance.game_fee, updated_at=timezone.now()
+        )
+
+
+@receiver(post_save, sender=League)
+@receiver(post_save, sender=Site)
+@receiver(post_delete, sender=League)
+@receiver(post_delete, sender=Site)
+def rebuild_dependent_stats(sender, instance, **kwargs):
+    user_ids = getattr(instance, "_stats_users", None)
+    if user_ids:
+        if sender is Site:
+            # Routes visit the site's address, and a delete clears it from
+            # games in a bulk UPDATE, so replan the users' trips
+            rebuild_trips(user_ids)
+        rebuild_stats(user_ids)
+        invalidate_user_pages(user_ids)
@@ -0,0 +1,101 @@
+from django.db.models import Case, Count, F, FloatField, Q, Sum, When
+
+from tracker.models import Game, StatsRollup
+
+# A game's share of its trip's mileage, so a doubleheader's drive is summed once
+TRIP_MILEAGE_SHARE = Case(
+    When(trip__game_count__gt=0, then=F("trip__mileage") / F("trip__game_count")),
+    default=0.0,
+    output_field=FloatField(),
+)
+
+STAT_ANNOTATIONS = dict(
+    count=Count("id"),
+    total_fees=Sum("effective_fee"),
+    paid_fees=Sum("effective_fee", filter=Q(fee_paid=True)),
+    unpaid_fees=Sum("effective_fee", filter=Q(fee_paid=False, is_volunteer=False)),
+    total_mileage=Sum(TRIP_MILEAGE_SHARE),
+)
+
+# Stats dimension -> Game lookup it groups by
+STATS_DIMENSIONS = {
+    "year": "date__year",
+    "league": "league__organization",
+    "assignor": "league__assignor",
+    "position": "position",
+    "site": "site__name",
+}
+
+
+def _key(value) -> str:
+    return "" if value is None else str(value)
+
+
+TOTALS = ("count", "total_fees", "paid_fees", "unpaid_fees", "total_mileage")
+
+
+def _totals(row: dict) -> dict:
+    return {name: row[name] or 0 for name in TOTALS}
+
+
+def stats_keys(game: Game) -> set[tuple[str, str]]:
+    """The (dimension, key) rollup buckets ``game`` counts towards."""
+    league, site = game.league, game.site
+    values = {
+        "year": game.date.year,
+        "league": league.organization if league else None,
+        "assignor": league.assignor if league else None,
+        "position": game.position,
+        "site": site.name if site else None,
+    }
+    return {(dimension, _key(value)) for dimension, value in values.items()}
+
+
+def rollup_rows(games):
+    """Rollup field values for every user and bucket covered by ``games``."""
+    games = games.filter(user__isnull=False).order_by()
+    buckets = {}
+    for dimension, lookup in STATS_DIMENSIONS.items():
+        for row in games.values("user_id", lookup).annotate(**STAT_ANNOTATIONS):
+            # NULL and blank positions share the "" bucket
+            totals = buckets.setdefault(
+                (row["user_id"], dimension, _key(row[lookup])), dict.fromkeys(TOTALS, 0)
+            )
+            for name in TOTALS:
+                totals[name] += row[name] or 0
+    for (user_id, dimension, key), totals in buckets.items():
+        yield dict(user_id=user_id, dimension=dimension, key=key, **totals)
+
+
+def rebuild_stats(user_ids=None) -> int:
+    """Recompute all rollups, or only those of ``user_ids``. Returns rows written."""
+    games = Game.objects.all()
+    rollups = StatsRollup.objects.all()
+    if user_ids is not None:
+        games = games.filter(user_id__in=user_ids)
+        rollups = rollups.filter(user_id__in=user_ids)
+    rollups.delete()
+    created = StatsRollup.objects.bulk_create(
+        StatsRollup(**row) for row in rollup_rows(games)
+    )
+    return len(created)
+
+
+def refresh_stats(user_id: int, buckets) -> None:
+    """Recompute the given (dimension, key) buckets of one user's rollup."""
+    games = Game.objects.filter(user_id=user_id)
+    for dimension, key in buckets:
+        lookup = STATS_DIMENSIONS[dimension]
+        if key:
+            match = Q(**{lookup: key})
+        else:
+            match = Q(**{f"{lookup}__isnull": True}) | Q(**{lookup: ""})
+        totals = _totals(games.filter(match).aggregate(**STAT_ANNOTATIONS))
+        if totals["count"]:
+            StatsRollup.objects.update_or_create(
+                user_id=user_id, dimension=dimension, key=key, defaults=totals
+            )
+        else:
+            StatsRollup.objects.filter(
+                user_id=user_id, dimension=dimension, key=key
+            ).delete()
@@ -0,0 +1,196 @@
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.forms.models import model_to_dict
+from django.utils import timezone
+
+from tracker.forms import GameForm
+from tracker.models import Game, League, Site, Tombstone
+
+# Fields sent to sync clients for each model
+GAME_FIELDS = (
+    "id",
+    "date",
+    "site_id",
+    "league_id",
+    "position",
+    "fee",
+    "effective_fee",
+    "fee_paid",
+    "is_volunteer",
+    "mileage",
+    "mileage_paid",
+    "mileage_pending",
+    "updated_at",
+)
+SITE_FIELDS = ("id", "name", "address", "updated_at")
+LEAGUE_FIELDS = (
+    "id",
+    "organization",
+    "assignor",
+    "game_fee",
+    "description",
+    "updated_at",
+)
+
+MAX_UPLOAD_CHANGES = 500
+
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def make_token(moment: datetime) -> str:
+    """A change token for ``moment``: microseconds since the epoch."""
+    return str((moment - EPOCH) // timedelta(microseconds=1))
+
+
+def read_token(token) -> datetime:
+    """The moment a ``make_token`` token stands for. Raises InvalidToken."""
+    if not isinstance(token, str) or not token.isdigit():
+        raise InvalidToken(token)
+    try:
+        return EPOCH + timedelta(microseconds=int(token))
+    except OverflowError:
+        raise InvalidToken(token) from None
+
+
+def changes(user, token: str | None) -> dict:
+    """Games, sites and leagues changed or deleted since ``token``.
+
+    Without a token, or with one older than SYNC_TOMBSTONE_DAYS (whose
+    deletes may be forgotten), every row is sent with ``reset`` set so the
+    client replaces what it has. Changes from SYNC_TOKEN_OVERLAP seconds
+    before the token are sent again, as a transaction can commit after a
+    token later than its rows' ``updated_at`` was issued. The returned
+    ``token`` is presented next time.
+    """
+    now = timezone.now()
+    since = read_token(token) if token is not None else None
+    reset = since is None or since < now - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+    games = Game.objects.filter(user=user)
+    sites = Site.objects.all()
+    leagues = League.objects.all()
+    deleted = {model: [] for model, _ in Tombstone.MODEL_CHOICES}
+    if not reset:
+        after = since - timedelta(seconds=settings.SYNC_TOKEN_OVERLAP)
+        games = games.filter(updated_at__gte=after)
+        sites = sites.filter(updated_at__gte=after)
+        leagues = leagues.filter(updated_at__gte=after)
+        tombstones = Tombstone.objects.filter(
+            Q(user_id=user.pk) | Q(user_id__isnull=True), deleted_at__gte=after
+        )
+        for model, object_id in tombstones.values_list("model", "object_id"):
+            deleted[model].append(object_id)
+    return {
+        "token": make_token(now),
+        "reset": reset,
+        "games": list(games.order_by("pk").values(*GAME_FIELDS)),
+        "sites": list(sites.order_by("pk").values(*SITE_FIELDS)),
+        "leagues": list(leagues.order_by("pk").values(*LEAGUE_FIELDS)),
+        "deleted": deleted,
+    }
+
+
+@dataclass
+class UploadResult:
+    created: dict = field(default_factory=dict)  # client ref -> game id
+    conflicts: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+
+    @property
+    def applied(self) -> bool:
+        return not (self.conflicts or self.errors)
+
+
+def _game_row(pk: int) -> dict | None:
+    return Game.objects.filter(pk=pk).values(*GAME_FIELDS).first()
+
+
+def apply_changes(user, since: datetime, game_changes: list) -> UploadResult:
+    """Apply a client's offline game edits, all in one transaction.
+
+    Each change is ``{"action": "create", "ref": ..., "fields": {...}}``,
+    ``{"action": "update", "id": ..., "fields": {...}}`` or
+    ``{"action": "delete", "id": ...}``. Fields are validated by GameForm
+    (so mileage is looked up as in the Add/Edit Game pages), and updates
+    change only the fields sent. Updating a game changed since ``since``,
+    the client's last sync, or one since deleted, is a conflict. If any
+    change conflicts or is invalid, nothing is applied.
+    """
+    result = UploadResult()
+    touched = set()  # edited earlier in this batch, so newer than ``since``
+    ids = [change.get("id") for change in game_changes if isinstance(change, dict)]
+    with transaction.atomic():
+        games = Game.objects.select_for_update(of=("self",)).select_related("league")
+        locked = {
+            game.pk: game
+            for game in games.filter(
+                user=user, pk__in=[pk for pk in ids if isinstance(pk, int)]
+            )
+        }
+        for index, change in enumerate(game_changes):
+            action = change.get("action") if isinstance(change, dict) else None
+            if action not in ("create", "update", "delete"):
+                result.errors.append(
+                    {
+                        "index": index,
+                        "errors": {"action": ["Must be create, update or delete."]},
+                    }
+                )
+                continue
+            fields = change.get("fields") or {}
+            if not isinstance(fields, dict):
+                result.errors.append(
+                    {"index": index, "errors": {"fields": ["Must be an object."]}}
+                )
+                continue
+            if action == "create":
+                form = GameForm(fields, user=user)
+            elif not isinstance(change.get("id"), int):
+                result.errors.append(
+                    {"index": index, "errors": {"id": ["Must be an integer."]}}
+                )
+                continue
+            else:
+                game = locked.get(change.get("id"))
+                if game is None and action == "delete":
+                    continue  # already gone
+                if game is None or (game.updated_at > since and game.pk not in touched):
+                    result.conflicts.append(
+                        {
+                            "index": index,
+                            "id": change.get("id"),
+                            "game": _game_row(game.pk) if game else None,
+                        }
+                    )
+                    continue
+                if action == "delete":
+                    locked.pop(game.pk).delete()
+                    continue
+                data = model_to_dict(game, fields=GameForm._meta.fields)
+                form = GameForm({**data, **fields}, instance=game, user=user)
+            if not form.is_valid():
+                result.errors.append(
+                    {
+                        "index": index,
+                        "errors": {
+                            name: list(messages)
+                            for name, messages in form.errors.items()
+                        },
+                    }
+                )
+                continue
+            game = form.save()
+            touched.add(game.pk)
+            if action == "create":
+                result.created[str(change.get("ref", index))] = game.pk
+        if not result.applied:
+            result.created = {}
+            transaction.set_rollback(True)
+    return result
@@ -0,0 +1,249 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from tracker.geo import estimate_miles
+from tracker.models import DistancePrefetch, DistanceTask, Game, Site, Trip
+from tracker.page_cache import invalidate_user_months, invalidate_user_pages
+from tracker.stats import rebuild_stats
+from tracker.trips import rebuild_trips, refresh_trips
+from tracker.utils import DistanceError, distance_miles, distance_miles_many
+
+MAX_BACKOFF = timedelta(hours=6)
+# How long a claimed task is hidden from other workers while its lookup runs
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+
+def enqueue_distance(game: Game, origin: str) -> DistanceTask:
+    """Queue (or restart) the mileage lookup from ``origin`` to ``game``'s site."""
+    task, _ = DistanceTask.objects.update_or_create(
+        game=game,
+        defaults={
+            "origin": origin,
+            "destination": game.site.address,
+            "attempts": 0,
+            "run_after": timezone.now(),
+            "last_error": "",
+        },
+    )
+    return task
+
+
+def cancel_distance(game: Game) -> None:
+    DistanceTask.objects.filter(game=game).delete()
+
+
+def _backoff(attempts: int) -> timedelta:
+    delay = timedelta(seconds=settings.DISTANCE_TASK_BACKOFF * 2 ** (attempts - 1))
+    return min(delay, MAX_BACKOFF)
+
+
+def _set_mileage(game: Game, miles: float) -> None:
+    game.mileage = miles
+    game.mileage_pending = False
+    # save() rather than update() so the stats rollup signals fire
+    game.save(update_fields=["mileage", "mileage_pending"])
+
+
+def _claim(tasks):
+    """Take the oldest due row of ``tasks`` in a transaction of its own.
+
+    The row is locked only while its attempt is counted and ``run_after``
+    is pushed CLAIM_TIMEOUT ahead, so other workers skip it while its
+    lookup runs outside any transaction, and retry it if this worker dies.
+    Returns the row, or None when none are due.
+    """
+    with transaction.atomic():
+        task = (
+            tasks.select_for_update(skip_locked=True)
+            .filter(run_after__lte=timezone.now())
+            .order_by("run_after")
+            .first()
+        )
+        if task is None:
+            return None
+        task.attempts += 1
+        task.run_after = timezone.now() + CLAIM_TIMEOUT
+        task.save(update_fields=["attempts", "run_after"])
+    return task
+
+
+def _reclaim(tasks, task, *fields):
+    """Lock ``task`` again to record its result, or None if it is stale.
+
+    A task deleted or re-queued (``attempts`` reset, ``fields`` changed)
+    since ``_claim`` was for an edit that superseded this lookup.
+    """
+    same = {name: getattr(task, name) for name in ("attempts", *fields)}
+    return tasks.select_for_update().filter(pk=task.pk, **same).first()
+
+
+def _retry_later(task, error: DistanceError) -> None:
+    task.last_error = str(error)
+    task.run_after = timezone.now() + _backoff(task.attempts)
+    task.save(update_fields=["last_error", "run_after"])
+
+
+def run_distance_task() -> bool:
+    """Work the oldest due task, if any. Returns False when none are due.
+
+    The Maps lookup runs between two short transactions (see ``_claim``),
+    never while a row lock is held. On DistanceError the task is retried
+    with exponential backoff; after DISTANCE_TASK_MAX_ATTEMPTS the game
+    gets the coordinate estimate (zero if either address is not geocoded),
+    as an inline lookup failure does.
+    """
+    claimed = _claim(DistanceTask.objects.all())
+    if claimed is None:
+        return False
+    try:
+        miles = distance_miles(claimed.origin, claimed.destination)
+        error = None
+    except DistanceError as e:
+        error = e
+    tasks = DistanceTask.objects.select_related("game")
+    with transaction.atomic():
+        task = _reclaim(tasks, claimed, "origin", "destination")
+        if task is None:
+            return True
+        if error is None:
+            _set_mileage(task.game, miles)
+        elif task.attempts >= settings.DISTANCE_TASK_MAX_ATTEMPTS:
+            miles = estimate_miles(task.origin, task.destination)
+            _set_mileage(task.game, miles or 0.0)
+        else:
+            _retry_later(task, error)
+            return True
+        task.delete()
+    return True
+
+
+def run_distance_tasks(limit: int | None = None) -> int:
+    """Work due tasks until none are left (or ``limit`` is reached)."""
+    done = 0
+    while (limit is None or done < limit) and run_distance_task():
+        done += 1
+    return done
+
+
+def run_route_tasks(limit: int | None = None) -> int:
+    """Plan pending multi-site trip routes, fetching unknown distances.
+
+    Trips whose request fails stay pending and are retried on the next
+    run. Returns the number of trips worked.
+    """
+    pending = Trip.objects.filter(route_pending=True).order_by("date")
+    keys = list(pending.values_list("user_id", "date")[:limit])
+    for key in keys:
+        refresh_trips({key}, {}, fetch=True)
+    invalidate_user_months(keys)
+    return len(keys)
+
+
+def enqueue_prefetch(user, origin: str, recompute_mileage: bool = False):
+    """Queue (or restart) warming distances from ``origin`` to ``user``'s sites."""
+    task, _ = DistancePrefetch.objects.update_or_create(
+        user=user,
+        defaults={
+            "origin": origin,
+            "recompute_mileage": recompute_mileage,
+            "attempts": 0,
+            "run_after": timezone.now(),
+            "last_error": "",
+        },
+    )
+    return task
+
+
+def _site_addresses(user_id: int) -> set[str]:
+    """Addresses of every site ``user_id`` has games at."""
+    return set(
+        Site.objects.filter(game__user_id=user_id)
+        .distinct()
+        .values_list("address", flat=True)
+    )
+
+
+def _recompute_mileage(user_id: int, miles: dict[str, float]) -> int:
+    """Give the user's not yet paid games their site's distance in ``miles``.
+
+    Updates are one ``bulk_update`` (their queued lookups are dropped),
+    then the user's trips and rollups are rebuilt. Returns the number of
+    games updated.
+    """
+    games = Game.objects.select_related("site").filter(
+        user_id=user_id, mileage_paid=False, site__isnull=False
+    )
+    changed = []
+    now = timezone.now()
+    for game in games:
+        new = miles.get(game.site.address)
+        if new is not None and (new != game.mileage or game.mileage_pending):
+            game.mileage = new
+            game.mileage_pending = False
+            game.updated_at = now
+            changed.append(game)
+    if changed:
+        Game.objects.bulk_update(
+            changed, ["mileage", "mileage_pending", "updated_at"], batch_size=500
+        )
+        DistanceTask.objects.filter(game__in=changed).delete()
+        # bulk_update skips the Game signals
+        rebuild_trips({user_id})
+        rebuild_stats({user_id})
+        invalidate_user_pages({user_id})
+    return len(changed)
+
+
+def prefetch_distances(user_id: int, origin: str, recompute_mileage=False) -> int:
+    """Cache distances from ``origin`` to every site the user has games at.
+
+    Misses go out in Distance Matrix batches via ``distance_miles_many``.
+    With ``recompute_mileage``, games whose mileage is not yet paid get the
+    new distances (see ``_recompute_mileage``). Returns the number of games
+    updated. Raises DistanceError if a request fails.
+    """
+    miles = distance_miles_many(origin, _site_addresses(user_id))
+    if not recompute_mileage:
+        return 0
+    return _recompute_mileage(user_id, miles)
+
+
+def run_prefetch_task() -> bool:
+    """Work the oldest due prefetch, if any. Returns False when none are due.
+
+    Claimed and retried with backoff like ``run_distance_task``; dropped
+    after DISTANCE_TASK_MAX_ATTEMPTS, leaving mileage to per-game lookups.
+    """
+    claimed = _claim(DistancePrefetch.objects.all())
+    if claimed is None:
+        return False
+    try:
+        miles = distance_miles_many(claimed.origin, _site_addresses(claimed.user_id))
+        error = None
+    except DistanceError as e:
+        error = e
+    with transaction.atomic():
+        task = _reclaim(
+            DistancePrefetch.objects.all(), claimed, "origin", "recompute_mileage"
+        )
+        if task is None:
+            return True
+        if error is None:
+            if task.recompute_mileage:
+                _recompute_mileage(task.user_id, miles)
+        elif task.attempts < settings.DISTANCE_TASK_MAX_ATTEMPTS:
+            _retry_later(task, error)
+            return True
+        task.delete()
+    return True
+
+
+def run_prefetch_tasks(limit: int | None = None) -> int:
+    """Work due prefetches until none are left (or ``limit`` is reached)."""
+    done = 0
+    while (limit is None or done < limit) and run_prefetch_task():
+        done += 1
+    return done
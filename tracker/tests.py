@@ -1,14 +1,80 @@
-from datetime import date
+import csv
+import json
+import os
+import random
+import tempfile
+import tracemalloc
+from datetime import date, timedelta
 from decimal import Decimal
+from io import StringIO
 from unittest.mock import Mock, patch
 
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-
+from django.utils import timezone
+
+from tracker.benchmarks import (
+    benchmark_views,
+    list_memory,
+    regressions,
+    seed_histories,
+    uncovered_url_names,
+)
 from tracker.forms import GameForm, LeagueForm, SiteForm
-from tracker.models import Game, League, Location, Profile, Site
-from tracker.utils import DistanceError, distance_miles
+from tracker.geo import (
+    estimate_miles,
+    geocode,
+    geocode_missing,
+    haversine_many,
+    site_estimates,
+)
+from tracker.importers import import_games, parse_csv, parse_ics
+from tracker.models import (
+    DistanceCache,
+    DistancePrefetch,
+    DistanceTask,
+    Game,
+    League,
+    Location,
+    Payment,
+    Profile,
+    Site,
+    StatsRollup,
+    Tombstone,
+    Trip,
+)
+from tracker.payments import best_subset, mark_paid, reconcile
+from tracker.routes import plan_route, route_miles
+from tracker.stats import rebuild_stats
+from tracker.sync import make_token
+from tracker.tasks import (
+    _set_mileage,
+    enqueue_distance,
+    run_distance_tasks,
+    run_prefetch_tasks,
+    run_route_tasks,
+)
+from tracker.timing import collecting
+from tracker.trips import plan_day_route, rebuild_trips
+from tracker.utils import (
+    DistanceError,
+    distance_lru,
+    distance_matrix_miles,
+    distance_metrics,
+    distance_miles,
+    distance_miles_many,
+    maps_client,
+    normalize_address,
+)
+from tracker.views import CSRF_PLACEHOLDER
 
 
 class ProfileModelTest(TestCase):
@@ -207,6 +273,7 @@ class GameFormTest(TestCase):
 
     def setUp(self):
         """Set up test data."""
+        distance_lru.clear()
         self.user = User.objects.create_user(
             username="testuser", password="testpass123"
         )
@@ -238,6 +305,7 @@ class GameFormTest(TestCase):
         form = GameForm(user=self.user)
         self.assertIn("mileage", form.fields)
 
+    @override_settings(DISTANCE_LOOKUP_ASYNC=False)
     @patch("tracker.forms.distance_miles")
     def test_form_calculates_mileage_on_save(self, mock_distance):
         """Test that form calculates mileage when saving."""
@@ -259,6 +327,7 @@ class GameFormTest(TestCase):
         self.assertEqual(game.mileage, 12.5)
         mock_distance.assert_called_once()
 
+    @override_settings(DISTANCE_LOOKUP_ASYNC=False)
     @patch("tracker.forms.distance_miles")
     def test_form_handles_distance_error(self, mock_distance):
         """Test that form handles DistanceError gracefully."""
@@ -279,6 +348,7 @@ class GameFormTest(TestCase):
         game = form.save()
         self.assertEqual(game.mileage, 0.0)
 
+    @override_settings(DISTANCE_LOOKUP_ASYNC=False)
     @patch("tracker.forms.distance_miles")
     def test_form_uses_profile_address_for_mileage(self, mock_distance):
         """Test that form uses user's profile address as origin."""
@@ -308,6 +378,84 @@ class GameFormTest(TestCase):
         call_args = mock_distance.call_args[0]
         self.assertEqual(call_args[0], "456 Oak St, Franklin, TN, 37064")
 
+    def _post(self):
+        form = GameForm(
+            data={
+                "date": "2025-11-15",
+                "site": self.site.id,
+                "league": self.league.id,
+                "mileage": 0.0,
+                "position": "Referee",
+            },
+            user=self.user,
+        )
+        self.assertTrue(form.is_valid())
+        return form.save()
+
+    @patch("tracker.tasks.distance_miles")
+    def test_form_queues_uncached_mileage(self, mock_distance):
+        """Test a cache miss saves immediately and the worker fills mileage in."""
+        mock_distance.return_value = 12.5
+        game = self._post()
+        self.assertTrue(game.mileage_pending)
+        self.assertEqual(game.mileage, 0.0)
+        mock_distance.assert_not_called()
+
+        self.assertEqual(run_distance_tasks(), 1)
+        game.refresh_from_db()
+        self.assertFalse(game.mileage_pending)
+        self.assertEqual(game.mileage, 12.5)
+        self.assertFalse(DistanceTask.objects.exists())
+
+    def test_form_uses_cached_mileage(self):
+        """Test a cached distance is used without queueing a task."""
+        DistanceCache.objects.create(
+            origin=normalize_address(settings.DEFAULT_ADDRESS),
+            destination=normalize_address(self.site.address),
+            miles=8.0,
+        )
+        game = self._post()
+        self.assertFalse(game.mileage_pending)
+        self.assertEqual(game.mileage, 8.0)
+        self.assertFalse(DistanceTask.objects.exists())
+
+    @override_settings(DISTANCE_TASK_MAX_ATTEMPTS=2, DISTANCE_TASK_BACKOFF=60)
+    @patch("tracker.tasks.distance_miles", side_effect=DistanceError("timeout"))
+    def test_worker_retries_with_backoff(self, mock_distance):
+        """Test failed lookups are retried later, then give up with 0 miles."""
+        game = self._post()
+        self.assertEqual(run_distance_tasks(), 1)
+        task = DistanceTask.objects.get(game=game)
+        self.assertEqual(task.attempts, 1)
+        self.assertEqual(task.last_error, "timeout")
+        self.assertGreater(task.run_after, timezone.now())
+        self.assertEqual(run_distance_tasks(), 0)
+
+        DistanceTask.objects.update(run_after=timezone.now())
+        self.assertEqual(run_distance_tasks(), 1)
+        game.refresh_from_db()
+        self.assertFalse(game.mileage_pending)
+        self.assertEqual(game.mileage, 0.0)
+        self.assertFalse(DistanceTask.objects.exists())
+
+    @patch("tracker.tasks.distance_miles")
+    def test_worker_drops_lookup_superseded_while_running(self, mock_distance):
+        """Test a task re-queued during its lookup keeps the newer request."""
+        game = self._post()
+
+        def requeue(origin, destination):
+            # Claimed: hidden from other workers while the lookup runs
+            self.assertGreater(DistanceTask.objects.get().run_after, timezone.now())
+            enqueue_distance(game, "1 New Home Rd")
+            return 12.5
+
+        mock_distance.side_effect = requeue
+        self.assertEqual(run_distance_tasks(limit=1), 1)
+        game.refresh_from_db()
+        self.assertTrue(game.mileage_pending)
+        task = DistanceTask.objects.get(game=game)
+        self.assertEqual((task.origin, task.attempts), ("1 New Home Rd", 0))
+
 
 class SiteFormTest(TestCase):
     """Tests for the SiteForm."""
@@ -352,6 +500,10 @@ class LeagueFormTest(TestCase):
 class DistanceMilesTest(TestCase):
     """Tests for the distance_miles utility function."""
 
+    def setUp(self):
+        distance_lru.clear()
+        maps_client.reset()
+
     @patch("tracker.utils.googlemaps.Client")
     def test_distance_miles_success(self, mock_client_class):
         """Test successful distance calculation."""
@@ -393,6 +545,118 @@ class DistanceMilesTest(TestCase):
             distance_miles("Origin", "Destination")
 
 
+def _matrix_response(meters):
+    return {"rows": [{"elements": [{"status": "OK", "distance": {"value": meters}}]}]}
+
+
+class DistanceCacheTest(TestCase):
+    """Tests for the cache in front of distance_miles."""
+
+    def setUp(self):
+        distance_lru.clear()
+        maps_client.reset()
+
+    def test_normalize_address(self):
+        """Test addresses differing only in case and spacing share a key."""
+        self.assertEqual(
+            normalize_address("  123 Main St ,Nashville,  TN "),
+            "123 main st, nashville, tn",
+        )
+
+    @patch("tracker.utils.googlemaps.Client")
+    def test_repeat_lookup_served_from_cache(self, mock_client_class):
+        """Test the API is called once for a repeated address pair."""
+        mock_client_class.return_value.distance_matrix.return_value = _matrix_response(
+            16093
+        )
+        self.assertEqual(distance_miles("Nashville, TN", "Franklin, TN"), 10.0)
+        self.assertEqual(distance_miles("nashville,TN", "FRANKLIN, TN"), 10.0)
+        mock_client_class.return_value.distance_matrix.assert_called_once()
+        self.assertEqual(DistanceCache.objects.count(), 1)
+
+    @patch("tracker.utils.googlemaps.Client")
+    def test_database_cache_survives_lru_clear(self, mock_client_class):
+        """Test a cold process reads the stored distance instead of the API."""
+        DistanceCache.objects.create(
+            origin="nashville, tn", destination="franklin, tn", miles=21.0
+        )
+        self.assertEqual(distance_miles("Nashville, TN", "Franklin, TN"), 21.0)
+        mock_client_class.assert_not_called()
+
+    @patch("tracker.utils.googlemaps.Client")
+    def test_stale_entry_is_refetched(self, mock_client_class):
+        """Test entries older than DISTANCE_CACHE_TTL are refreshed."""
+        mock_client_class.return_value.distance_matrix.return_value = _matrix_response(
+            16093
+        )
+        entry = DistanceCache.objects.create(
+            origin="nashville, tn", destination="franklin, tn", miles=21.0
+        )
+        DistanceCache.objects.filter(pk=entry.pk).update(
+            fetched_at=entry.fetched_at - timedelta(days=365)
+        )
+        self.assertEqual(distance_miles("Nashville, TN", "Franklin, TN"), 10.0)
+        entry.refresh_from_db()
+        self.assertEqual(entry.miles, 10.0)
+
+    @patch("tracker.utils.googlemaps.Client")
+    def test_api_failure_is_not_cached(self, mock_client_class):
+        """Test failed lookups are not stored."""
+        mock_client_class.return_value.distance_matrix.return_value = {
+            "rows": [{"elements": [{"status": "NOT_FOUND"}]}]
+        }
+        with self.assertRaises(DistanceError):
+            distance_miles("Nowhere", "Franklin, TN")
+        self.assertFalse(DistanceCache.objects.exists())
+
+    def test_site_address_change_invalidates(self):
+        """Test changing a site address drops distances to the old address."""
+        site = Site.objects.create(name="Field", address="1 Old Rd, Franklin, TN")
+        DistanceCache.objects.create(
+            origin="nashville, tn", destination="1 old rd, franklin, tn", miles=20
+        )
+        distance_lru.set(("nashville, tn", "1 old rd, franklin, tn"), 20)
+        site.address = "2 New Rd, Franklin, TN"
+        site.save()
+        self.assertFalse(DistanceCache.objects.exists())
+        self.assertIsNone(distance_lru.get(("nashville, tn", "1 old rd, franklin, tn")))
+
+    def test_site_save_without_address_change_keeps_cache(self):
+        """Test renaming a site leaves its cached distances alone."""
+        site = Site.objects.create(name="Field", address="1 Old Rd, Franklin, TN")
+        DistanceCache.objects.create(
+            origin="nashville, tn", destination="1 old rd, franklin, tn", miles=20
+        )
+        site.name = "Renamed Field"
+        site.save()
+        self.assertEqual(DistanceCache.objects.count(), 1)
+
+    def test_profile_address_change_invalidates(self):
+        """Test changing a home address drops distances from the old address."""
+        user = User.objects.create_user(username="mover", password="testpass123")
+        user.profile.home_address = "1 Home St"
+        user.profile.city = "Nashville"
+        user.profile.save()
+        DistanceCache.objects.create(
+            origin="1 home st, nashville", destination="franklin, tn", miles=20
+        )
+        user.profile.city = "Franklin"
+        user.profile.save()
+        self.assertFalse(DistanceCache.objects.exists())
+
+    def test_prune_distance_cache_command(self):
+        """Test the prune command removes only expired entries."""
+        old = DistanceCache.objects.create(origin="a", destination="b", miles=1)
+        DistanceCache.objects.create(origin="a", destination="c", miles=2)
+        DistanceCache.objects.filter(pk=old.pk).update(
+            fetched_at=old.fetched_at - timedelta(days=365)
+        )
+        call_command("prune_distance_cache", stdout=StringIO())
+        self.assertEqual(
+            list(DistanceCache.objects.values_list("destination", flat=True)), ["c"]
+        )
+
+
 class GameViewsTest(TestCase):
     """Tests for game views."""
 
@@ -747,3 +1011,2025 @@ class GameListPostTest(TestCase):
         response = self.client.post(reverse("game_list"), data)
         self.assertEqual(response.status_code, 302)  # Redirect
         self.assertEqual(Game.objects.count(), 1)
+
+
+class UserGamesMixin:
+    """A logged-in user with a site and two leagues to add games against."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.client.login(username="testuser", password="testpass123")
+        self.site = Site.objects.create(
+            name="Test Site", address="123 Test St, Nashville, TN"
+        )
+        self.league = League.objects.create(
+            organization="Test League",
+            assignor="Test Assignor",
+            game_fee=Decimal("50.00"),
+        )
+        self.other_league = League.objects.create(
+            organization="Other League",
+            assignor="Other Assignor",
+            game_fee=Decimal("30.00"),
+        )
+
+    def _game(self, day, **kwargs):
+        kwargs.setdefault("user", self.user)
+        kwargs.setdefault("site", self.site)
+        kwargs.setdefault("league", self.league)
+        return Game.objects.create(date=day, **kwargs)
+
+
+class GameListFilterTest(UserGamesMixin, TestCase):
+    """Tests for server-side filtering and month paging on the game list."""
+
+    def setUp(self):
+        """Set up test data."""
+        super().setUp()
+        self.other_site = Site.objects.create(
+            name="Other Site", address="9 Other St, Franklin, TN"
+        )
+
+    def _listed_games(self, response):
+        return [
+            game.id
+            for _, groups, _ in response.context["games_by_month"]
+            for *_, ds_games in groups
+            for game in ds_games
+        ]
+
+    def test_league_filter_applies_to_rows_and_summary(self):
+        """Test the league filter limits both the rows and the summary."""
+        self._game(date(2025, 3, 1))
+        other = self._game(date(2025, 3, 2), league=self.other_league)
+        response = self.client.get(
+            reverse("game_list"), {"filter_year": "", "filter_league": "Other League"}
+        )
+        self.assertEqual(self._listed_games(response), [other.pk])
+        self.assertEqual(response.context["summary"]["count"], 1)
+        self.assertEqual(response.context["summary"]["total_fees"], Decimal("30.00"))
+
+    def test_unpaid_filter_is_default(self):
+        """Test paid and volunteer games are hidden unless filter_paid=all."""
+        unpaid = self._game(date(2025, 3, 1))
+        self._game(date(2025, 3, 2), fee_paid=True)
+        self._game(date(2025, 3, 3), is_volunteer=True)
+        response = self.client.get(reverse("game_list"), {"filter_year": ""})
+        self.assertEqual(self._listed_games(response), [unpaid.pk])
+
+        response = self.client.get(
+            reverse("game_list"), {"filter_year": "", "filter_paid": "all"}
+        )
+        self.assertEqual(len(self._listed_games(response)), 3)
+
+    def test_unknown_filter_value_is_ignored(self):
+        """Test a value with no matching games falls back to 'All'."""
+        self._game(date(2025, 3, 1))
+        response = self.client.get(
+            reverse("game_list"), {"filter_year": "1999", "filter_site": "Nowhere"}
+        )
+        self.assertEqual(response.context["f_year"], "")
+        self.assertEqual(response.context["f_site"], "")
+        self.assertEqual(len(self._listed_games(response)), 1)
+
+    def test_months_are_paged_newest_first(self):
+        """Test only the newest months are rendered and older ones are paged."""
+        for month in range(1, 9):
+            self._game(date(2025, month, 10))
+        response = self.client.get(reverse("game_list"), {"filter_year": "2025"})
+        labels = [label for label, _, _ in response.context["games_by_month"]]
+        self.assertEqual(labels[0], "March 2025")
+        self.assertEqual(labels[-1], "August 2025")
+        self.assertEqual(response.context["expand_month"], "August 2025")
+        self.assertEqual(response.context["summary"]["count"], 8)
+
+        response = self.client.get(
+            reverse("game_list"), {"filter_year": "2025", "page": 2}
+        )
+        labels = [label for label, _, _ in response.context["games_by_month"]]
+        self.assertEqual(labels, ["January 2025", "February 2025"])
+
+    def test_december_games_are_included_in_page(self):
+        """Test the month window includes the last day of December."""
+        game = self._game(date(2025, 12, 31))
+        response = self.client.get(reverse("game_list"), {"filter_year": "2025"})
+        self.assertEqual(self._listed_games(response), [game.pk])
+
+    def test_rows_without_league_or_site(self):
+        """Test games with no league or site are listed with blanks."""
+        game = self._game(date(2025, 3, 1), league=None, site=None)
+        response = self.client.get(
+            reverse("game_list"), {"filter_year": "", "filter_paid": "all"}
+        )
+        self.assertEqual(self._listed_games(response), [game.pk])
+        self.assertNotContains(response, "None")
+
+    def test_query_count_is_constant_as_facets_grow(self):
+        """Test adding leagues, sites and positions adds no queries to game_list."""
+        self._game(date(2025, 3, 1), position="Referee")
+
+        def count_queries():
+            cache.clear()  # older games leave March's cached month block alone
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(reverse("game_list"), {"filter_year": "2025"})
+            return len(ctx.captured_queries)
+
+        baseline = count_queries()
+        for i in range(5):
+            league = League.objects.create(
+                organization=f"League {i}", assignor=f"Assignor {i}", game_fee=10
+            )
+            site = Site.objects.create(name=f"Site {i}", address=f"{i} Main St")
+            self._game(
+                date(2024 - i, 1 + i, 1), league=league, site=site, position=f"P{i}"
+            )
+        self.assertEqual(count_queries(), baseline)
+
+    def test_summary_totals_from_facets(self):
+        """Test paid, unpaid and mileage totals follow the filtered games."""
+        self._game(date(2025, 3, 1), mileage=10.0)
+        self._game(date(2025, 3, 2), fee_paid=True, mileage=5.0)
+        self._game(date(2025, 3, 3), is_volunteer=True)
+        response = self.client.get(
+            reverse("game_list"), {"filter_year": "2025", "filter_paid": "all"}
+        )
+        summary = response.context["summary"]
+        self.assertEqual(summary["count"], 3)
+        self.assertEqual(summary["paid_fees"], Decimal("50.00"))
+        self.assertEqual(summary["unpaid_fees"], Decimal("50.00"))
+        self.assertEqual(summary["total_mileage"], 30.0)
+        self.assertEqual(response.context["available_years"], [2025])
+
+
+class StatsRollupTest(UserGamesMixin, TestCase):
+    """Tests for the per-user stats rollup maintained by signals."""
+
+    def _rollup(self, dimension, key):
+        return StatsRollup.objects.get(user=self.user, dimension=dimension, key=key)
+
+    def _snapshot(self):
+        return sorted(
+            StatsRollup.objects.values_list(
+                "user_id", "dimension", "key", "count", "total_fees", "unpaid_fees"
+            )
+        )
+
+    def test_game_save_updates_rollup(self):
+        """Test creating games adds to every dimension's bucket."""
+        self._game(date(2025, 3, 1), position="Referee", mileage=12.5)
+        self._game(date(2025, 3, 2), fee=Decimal("70.00"), fee_paid=True)
+        row = self._rollup("year", "2025")
+        self.assertEqual(row.count, 2)
+        self.assertEqual(row.total_fees, Decimal("120.00"))
+        self.assertEqual(row.paid_fees, Decimal("70.00"))
+        self.assertEqual(row.unpaid_fees, Decimal("50.00"))
+        self.assertEqual(row.total_mileage, 25.0)
+        self.assertEqual(self._rollup("position", "Referee").count, 1)
+        self.assertEqual(self._rollup("position", "").count, 1)
+        self.assertEqual(self._rollup("site", "Test Site").count, 2)
+
+    def test_game_edit_moves_between_buckets(self):
+        """Test changing a game's year empties the old bucket."""
+        game = self._game(date(2024, 5, 1))
+        game.date = date(2025, 5, 1)
+        game.save()
+        self.assertFalse(
+            StatsRollup.objects.filter(dimension="year", key="2024").exists()
+        )
+        self.assertEqual(self._rollup("year", "2025").count, 1)
+
+    def test_game_delete_removes_rollup(self):
+        """Test deleting the last game drops its rollup rows."""
+        game = self._game(date(2025, 3, 1))
+        game.delete()
+        self.assertFalse(StatsRollup.objects.exists())
+
+    def test_league_fee_change_updates_rollup(self):
+        """Test changing a league's game fee refreshes dependent totals."""
+        self._game(date(2025, 3, 1))
+        self.league.game_fee = Decimal("65.00")
+        self.league.save()
+        row = self._rollup("league", "Test League")
+        self.assertEqual(row.total_fees, Decimal("65.00"))
+
+    def test_site_delete_moves_games_to_blank_bucket(self):
+        """Test deleting a site regroups its games under the blank key."""
+        self._game(date(2025, 3, 1))
+        self.site.delete()
+        self.assertEqual(self._rollup("site", "").count, 1)
+
+    def test_rebuild_matches_incremental(self):
+        """Test a full rebuild reproduces the incrementally maintained rows."""
+        self._game(date(2024, 3, 1), position="Referee")
+        self._game(date(2025, 3, 1), position="")
+        self._game(date(2025, 4, 1), is_volunteer=True)
+        incremental = self._snapshot()
+        self.assertEqual(rebuild_stats(), len(incremental))
+        self.assertEqual(self._snapshot(), incremental)
+
+    def test_benchmark_queries_command_rolls_back(self):
+        """Test the benchmark command reports timings and leaves no data behind."""
+        self._game(date(2025, 3, 1))
+        out = StringIO()
+        call_command("benchmark_queries", users=3, games=30, repeat=1, stdout=out)
+        self.assertIn("without composite indexes", out.getvalue())
+        self.assertIn("toggle_fee_paid:", out.getvalue())
+        self.assertEqual(Game.objects.count(), 1)
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_rebuild_stats_command(self):
+        """Test the rebuild_stats command restores cleared rollups."""
+        self._game(date(2025, 3, 1))
+        StatsRollup.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_stats", "--user", "testuser", stdout=out)
+        self.assertIn("Rebuilt 5 stats rows", out.getvalue())
+        self.assertEqual(self._rollup("year", "2025").count, 1)
+
+    def test_stats_view_reads_rollup(self):
+        """Test the stats page lists rollup rows, newest year first."""
+        self._game(date(2024, 3, 1))
+        self._game(date(2025, 3, 1))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("game_stats"))
+        self.assertEqual(response.status_code, 200)
+        tables = [q["sql"] for q in ctx.captured_queries]
+        self.assertFalse(any('"tracker_game"' in sql for sql in tables))
+        self.assertEqual(sum('"tracker_statsrollup"' in sql for sql in tables), 1)
+        years = [row.key for row in response.context["by_year"]]
+        self.assertEqual(years, ["2025", "2024"])
+
+
+class TripTest(UserGamesMixin, TestCase):
+    """Tests for the day trips maintained on game save."""
+
+    def _snapshot(self):
+        return list(
+            Trip.objects.order_by("date").values_list(
+                "user_id", "date", "route", "mileage", "mileage_paid", "game_count"
+            )
+        )
+
+    def test_doubleheader_shares_one_trip(self):
+        """Test two games at one site and date form a single trip."""
+        first = self._game(date(2025, 3, 1), position="Referee", mileage=12.0)
+        second = self._game(date(2025, 3, 1), position="Umpire", mileage=12.5)
+        trip = Trip.objects.get()
+        self.assertEqual(trip.mileage, 25.0)
+        self.assertEqual(trip.game_count, 2)
+        self.assertEqual(trip.origin, settings.DEFAULT_ADDRESS)
+        self.assertEqual(second.trip_id, trip.pk)
+        first.refresh_from_db()
+        self.assertEqual(first.trip_id, trip.pk)
+
+    def test_stats_count_trip_mileage_once(self):
+        """Test rollups sum a doubleheader's drive once across every dimension."""
+        self._game(date(2025, 3, 1), position="Referee", mileage=12.0)
+        self._game(date(2025, 3, 1), position="Umpire", mileage=12.5)
+        rollups = StatsRollup.objects.filter(user=self.user)
+        self.assertEqual(rollups.get(dimension="year").total_mileage, 25.0)
+        positions = rollups.filter(dimension="position")
+        self.assertEqual([r.total_mileage for r in positions], [12.5, 12.5])
+
+    def test_trip_mileage_paid_needs_every_game(self):
+        """Test a trip is only mileage-paid once all of its games are."""
+        self._game(date(2025, 3, 1), mileage=10.0, mileage_paid=True)
+        game = self._game(date(2025, 3, 1), mileage=10.0)
+        self.assertFalse(Trip.objects.get().mileage_paid)
+        game.mileage_paid = True
+        game.save()
+        self.assertTrue(Trip.objects.get().mileage_paid)
+
+    def test_moving_and_deleting_games_updates_trips(self):
+        """Test moving a game splits its trip and deleting it removes the trip."""
+        self._game(date(2025, 3, 1), mileage=8.0)
+        game = self._game(date(2025, 3, 1), mileage=8.0)
+        game.date = date(2025, 3, 2)
+        game.save()
+        self.assertEqual(Trip.objects.count(), 2)
+        self.assertEqual(StatsRollup.objects.get(dimension="year").total_mileage, 32.0)
+        game.delete()
+        self.assertEqual(Trip.objects.get().game_count, 1)
+
+    def test_rebuild_matches_incremental(self):
+        """Test rebuilding trips reproduces the incrementally maintained rows."""
+        self._game(date(2025, 3, 1), mileage=5.0, mileage_paid=True)
+        self._game(date(2025, 3, 1), mileage=6.0)
+        self._game(date(2025, 4, 1), mileage=7.0, mileage_paid=True)
+        self._game(date(2025, 4, 1), site=None)
+        incremental = self._snapshot()
+        self.assertEqual(rebuild_trips(), len(incremental))
+        self.assertEqual(self._snapshot(), incremental)
+        self.assertFalse(Game.objects.filter(trip__isnull=True).exists())
+
+    def test_site_delete_regroups_trips(self):
+        """Test deleting a site drops it from its games' trip route."""
+        self._game(date(2025, 3, 1), mileage=9.0)
+        self.assertEqual(Trip.objects.get().route, [self.site.pk])
+        self.site.delete()
+        trip = Trip.objects.get()
+        self.assertEqual(trip.route, [])
+        self.assertEqual(Game.objects.get().trip_id, trip.pk)
+
+    def test_game_list_reads_trip_mileage(self):
+        """Test the game list shows each trip's stored mileage."""
+        self._game(date.today(), mileage=12.0)
+        self._game(date.today(), mileage=12.5)
+        Trip.objects.update(mileage=30.0)
+        response = self.client.get(reverse("game_list"))
+        groups = response.context["games_by_month"][0][1]
+        self.assertEqual(len(groups), 1)
+        self.assertEqual(groups[0][2], 30.0)
+
+
+class TripRouteTest(TestCase):
+    """Tests for planning multi-site day routes."""
+
+    HOME = "1 Home St, Nashville, TN"
+    A = "1 A St, Nashville, TN"
+    B = "1 B St, Nashville, TN"
+    C = "1 C St, Nashville, TN"
+
+    def setUp(self):
+        """Set up test data."""
+        distance_lru.clear()
+        maps_client.reset()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.user.profile.home_address = self.HOME
+        self.user.profile.save()
+        self.league = League.objects.create(
+            organization="Test League",
+            assignor="Test Assignor",
+            game_fee=Decimal("50.00"),
+        )
+        self.site_a = Site.objects.create(name="A Field", address=self.A)
+        self.site_b = Site.objects.create(name="B Field", address=self.B)
+        # Home and A are far apart; B sits between them
+        legs = {
+            (self.HOME, self.A): 20.0,
+            (self.HOME, self.B): 8.0,
+            (self.A, self.B): 14.0,
+        }
+        self.matrix = {**legs, **{(b, a): m for (a, b), m in legs.items()}}
+
+    def _game(self, site, **kwargs):
+        return Game.objects.create(
+            user=self.user,
+            date=date(2025, 3, 1),
+            site=site,
+            league=self.league,
+            **kwargs,
+        )
+
+    def test_plan_route_picks_shortest_order(self):
+        """Test the planner tries every order against a stubbed matrix."""
+        matrix = dict(self.matrix)
+        matrix.update(
+            {
+                (self.HOME, self.C): 5.0,
+                (self.C, self.HOME): 5.0,
+                (self.A, self.C): 30.0,
+                (self.C, self.A): 30.0,
+                (self.B, self.C): 4.0,
+                (self.C, self.B): 4.0,
+            }
+        )
+        order, miles = plan_route(self.HOME, [self.A, self.B, self.C], matrix)
+        self.assertIn(order, ([self.C, self.B, self.A], [self.A, self.B, self.C]))
+        self.assertEqual(miles, 43.0)
+        self.assertEqual(route_miles(self.HOME, [self.A, self.C, self.B], matrix), 62.0)
+
+    def test_plan_route_missing_pair_raises(self):
+        """Test an unknown leg raises KeyError rather than guessing."""
+        with self.assertRaises(KeyError):
+            plan_route(self.HOME, [self.A, self.C], self.matrix)
+
+    @patch("tracker.utils.googlemaps.Client")
+    def test_matrix_is_one_request_and_cached(self, mock_client_class):
+        """Test all pairs are fetched in one request, then served from cache."""
+        addresses = [self.HOME, self.A]
+        mock_client = mock_client_class.return_value
+        mock_client.distance_matrix.return_value = {
+            "rows": [
+                {"elements": [{"status": "OK", "distance": {"value": 0}}] * 2},
+                {"elements": [{"status": "OK", "distance": {"value": 16093}}] * 2},
+            ]
+        }
+        miles = distance_matrix_miles(addresses)
+        mock_client.distance_matrix.assert_called_once_with(
+            [self.A, self.HOME], [self.A, self.HOME], mode="driving"
+        )
+        self.assertEqual(miles[self.HOME, self.A], 10.0)
+        distance_lru.clear()
+        self.assertEqual(distance_matrix_miles(addresses, fetch=False), miles)
+        self.assertEqual(mock_client.distance_matrix.call_count, 1)
+
+    @override_settings(DISTANCE_LOOKUP_ASYNC=False)
+    def test_multi_site_day_stores_route_mileage(self):
+        """Test a day at two sites is one planned loop, not two trips."""
+        with patch("tracker.trips.distance_matrix_miles", return_value=self.matrix):
+            self._game(self.site_a, mileage=20.0)
+            self._game(self.site_b, mileage=8.0)
+        trip = Trip.objects.get()
+        self.assertEqual(trip.mileage, 42.0)
+        self.assertEqual(trip.game_count, 2)
+        self.assertFalse(trip.route_pending)
+        self.assertEqual(trip.origin, self.HOME)
+        self.assertEqual(StatsRollup.objects.get(dimension="year").total_mileage, 42.0)
+
+    def test_single_site_day_matches_planned_route(self):
+        """Test a single-site day's mileage is the loop plan_day_route gives."""
+        self._game(self.site_a, mileage=20.0)
+        with patch("tracker.trips.distance_matrix_miles", return_value=self.matrix):
+            planned = plan_day_route(self.HOME, [self.site_a], fetch=False)
+        self.assertEqual(planned, ([self.site_a], 40.0))
+        self.assertEqual(Trip.objects.get().mileage, planned[1])
+
+    def test_uncached_route_is_left_for_the_worker(self):
+        """Test an uncached route drives to each site separately until planned."""
+        self._game(self.site_a, mileage=20.0)
+        self._game(self.site_b, mileage=8.0)
+        trip = Trip.objects.get()
+        self.assertTrue(trip.route_pending)
+        self.assertEqual(trip.mileage, 56.0)
+        with patch("tracker.trips.distance_matrix_miles", return_value=self.matrix):
+            self.assertEqual(run_route_tasks(), 1)
+        trip.refresh_from_db()
+        self.assertFalse(trip.route_pending)
+        self.assertEqual(trip.mileage, 42.0)
+        self.assertEqual(trip.route, [self.site_a.pk, self.site_b.pk])
+        self.assertEqual(StatsRollup.objects.get(dimension="year").total_mileage, 42.0)
+
+    def test_failed_route_stays_pending(self):
+        """Test a failed matrix request keeps the trip queued for a retry."""
+        self._game(self.site_a, mileage=20.0)
+        self._game(self.site_b, mileage=8.0)
+        with patch(
+            "tracker.trips.distance_matrix_miles", side_effect=DistanceError("down")
+        ):
+            run_route_tasks()
+        self.assertTrue(Trip.objects.get().route_pending)
+
+
+class DistanceMilesManyTest(TestCase):
+    """Tests for batched distance lookups."""
+
+    def setUp(self):
+        distance_lru.clear()
+        maps_client.reset()
+
+    @patch("tracker.utils.googlemaps.Client")
+    def test_misses_share_one_request(self, mock_client_class):
+        """Test uncached destinations are fetched together and cached."""
+        DistanceCache.objects.create(origin="home", destination="a st", miles=3.0)
+        mock_client = mock_client_class.return_value
+        mock_client.distance_matrix.return_value = {
+            "rows": [
+                {
+                    "elements": [
+                        {"status": "OK", "distance": {"value": 16093}},
+                        {"status": "NOT_FOUND"},
+                    ]
+                }
+            ]
+        }
+        result = distance_miles_many("Home", ["A St", "B St", "C St"])
+        self.assertEqual(result, {"A St": 3.0, "B St": 10.0})
+        mock_client.distance_matrix.assert_called_once_with(
+            "Home", ["B St", "C St"], mode="driving"
+        )
+        self.assertTrue(
+            DistanceCache.objects.filter(origin="home", destination="b st").exists()
+        )
+
+    @patch("tracker.utils.googlemaps.Client")
+    def test_request_failure_raises(self, mock_client_class):
+        """Test a failed request raises DistanceError."""
+        mock_client_class.return_value.distance_matrix.side_effect = Exception("boom")
+        with self.assertRaises(DistanceError):
+            distance_miles_many("Home", ["A St"])
+
+
+@override_settings(IMPORT_TIME_ZONE="America/Chicago")
+class GameImportTest(TestCase):
+    """Tests for CSV/iCalendar game import."""
+
+    CSV = (
+        "Date,Site,League,Position,Fee,Paid\n"
+        "2025-09-05,Test Site,Test League,Referee,,yes\n"
+        "09/12/2025,test site,TEST LEAGUE,Umpire,$65.00,\n"
+        "2025-09-19,Nowhere,Test League,Referee,,\n"
+    )
+    ICS = (
+        "BEGIN:VCALENDAR\r\n"
+        "BEGIN:VEVENT\r\n"
+        "DTSTART;TZID=America/Chicago:20251003T190000\r\n"
+        "SUMMARY:Test League - Line\r\n"
+        "  Judge\r\n"
+        "LOCATION:Test Site\r\n"
+        "END:VEVENT\r\n"
+        "END:VCALENDAR\r\n"
+    )
+
+    def setUp(self):
+        """Set up test data."""
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.client.login(username="testuser", password="testpass123")
+        self.site = Site.objects.create(
+            name="Test Site", address="123 Test St, Nashville, TN"
+        )
+        self.league = League.objects.create(
+            organization="Test League",
+            assignor="Test Assignor",
+            game_fee=Decimal("50.00"),
+        )
+
+    def test_parse_ics_unfolds_lines(self):
+        """Test iCalendar events are read with folded SUMMARY lines joined."""
+        rows = list(parse_ics(self.ICS.splitlines(keepends=True)))
+        self.assertEqual(
+            rows,
+            [
+                (
+                    2,
+                    {
+                        "date": "20251003",
+                        "site": "Test Site",
+                        "league": "Test League",
+                        "position": "Line Judge",
+                    },
+                )
+            ],
+        )
+
+    def _ics_dates(self, *starts):
+        events = "".join(
+            f"BEGIN:VEVENT\r\n{start}\r\nLOCATION:Test Site\r\nEND:VEVENT\r\n"
+            for start in starts
+        )
+        ics = f"BEGIN:VCALENDAR\r\n{events}END:VCALENDAR\r\n"
+        return [row["date"] for _, row in parse_ics(ics.splitlines(keepends=True))]
+
+    def test_parse_ics_utc_evening_keeps_local_day(self):
+        """Test a 7 pm Central game exported in UTC stays on its local date."""
+        self.assertEqual(self._ics_dates("DTSTART:20250912T000000Z"), ["20250911"])
+
+    def test_parse_ics_tzid_and_all_day(self):
+        """Test TZID times are converted and all-day dates kept as given."""
+        self.assertEqual(
+            self._ics_dates(
+                "DTSTART;TZID=America/New_York:20250912T003000",
+                'DTSTART;TZID="Eastern Standard Time":20250912T003000',
+                "DTSTART;VALUE=DATE:20250912",
+            ),
+            ["20250911", "20250912", "20250912"],
+        )
+
+    @patch("tracker.importers.distance_miles_many", return_value={})
+    def test_import_csv(self, mock_distances):
+        """Test CSV rows are matched by name, and bad rows are reported."""
+        rows = parse_csv(StringIO(self.CSV))
+        result = import_games(self.user, rows)
+        self.assertEqual(result.created, 2)
+        self.assertEqual(result.errors, ["Line 4: unknown site 'Nowhere'"])
+        mock_distances.assert_called_once()
+        umpire = Game.objects.get(position="Umpire")
+        self.assertEqual(umpire.fee, Decimal("65.00"))
+        self.assertFalse(umpire.fee_paid)
+        self.assertTrue(Game.objects.get(position="Referee").fee_paid)
+        rollup = StatsRollup.objects.get(user=self.user, dimension="year", key="2025")
+        self.assertEqual(rollup.count, 2)
+
+    @patch("tracker.importers.distance_miles_many")
+    def test_import_skips_duplicates(self, mock_distances):
+        """Test re-importing the same file creates no new games."""
+        mock_distances.return_value = {self.site.address: 12.5}
+        import_games(self.user, parse_csv(StringIO(self.CSV)))
+        result = import_games(self.user, parse_csv(StringIO(self.CSV)))
+        self.assertEqual(result.created, 0)
+        self.assertEqual(result.duplicates, 2)
+        self.assertEqual(Game.objects.count(), 2)
+        self.assertEqual(Game.objects.first().mileage, 12.5)
+        self.assertFalse(Game.objects.filter(trip__isnull=True).exists())
+
+    @patch("tracker.importers.distance_miles_many", return_value={})
+    def test_import_view(self, mock_distances):
+        """Test uploading an .ics file imports its games."""
+        upload = SimpleUploadedFile("schedule.ics", self.ICS.encode())
+        response = self.client.post(reverse("import_games"), {"file": upload})
+        self.assertRedirects(response, reverse("game_list"))
+        self.assertEqual(Game.objects.get().position, "Line Judge")
+
+    def test_import_view_unreadable_csv(self):
+        """Test a CSV the csv module cannot read is reported, not a 500."""
+        # A field over csv.field_size_limit() (131072 characters)
+        body = "Date,Site,League\n2025-09-05,Test Site," + "x" * 131073 + "\n"
+        upload = SimpleUploadedFile("schedule.csv", body.encode())
+        response = self.client.post(
+            reverse("import_games"), {"file": upload}, follow=True
+        )
+        self.assertRedirects(response, reverse("import_games"))
+        self.assertContains(response, "Could not read this CSV file")
+        self.assertFalse(Game.objects.exists())
+
+    @patch("tracker.importers.distance_miles_many", return_value={})
+    def test_import_games_command(self, mock_distances):
+        """Test the import_games command reads a CSV file."""
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write(self.CSV)
+        self.addCleanup(os.unlink, f.name)
+        out = StringIO()
+        call_command("import_games", f.name, user="testuser", stdout=out, stderr=out)
+        self.assertIn("Imported 2 games", out.getvalue())
+        self.assertIn("unknown site 'Nowhere'", out.getvalue())
+
+
+class ExportTest(TestCase):
+    """Tests for the streaming CSV exports."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.client.login(username="testuser", password="testpass123")
+        self.site = Site.objects.create(
+            name="Test Site", address="123 Test St, Nashville, TN"
+        )
+        self.league = League.objects.create(
+            organization="Test League",
+            assignor="Test Assignor",
+            game_fee=Decimal("50.00"),
+        )
+        for position, mileage in (("Referee", 12.0), ("Umpire", 12.5)):
+            Game.objects.create(
+                user=self.user,
+                date=date(2025, 9, 5),
+                site=self.site,
+                league=self.league,
+                position=position,
+                mileage=mileage,
+                fee_paid=position == "Referee",
+            )
+        Game.objects.create(
+            user=self.user, date=date(2024, 9, 5), site=self.site, fee=Decimal("40")
+        )
+
+    def _rows(self, response):
+        content = b"".join(response.streaming_content).decode()
+        return list(csv.reader(StringIO(content)))
+
+    def test_export_games_streams_all_games(self):
+        """Test the export includes paid games and counts trip miles once."""
+        response = self.client.get(reverse("export_games"))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = self._rows(response)
+        self.assertEqual(rows[0][0], "date")
+        self.assertEqual(len(rows), 4)
+        self.assertEqual([row[-1] for row in rows[2:]], ["25.0", "0"])
+        self.assertEqual(rows[1][5], "40.00")
+
+    def test_export_games_uses_list_filters(self):
+        """Test the export honours the game list's filter parameters."""
+        response = self.client.get(
+            reverse("export_games"), {"filter_year": "2025", "filter_paid": "unpaid"}
+        )
+        rows = self._rows(response)
+        self.assertIn("games-2025.csv", response["Content-Disposition"])
+        self.assertEqual([row[4] for row in rows[1:]], ["Umpire"])
+
+    def test_export_stats(self):
+        """Test the stats export lists rollup rows."""
+        rows = self._rows(self.client.get(reverse("export_stats")))
+        self.assertIn(["year", "2025", "2", "100.00", "50.00", "50.00", "25.0"], rows)
+
+    def test_export_games_command(self):
+        """Test the export_games command writes CSV to stdout."""
+        out = StringIO()
+        call_command("export_games", user="testuser", year="2024", stdout=out)
+        rows = list(csv.reader(StringIO(out.getvalue())))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][0], "2024-09-05")
+
+
+class MapsClientTest(TestCase):
+    """Tests for the shared Distance Matrix client and its circuit breaker."""
+
+    def setUp(self):
+        distance_lru.clear()
+        distance_metrics.clear()
+        maps_client.reset()
+        self.addCleanup(maps_client.reset)
+
+    @patch("tracker.utils.googlemaps.Client")
+    def test_client_is_created_once(self, mock_client_class):
+        """Test repeated lookups reuse one client with timeouts configured."""
+        mock_client_class.return_value.distance_matrix.return_value = _matrix_response(
+            16093
+        )
+        distance_miles("Nashville, TN", "Franklin, TN")
+        distance_miles("Nashville, TN", "Brentwood, TN")
+        mock_client_class.assert_called_once()
+        kwargs = mock_client_class.call_args.kwargs
+        self.assertEqual(kwargs["connect_timeout"], settings.MAPS_CONNECT_TIMEOUT)
+        self.assertEqual(kwargs["read_timeout"], settings.MAPS_READ_TIMEOUT)
+        self.assertEqual(kwargs["retry_timeout"], settings.MAPS_RETRY_TIMEOUT)
+        counts = distance_metrics.snapshot()
+        self.assertEqual(counts["api_call"], 2)
+        self.assertEqual(counts["miss"], 2)
+
+    @override_settings(MAPS_BREAKER_THRESHOLD=2, MAPS_BREAKER_COOLDOWN=60)
+    @patch("tracker.utils.googlemaps.Client")
+    def test_breaker_opens_after_failures(self, mock_client_class):
+        """Test consecutive failures stop further API calls."""
+        matrix = mock_client_class.return_value.distance_matrix
+        matrix.side_effect = Exception("timeout")
+        for _ in range(3):
+            with self.assertRaises(DistanceError):
+                distance_miles("Nashville, TN", "Franklin, TN")
+        self.assertEqual(matrix.call_count, 2)
+        self.assertTrue(maps_client.is_open)
+        counts = distance_metrics.snapshot()
+        self.assertEqual(counts["api_failure"], 2)
+        self.assertEqual(counts["api_short_circuit"], 1)
+
+    @override_settings(MAPS_BREAKER_THRESHOLD=1, MAPS_BREAKER_COOLDOWN=0)
+    @patch("tracker.utils.googlemaps.Client")
+    def test_breaker_closes_after_success(self, mock_client_class):
+        """Test a successful call after the cooldown closes the breaker."""
+        matrix = mock_client_class.return_value.distance_matrix
+        matrix.side_effect = [Exception("timeout"), _matrix_response(16093)]
+        with self.assertRaises(DistanceError):
+            distance_miles("Nashville, TN", "Franklin, TN")
+        self.assertEqual(distance_miles("Nashville, TN", "Franklin, TN"), 10.0)
+        self.assertFalse(maps_client.is_open)
+
+    def test_metrics_view_requires_staff(self):
+        """Test the metrics endpoint is limited to staff users."""
+        user = User.objects.create_user(username="staff", password="pw", is_staff=True)
+        distance_metrics.incr("lru_hit")
+        self.client.login(username="staff", password="pw")
+        response = self.client.get(reverse("distance_metrics"))
+        self.assertEqual(response.json()["counts"], {"lru_hit": 1})
+        user.is_staff = False
+        user.save()
+        response = self.client.get(reverse("distance_metrics"))
+        self.assertEqual(response.status_code, 302)
+
+
+class GeoTest(TestCase):
+    """Tests for geocoded coordinates and offline distance estimates."""
+
+    NASHVILLE = (36.1627, -86.7816)
+    MEMPHIS = (35.1495, -90.0490)
+
+    def setUp(self):
+        """Set up test data."""
+        distance_lru.clear()
+        maps_client.reset()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.home = "1 Home St, Nashville, TN"
+        self.site = Site.objects.create(name="Memphis Field", address="1 Field Rd")
+        self.league = League.objects.create(
+            organization="Test League",
+            assignor="Test Assignor",
+            game_fee=Decimal("50.00"),
+        )
+
+    def _locate(self, address, point):
+        Location.objects.create(
+            name=address,
+            address=normalize_address(address),
+            latitude=point[0],
+            longitude=point[1],
+        )
+
+    def test_haversine_many(self):
+        """Test great-circle miles for several points at once."""
+        miles = haversine_many(
+            self.NASHVILLE, {"here": self.NASHVILLE, "m": self.MEMPHIS}
+        )
+        self.assertEqual(miles["here"], 0.0)
+        self.assertAlmostEqual(miles["m"], 197, delta=2)
+
+    def test_estimates_scale_straight_line(self):
+        """Test estimates apply the road factor and skip ungeocoded sites."""
+        self._locate(self.home, self.NASHVILLE)
+        self._locate(self.site.address, self.MEMPHIS)
+        Site.objects.create(name="Unknown Field", address="2 Nowhere Rd")
+        with override_settings(DISTANCE_ESTIMATE_FACTOR=1.0):
+            self.assertAlmostEqual(
+                estimate_miles(self.home, self.site.address), 197, delta=2
+            )
+        self.assertEqual(list(site_estimates(self.home)), [self.site.pk])
+        self.assertIsNone(estimate_miles(self.home, "2 Nowhere Rd"))
+
+    @patch("tracker.utils.googlemaps.Client")
+    def test_geocode_once_per_address(self, mock_client_class):
+        """Test an address is geocoded once and then read from Location."""
+        geocode_api = mock_client_class.return_value.geocode
+        geocode_api.return_value = [
+            {"geometry": {"location": {"lat": 35.1495, "lng": -90.049}}}
+        ]
+        location = geocode(" 1 Field  Rd ", "Memphis Field")
+        self.assertEqual(location.address, "1 field rd")
+        self.assertEqual(location.latitude, 35.1495)
+        geocode("1 field rd")
+        geocode_api.assert_called_once_with(" 1 Field  Rd ")
+
+    @patch("tracker.utils.googlemaps.Client")
+    def test_geocode_missing_stores_unresolved(self, mock_client_class):
+        """Test the worker pass geocodes new addresses and remembers misses."""
+        mock_client_class.return_value.geocode.return_value = []
+        self.assertEqual(geocode_missing(), 1)
+        location = Location.objects.get(address="1 field rd")
+        self.assertIsNone(location.latitude)
+        self.assertEqual(geocode_missing(), 0)
+
+    @patch("tracker.utils.googlemaps.Client")
+    def test_geocode_missing_since_checks_changed_rows(self, mock_client_class):
+        """Test a pass from ``since`` only looks at rows saved after it."""
+        geocode_api = mock_client_class.return_value.geocode
+        geocode_api.return_value = []
+        since = timezone.now()
+        Site.objects.filter(pk=self.site.pk).update(updated_at=since - timedelta(1))
+        Profile.objects.update(updated_at=since - timedelta(1))
+        with self.assertNumQueries(2):
+            self.assertEqual(geocode_missing(since=since), 0)
+        self.user.profile.home_address = self.home
+        self.user.profile.save()
+        self.assertEqual(geocode_missing(since=since), 1)
+        geocode_api.assert_called_once_with(self.home)
+
+    def test_worker_geocodes_rows_changed_since_last_pass(self):
+        """Test the worker moves ``since`` on only after a pass succeeds."""
+        worker = "tracker.management.commands.run_distance_worker"
+        passes = [DistanceError("down"), 0, 0]
+        with (
+            patch(f"{worker}.geocode_missing", side_effect=passes) as mock_missing,
+            patch(f"{worker}.time.sleep", side_effect=[None, None, SystemExit]),
+            self.assertRaises(SystemExit),
+        ):
+            call_command("run_distance_worker", stdout=StringIO())
+        since = [c.kwargs["since"] for c in mock_missing.call_args_list]
+        self.assertEqual(since[:2], [None, None])
+        self.assertLess(since[2], timezone.now())
+
+    @override_settings(DISTANCE_LOOKUP_ASYNC=False)
+    @patch("tracker.utils.googlemaps.Client")
+    def test_site_save_geocodes_inline(self, mock_client_class):
+        """Test saving a site geocodes its new address when lookups are inline."""
+        mock_client_class.return_value.geocode.return_value = [
+            {"geometry": {"location": {"lat": 36.0, "lng": -86.0}}}
+        ]
+        self.site.address = "3 New Rd"
+        self.site.save()
+        self.assertEqual(Location.objects.get(address="3 new rd").latitude, 36.0)
+
+    @override_settings(DISTANCE_LOOKUP_ASYNC=False)
+    @patch("tracker.forms.distance_miles", side_effect=DistanceError("down"))
+    def test_form_falls_back_to_estimate(self, mock_distance):
+        """Test a failed lookup saves the estimate instead of zero miles."""
+        self.user.profile.home_address = self.home
+        self.user.profile.save()
+        self._locate(self.home, self.NASHVILLE)
+        self._locate(self.site.address, self.MEMPHIS)
+        form = GameForm(
+            data={
+                "date": "2025-11-15",
+                "site": self.site.id,
+                "league": self.league.id,
+                "mileage": 0.0,
+            },
+            user=self.user,
+        )
+        self.assertTrue(form.is_valid())
+        game = form.save()
+        self.assertGreater(game.mileage, 200)
+
+
+class SiteDistancePreviewTest(TestCase):
+    """Tests for the site mileage preview map and endpoint."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        distance_lru.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.user.profile.home_address = "1 Home St"
+        self.user.profile.save()
+        self.client.login(username="testuser", password="testpass123")
+        self.near = Site.objects.create(name="Near Field", address="2 Near Rd")
+        self.far = Site.objects.create(name="Far Field", address="3 Far Rd")
+        DistanceCache.objects.create(
+            origin="1 home st", destination="2 near rd", miles=4.5
+        )
+
+    @patch("tracker.utils.googlemaps.Client")
+    def test_add_page_ships_site_map(self, mock_client_class):
+        """Test the add-game page embeds cached miles without calling the API."""
+        response = self.client.get(reverse("add_game"))
+        self.assertEqual(response.context["site_miles"], {self.near.pk: 4.5})
+        self.assertContains(response, 'id="site-miles"')
+        mock_client_class.assert_not_called()
+
+    def test_site_distance_json_with_etag(self):
+        """Test the endpoint answers from the map with caching headers."""
+        url = reverse("site_distance")
+        response = self.client.get(url, {"site": self.near.pk})
+        self.assertEqual(response.json(), {"site": str(self.near.pk), "miles": 4.5})
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn("max-age=300", response["Cache-Control"])
+        again = self.client.get(
+            url, {"site": self.near.pk}, HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(again.status_code, 304)
+        unknown = self.client.get(url, {"site": self.far.pk})
+        self.assertIsNone(unknown.json()["miles"])
+
+    def test_map_cached_per_home_address(self):
+        """Test the map is built once per user and rebuilt for a new address."""
+        with patch("tracker.views.preview_site_miles", return_value={}) as build:
+            self.client.get(reverse("site_distance"), {"site": self.near.pk})
+            self.client.get(reverse("site_distance"), {"site": self.far.pk})
+            self.assertEqual(build.call_count, 1)
+            self.user.profile.home_address = "9 Other St"
+            self.user.profile.save()
+            self.client.get(reverse("site_distance"), {"site": self.near.pk})
+            self.assertEqual(build.call_count, 2)
+            build.assert_called_with("9 Other St")
+
+
+class DistancePrefetchTest(TestCase):
+    """Tests for warming distances after a home address change."""
+
+    NEW_HOME = "9 New St, Nashville, TN, 37203"
+
+    def setUp(self):
+        """Set up test data."""
+        distance_lru.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.client.login(username="testuser", password="testpass123")
+        self.site = Site.objects.create(name="Test Site", address="1 Field Rd")
+        self.league = League.objects.create(
+            organization="Test League",
+            assignor="Test Assignor",
+            game_fee=Decimal("50.00"),
+        )
+        self.unpaid = Game.objects.create(
+            user=self.user, date=date(2025, 3, 1), site=self.site, mileage=5.0
+        )
+        self.paid = Game.objects.create(
+            user=self.user,
+            date=date(2025, 3, 2),
+            site=self.site,
+            mileage=5.0,
+            mileage_paid=True,
+        )
+
+    def _edit_address(self, **extra):
+        return self.client.post(
+            reverse("profile_edit"),
+            {
+                "username": "testuser",
+                "email": "",
+                "home_address": "9 New St",
+                "city": "Nashville",
+                "state": "TN",
+                "zip_code": "37203",
+                **extra,
+            },
+        )
+
+    def test_address_change_queues_prefetch(self):
+        """Test editing the home address queues one prefetch for the user."""
+        self._edit_address(recompute_mileage="on")
+        task = DistancePrefetch.objects.get(user=self.user)
+        self.assertEqual(task.origin, self.NEW_HOME)
+        self.assertTrue(task.recompute_mileage)
+        DistancePrefetch.objects.all().delete()
+        self.user.profile.first_name = "Pat"
+        self.user.profile.save()
+        self.assertFalse(DistancePrefetch.objects.exists())
+
+    @patch("tracker.tasks.distance_miles_many")
+    def test_prefetch_recomputes_unpaid_mileage(self, mock_many):
+        """Test unpaid games take the new distance in one bulk update."""
+        mock_many.return_value = {"1 Field Rd": 12.0}
+        self._edit_address(recompute_mileage="on")
+        self.assertEqual(run_prefetch_tasks(), 1)
+        mock_many.assert_called_once_with(self.NEW_HOME, {"1 Field Rd"})
+        self.unpaid.refresh_from_db()
+        self.paid.refresh_from_db()
+        self.assertEqual(self.unpaid.mileage, 12.0)
+        self.assertEqual(self.paid.mileage, 5.0)
+        self.assertEqual(self.unpaid.trip.mileage, 24.0)
+        year = StatsRollup.objects.get(user=self.user, dimension="year")
+        self.assertEqual(year.total_mileage, 34.0)
+        self.assertFalse(DistancePrefetch.objects.exists())
+
+    @patch("tracker.tasks.distance_miles_many", return_value={"1 Field Rd": 12.0})
+    def test_prefetch_without_recompute_keeps_mileage(self, mock_many):
+        """Test an unchecked box only warms the cache."""
+        self._edit_address()
+        run_prefetch_tasks()
+        mock_many.assert_called_once()
+        self.unpaid.refresh_from_db()
+        self.assertEqual(self.unpaid.mileage, 5.0)
+
+    @patch("tracker.tasks.distance_miles_many", side_effect=DistanceError("down"))
+    def test_failed_prefetch_backs_off(self, mock_many):
+        """Test a failed prefetch is rescheduled rather than dropped."""
+        self._edit_address()
+        run_prefetch_tasks()
+        task = DistancePrefetch.objects.get()
+        self.assertEqual(task.attempts, 1)
+        self.assertGreater(task.run_after, timezone.now())
+
+
+class MarkPaidTest(UserGamesMixin, TestCase):
+    """Tests for marking many games paid in one request."""
+
+    def _post(self, **data):
+        return self.client.post(reverse("mark_paid"), data)
+
+    def test_month_marks_fees_and_refreshes_rollups(self):
+        """Test a month's fees are marked paid, skipping volunteer games."""
+        march = self._game(date(2025, 3, 1))
+        volunteer = self._game(date(2025, 3, 8), is_volunteer=True)
+        april = self._game(date(2025, 4, 1))
+        response = self._post(month="2025-03", filter_year="2025", filter_paid="all")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["updated"], {"fee_paid": 1, "mileage_paid": 0})
+        self.assertEqual(data["summary"]["count"], 3)
+        self.assertEqual(Decimal(data["summary"]["paid_fees"]), Decimal("50.00"))
+        self.assertEqual(Decimal(data["summary"]["unpaid_fees"]), Decimal("50.00"))
+        for game, paid in ((march, True), (volunteer, False), (april, False)):
+            game.refresh_from_db()
+            self.assertEqual(game.fee_paid, paid)
+        year = StatsRollup.objects.get(user=self.user, dimension="year")
+        self.assertEqual(year.paid_fees, Decimal("50.00"))
+        self.assertEqual(year.unpaid_fees, Decimal("50.00"))
+
+    def test_league_marks_mileage_and_trips(self):
+        """Test mileage marked paid by league settles each fully paid trip."""
+        self._game(date(2025, 3, 1), mileage=10.0)
+        self._game(date(2025, 3, 1), league=self.other_league, mileage=10.0)
+        self._game(date(2025, 3, 2), mileage=8.0)
+        response = self._post(league="Test League", paid="mileage")
+        self.assertEqual(response.json()["updated"]["mileage_paid"], 2)
+        self.assertFalse(Game.objects.filter(fee_paid=True).exists())
+        trips = dict(Trip.objects.values_list("date", "mileage_paid"))
+        self.assertEqual(trips, {date(2025, 3, 1): False, date(2025, 3, 2): True})
+        self._post(assignor="Other Assignor", paid="mileage")
+        self.assertTrue(Trip.objects.get(date=date(2025, 3, 1)).mileage_paid)
+
+    def test_selection_is_limited_to_own_games(self):
+        """Test selected ids belonging to another user are left alone."""
+        other = User.objects.create_user(username="other", password="pw")
+        mine = self._game(date(2025, 3, 1))
+        theirs = self._game(date(2025, 3, 1), user=other)
+        response = self._post(game=[mine.pk, theirs.pk])
+        self.assertEqual(response.json()["updated"]["fee_paid"], 1)
+        theirs.refresh_from_db()
+        self.assertFalse(theirs.fee_paid)
+
+    def test_fees_marked_with_one_update(self):
+        """Test the games are written by a single UPDATE statement."""
+        for day in range(1, 6):
+            self._game(date(2025, 3, day))
+        with CaptureQueriesContext(connection) as queries:
+            self._post(month="2025-03")
+        updates = [q for q in queries if q["sql"].startswith('UPDATE "tracker_game"')]
+        self.assertEqual(len(updates), 1)
+
+    def test_requires_a_scope(self):
+        """Test requests without games or with bad input are rejected."""
+        self._game(date(2025, 3, 1))
+        self.assertEqual(self._post().status_code, 400)
+        self.assertEqual(self._post(month="March").status_code, 400)
+        self.assertEqual(self._post(month="2025-03", paid="tip").status_code, 400)
+        self.assertFalse(Game.objects.filter(fee_paid=True).exists())
+
+
+class PaymentReconcileTest(UserGamesMixin, TestCase):
+    """Tests for matching deposits to unpaid games."""
+
+    def _payment(self, amount, **kwargs):
+        kwargs.setdefault("date", date(2025, 6, 1))
+        return Payment.objects.create(user=self.user, amount=Decimal(amount), **kwargs)
+
+    def test_best_subset(self):
+        """Test the subset search prefers exact, then closest-under, then oldest."""
+        self.assertEqual(best_subset(8000, [5000, 3000, 5000, 3000]), [0, 1])
+        self.assertEqual(best_subset(7000, [5000, 3000, 2500]), [1, 2])
+        self.assertEqual(best_subset(7000, [5000, 3000]), [0])
+        self.assertEqual(best_subset(100, [500]), [])
+        self.assertEqual(best_subset(0, [500]), [])
+
+    def test_best_subset_many_games(self):
+        """Test an exact match is found among hundreds of outstanding fees."""
+        fees = [1500 + (i * 7919) % 8500 for i in range(400)]
+        chosen = best_subset(sum(fees[100:250]), fees)
+        self.assertEqual(sum(fees[i] for i in chosen), sum(fees[100:250]))
+
+    def test_best_subset_memory_is_bounded(self):
+        """Test a one-cent divisor and an unreachable total stay within memory."""
+        # Every sum up to ~$24,000 in cents is searched, with no exact match
+        # to stop early: one set of sums per fee would take over 100 MiB
+        fees = [2500 + (i * 7919) % 7501 for i in range(400)]
+        tracemalloc.start()
+        try:
+            chosen = best_subset(sum(fees) - 1, fees)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(sum(fees[i] for i in chosen), sum(fees) - min(fees))
+        self.assertLess(peak, 32 * 2**20)
+
+    def test_best_subset_large_target_takes_oldest_first(self):
+        """Test targets past MAX_SUBSET_TARGET fall back to oldest first."""
+        with patch("tracker.payments.MAX_SUBSET_TARGET", 100):
+            self.assertEqual(best_subset(7001, [5001, 3000, 2000]), [0, 2])
+
+    def test_reconcile_marks_exact_match_paid(self):
+        """Test the matched games are marked paid and linked to the payment."""
+        first = self._game(date(2025, 3, 1))
+        custom = self._game(date(2025, 3, 2), fee=Decimal("35.00"))
+        later = self._game(date(2025, 3, 3))
+        self._game(date(2025, 3, 4), is_volunteer=True)
+        payment = self._payment("85.00")
+        matched = reconcile(payment)
+        self.assertEqual(matched, [first, custom])
+        self.assertEqual(set(payment.games.all()), {first, custom})
+        later.refresh_from_db()
+        self.assertFalse(later.fee_paid)
+        self.assertIsNotNone(payment.reconciled_at)
+        year = StatsRollup.objects.get(user=self.user, dimension="year")
+        self.assertEqual(year.paid_fees, Decimal("85.00"))
+
+    def test_reconcile_limited_to_payer_and_date(self):
+        """Test only the payer's games played by the deposit date are matched."""
+        self._game(date(2025, 3, 1), league=self.other_league)
+        ours = self._game(date(2025, 3, 2))
+        self._game(date(2025, 7, 1))
+        payment = self._payment("100.00", assignor="Test Assignor")
+        self.assertEqual(reconcile(payment), [ours])
+
+    def test_record_payment_view(self):
+        """Test recording a payment reports what was and wasn't matched."""
+        self._game(date(2025, 3, 1))
+        self._game(date(2025, 3, 2))
+        response = self.client.post(
+            reverse("record_payment"),
+            {"date": "2025-06-01", "amount": "120.00", "league": self.league.pk},
+            follow=True,
+        )
+        self.assertRedirects(response, reverse("game_list"))
+        text = [str(m) for m in response.context["messages"]]
+        self.assertIn("Matched 2 games totalling $100.00 to the $120.00 payment.", text)
+        self.assertIn("$20.00 could not be matched to unpaid games.", text)
+        self.assertEqual(Game.objects.filter(fee_paid=True).count(), 2)
+
+
+class EffectiveFeeTest(TestCase):
+    """Tests for the effective fee stored on each game."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username="testuser", password="pw")
+        self.site = Site.objects.create(name="Test Site", address="1 Field Rd")
+        self.league = League.objects.create(
+            organization="Test League",
+            assignor="Test Assignor",
+            game_fee=Decimal("50.00"),
+        )
+
+    def _game(self, **kwargs):
+        return Game.objects.create(
+            user=self.user,
+            date=date(2025, 3, 1),
+            site=self.site,
+            league=self.league,
+            **kwargs,
+        )
+
+    def test_set_on_save(self):
+        """Test a game's own fee wins over its league's."""
+        self.assertEqual(self._game().effective_fee, Decimal("50.00"))
+        game = self._game(fee=Decimal("65.00"))
+        self.assertEqual(game.effective_fee, Decimal("65.00"))
+        game.fee = None
+        game.save(update_fields=["fee"])
+        game.refresh_from_db()
+        self.assertEqual(game.effective_fee, Decimal("50.00"))
+
+    def test_league_fee_change_updates_games(self):
+        """Test a league fee change reaches games without their own fee."""
+        default = self._game()
+        custom = self._game(fee=Decimal("65.00"))
+        self.league.game_fee = Decimal("55.00")
+        self.league.save()
+        default.refresh_from_db()
+        custom.refresh_from_db()
+        self.assertEqual(default.effective_fee, Decimal("55.00"))
+        self.assertEqual(custom.effective_fee, Decimal("65.00"))
+        year = StatsRollup.objects.get(user=self.user, dimension="year")
+        self.assertEqual(year.total_fees, Decimal("120.00"))
+
+    def test_league_delete_clears_fee(self):
+        """Test games left without a league or fee have no effective fee."""
+        default = self._game()
+        custom = self._game(fee=Decimal("65.00"))
+        self.league.delete()
+        default.refresh_from_db()
+        custom.refresh_from_db()
+        self.assertIsNone(default.effective_fee)
+        self.assertEqual(custom.effective_fee, Decimal("65.00"))
+
+    @patch("tracker.importers.distance_miles_many", return_value={})
+    def test_import_sets_fee(self, mock_many):
+        """Test bulk-imported games get their effective fee."""
+        rows = parse_csv(
+            StringIO("date,site,league,fee\n2025-03-01,Test Site,Test League,\n")
+        )
+        import_games(self.user, rows)
+        self.assertEqual(Game.objects.get().effective_fee, Decimal("50.00"))
+
+
+class PageCacheTest(TestCase):
+    """Tests for the per-user Game List and Stats page cache."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.client.login(username="testuser", password="testpass123")
+        self.site = Site.objects.create(name="Test Site", address="1 Field Rd")
+        self.league = League.objects.create(
+            organization="Test League",
+            assignor="Test Assignor",
+            game_fee=Decimal("50.00"),
+        )
+        self.game = Game.objects.create(
+            user=self.user, date=date(2025, 3, 1), site=self.site, league=self.league
+        )
+        self.url = reverse("game_list") + "?filter_year="
+
+    def _queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, len(queries)
+
+    def test_repeat_views_skip_game_queries(self):
+        """Test a repeat view is served from the cache with fewer queries."""
+        for url, key in ((self.url, "summary"), (reverse("game_stats"), "by_year")):
+            first, cold = self._queries(url)
+            second, warm = self._queries(url)
+            self.assertLess(warm, cold)
+            self.assertEqual(first.context[key], second.context[key])
+
+    def test_game_changes_invalidate(self):
+        """Test saving and deleting a game retires the cached list."""
+        self.client.get(self.url)
+        Game.objects.create(
+            user=self.user, date=date(2025, 3, 2), site=self.site, league=self.league
+        )
+        self.assertEqual(self.client.get(self.url).context["summary"]["count"], 2)
+        self.game.delete()
+        self.assertEqual(self.client.get(self.url).context["summary"]["count"], 1)
+
+    def test_league_change_invalidates(self):
+        """Test a league fee change reaches cached stats."""
+        self.client.get(reverse("game_stats"))
+        self.league.game_fee = Decimal("60.00")
+        self.league.save()
+        response = self.client.get(reverse("game_stats"))
+        self.assertEqual(response.context["by_year"][0].total_fees, Decimal("60.00"))
+
+    def test_bulk_mark_paid_invalidates(self):
+        """Test writes that skip the Game signals still retire the cache."""
+        self.client.get(self.url)
+        self.client.post(reverse("mark_paid"), {"month": "2025-03"})
+        summary = self.client.get(self.url).context["summary"]
+        self.assertEqual(summary["unpaid_fees"], 0)
+
+    def test_other_users_unaffected(self):
+        """Test a user's cache is not retired by someone else's games."""
+        self.client.get(self.url)
+        other = User.objects.create_user(username="other", password="pw")
+        Game.objects.create(user=other, date=date(2025, 3, 1), site=self.site)
+        _, warm = self._queries(self.url)
+        _, cold = self._queries(self.url + "&page=1")
+        self.assertLess(warm, cold)
+
+    def test_changes_in_another_process_invalidate(self):
+        """Test a change made with another process's cache retires this one's."""
+        self.client.get(self.url)
+        worker_cache = LocMemCache("worker", {})
+        with patch("tracker.page_cache.cache", worker_cache):
+            mark_paid(Game.objects.filter(pk=self.game.pk))
+        summary = self.client.get(self.url).context["summary"]
+        self.assertEqual(summary["unpaid_fees"], 0)
+
+    def _rendered_months(self, url):
+        response = self.client.get(url)
+        return response, [label for label, _, _ in response.context["games_by_month"]]
+
+    def test_month_fragments_rerender_changed_month(self):
+        """Test a game change re-renders its month; the others come from cache."""
+        Game.objects.create(
+            user=self.user, date=date(2025, 1, 5), site=self.site, league=self.league
+        )
+        _, rendered = self._rendered_months(self.url)
+        self.assertEqual(rendered, ["January 2025", "March 2025"])
+        _, rendered = self._rendered_months(self.url)
+        self.assertEqual(rendered, [])
+
+        moved = Game.objects.create(
+            user=self.user, date=date(2025, 2, 5), site=self.site, league=self.league
+        )
+        response, rendered = self._rendered_months(self.url)
+        self.assertEqual(rendered, ["February 2025"])
+        self.assertContains(response, 'id="month-2025-01"')
+        self.assertEqual(response.context["summary"]["count"], 3)
+
+        moved.date = date(2025, 3, 5)
+        moved.save()
+        response, rendered = self._rendered_months(self.url)
+        self.assertEqual(rendered, ["March 2025"])  # February is now empty
+        self.assertNotContains(response, 'id="month-2025-02"')
+        self.assertContains(response, "(2 games)")
+
+    def test_worker_changes_rerender_their_month(self):
+        """Test mileage filled in by the distance worker, with its own cache,
+        re-renders that month here."""
+        pending = Game.objects.create(
+            user=self.user,
+            date=date(2025, 1, 5),
+            site=self.site,
+            league=self.league,
+            mileage_pending=True,
+        )
+        response = self.client.get(self.url)
+        self.assertContains(response, "pending…")
+        with patch("tracker.page_cache.cache", LocMemCache("worker", {})):
+            _set_mileage(pending, 12.0)
+        response, rendered = self._rendered_months(self.url)
+        self.assertEqual(rendered, ["January 2025"])
+        self.assertNotContains(response, "pending…")
+
+    def test_wider_changes_rerender_every_month(self):
+        """Test a league rename and a bulk update re-render all months."""
+        Game.objects.create(
+            user=self.user, date=date(2025, 1, 5), site=self.site, league=self.league
+        )
+        url = self.url + "&filter_paid=all"
+        self.client.get(url)
+        self.league.organization = "Renamed League"
+        self.league.save()
+        response, rendered = self._rendered_months(url)
+        self.assertEqual(rendered, ["January 2025", "March 2025"])
+        self.assertNotContains(response, "Test League")
+
+        self.client.post(reverse("mark_paid"), {"month": "2025-03"})
+        _, rendered = self._rendered_months(url)
+        self.assertEqual(rendered, ["January 2025", "March 2025"])
+
+    def test_cached_months_carry_request_csrf_token(self):
+        """Test cached month blocks get the viewer's CSRF token, not a stale one."""
+        self.client.get(self.url)
+        response, rendered = self._rendered_months(self.url)
+        self.assertEqual(rendered, [])
+        content = response.content.decode()
+        self.assertNotIn(CSRF_PLACEHOLDER, content)
+        self.assertIn('name="csrfmiddlewaretoken" value="', content)
+
+
+class RequestTimingTest(TestCase):
+    """Tests for the sampled request timing middleware."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.client = Client()
+        User.objects.create_user(username="testuser", password="testpass123")
+        self.client.login(username="testuser", password="testpass123")
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1.0)
+    def test_sampled_request_is_timed(self):
+        """Test a sampled view gets a Server-Timing header and a log line."""
+        with self.assertLogs("tracker.middleware", "INFO") as logs:
+            response = self.client.get(reverse("game_stats"))
+        timing = response["Server-Timing"]
+        self.assertIn("db;dur=", timing)
+        self.assertIn("tpl;dur=", timing)
+        self.assertIn("total;dur=", timing)
+        self.assertIn("view=game_stats method=GET status=200", logs.output[0])
+        fields = logs.records[0].timing
+        self.assertGreater(fields["db_queries"], 0)
+        self.assertEqual(fields["maps_calls"], 0)
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0.0)
+    def test_unsampled_request_is_untouched(self):
+        """Test requests outside the sample carry no timing header."""
+        response = self.client.get(reverse("game_stats"))
+        self.assertNotIn("Server-Timing", response)
+
+    @patch("tracker.utils.googlemaps.Client")
+    def test_maps_calls_are_timed(self, mock_client_class):
+        """Test Maps API requests are counted while timings are collected."""
+        mock_client_class.return_value.distance_matrix.return_value = _matrix_response(
+            16093
+        )
+        maps_client.reset()
+        self.addCleanup(maps_client.reset)
+        distance_lru.clear()
+        with collecting() as timings:
+            distance_miles("Nashville, TN", "Franklin, TN")
+        self.assertEqual(timings.counts["maps"], 1)
+        self.assertGreaterEqual(timings.seconds["maps"], 0)
+
+
+class BenchmarkTest(TestCase):
+    """Tests for the benchmark data generator and view benchmark runner."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.users = seed_histories(
+            random.Random(3), n_users=2, years=2, games_per_year=100
+        )
+
+    def test_histories_are_realistic(self):
+        """Test seeded histories mix game shapes and payment states."""
+        games = Game.objects.filter(user=self.users[0])
+        self.assertGreaterEqual(games.count(), 200)
+        self.assertGreater(Game.objects.filter(user=self.users[1]).count(), 0)
+        per_day = {}
+        for day in games.values_list("date", flat=True):
+            per_day[day] = per_day.get(day, 0) + 1
+        self.assertTrue(any(count > 1 for count in per_day.values()))
+        self.assertTrue(games.filter(is_volunteer=True).exists())
+        self.assertTrue(games.filter(fee__isnull=False).exists())
+        self.assertTrue(games.filter(fee_paid=True).exists())
+        self.assertTrue(games.filter(fee_paid=False, is_volunteer=False).exists())
+        self.assertFalse(games.filter(is_volunteer=True, fee_paid=True).exists())
+        self.assertTrue(Trip.objects.filter(user=self.users[0]).exists())
+        self.assertTrue(StatsRollup.objects.filter(user=self.users[0]).exists())
+
+    def test_benchmark_covers_every_view_and_rolls_back(self):
+        """Test every view is timed, POSTs leave no trace and regressions are found."""
+        user = self.users[0]
+        before = Game.objects.filter(user=user).count()
+        results = benchmark_views(user, repeat=1, warmup=0)
+
+        self.assertEqual(uncovered_url_names(user), set())
+        for result in results:
+            self.assertIn(result.status, (200, 302), result.name)
+            self.assertGreater(result.queries, 0, result.name)
+        self.assertEqual(Game.objects.filter(user=user).count(), before)
+        self.assertFalse(User.objects.get(pk=user.pk).is_staff)
+        self.assertFalse(Payment.objects.exists())
+
+        # More queries always regress; latency within tolerance does not
+        result = results[0]
+        baseline = {
+            result.name: {
+                "queries": result.queries,
+                "p95_ms": result.p95_ms,
+                "peak_kib": result.peak_kib,
+            }
+        }
+        self.assertEqual(regressions([result], baseline, 0.5), [])
+        baseline[result.name]["queries"] -= 1
+        baseline[result.name]["p95_ms"] = result.p95_ms / 1.2
+        found = regressions([result], baseline, 0.5)
+        self.assertEqual(len(found), 1)
+        self.assertIn("queries", found[0])
+
+    def test_list_rows_use_less_memory(self):
+        """Test game list rows take less memory than full Game instances."""
+        peaks = list_memory(self.users[0])
+        self.assertLess(peaks["GameRow"], peaks["Game instances"])
+
+    def test_commands(self):
+        """Test seeding refuses to duplicate and the runner checks its baseline."""
+        with self.assertRaises(CommandError):
+            call_command("seed_benchmark", stdout=StringIO())
+        call_command(
+            "seed_benchmark",
+            clear=True,
+            users=1,
+            years=1,
+            games_per_year=40,
+            stdout=StringIO(),
+        )
+        self.assertEqual(User.objects.filter(username__startswith="bench-").count(), 1)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "baseline.json")
+            options = {"repeat": 1, "warmup": 0, "baseline": path, "stdout": StringIO()}
+            call_command("benchmark_views", save_baseline=True, **options)
+            with open(path) as f:
+                baseline = json.load(f)
+            self.assertIn("game_list", baseline)
+            call_command("benchmark_views", tolerance=100, **options)
+
+            baseline["game_list"]["queries"] = 0
+            with open(path, "w") as f:
+                json.dump(baseline, f)
+            with self.assertRaisesMessage(CommandError, "game_list"):
+                call_command("benchmark_views", tolerance=100, **options)
+
+
+@override_settings(SYNC_TOKEN_OVERLAP=0)
+class SyncTest(TestCase):
+    """Tests for the delta sync and offline upload API."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.client.login(username="testuser", password="testpass123")
+        self.other = User.objects.create_user(username="other", password="x")
+        self.site = Site.objects.create(name="Test Site", address="1 Field Rd")
+        self.league = League.objects.create(
+            organization="Test League",
+            assignor="Test Assignor",
+            game_fee=Decimal("50.00"),
+        )
+        self.games = [
+            Game.objects.create(
+                user=self.user,
+                date=date(2025, 3, day),
+                site=self.site,
+                league=self.league,
+            )
+            for day in (1, 8, 15)
+        ]
+        Game.objects.create(user=self.other, date=date(2025, 3, 1), site=self.site)
+        # Everything so far was synced an hour ago
+        hour_ago = timezone.now() - timedelta(hours=1)
+        for model in (Game, Site, League):
+            model.objects.update(updated_at=hour_ago)
+        self.token = make_token(hour_ago + timedelta(seconds=1))
+
+    def _changes(self, token=None):
+        params = {"token": token} if token else {}
+        response = self.client.get(reverse("sync_changes"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def _upload(self, changes, token=None):
+        return self.client.post(
+            reverse("sync_upload"),
+            {"token": token or self.token, "changes": changes},
+            content_type="application/json",
+        )
+
+    def test_snapshot_without_token(self):
+        """Test a first sync gets every row of the user's and nothing else."""
+        data = self._changes()
+        self.assertTrue(data["reset"])
+        self.assertEqual([g["id"] for g in data["games"]], [g.pk for g in self.games])
+        self.assertEqual(data["games"][0]["effective_fee"], "50.00")
+        self.assertEqual([s["name"] for s in data["sites"]], ["Test Site"])
+        self.assertEqual(len(data["leagues"]), 1)
+        self.assertTrue(data["token"].isdigit())
+
+    def test_delta_has_only_changes(self):
+        """Test a token brings only rows changed or deleted since."""
+        data = self._changes(self.token)
+        self.assertEqual((data["games"], data["sites"], data["leagues"]), ([], [], []))
+        self.assertEqual(data["deleted"], {"game": [], "site": [], "league": []})
+        toggled, deleted, _ = self.games
+        self.client.post(reverse("toggle_fee_paid", args=[toggled.pk]))
+        self.client.post(reverse("delete_game", args=[deleted.pk]))
+        data = self._changes(self.token)
+        self.assertFalse(data["reset"])
+        self.assertEqual([g["id"] for g in data["games"]], [toggled.pk])
+        self.assertTrue(data["games"][0]["fee_paid"])
+        self.assertEqual(data["deleted"]["game"], [deleted.pk])
+        self.assertEqual(self._changes(data["token"])["games"], [])
+
+    def test_bulk_updates_are_synced(self):
+        """Test mark-paid and league fee changes reach clients."""
+        first, second, third = self.games
+        mark_paid(Game.objects.filter(pk=first.pk))
+        self.league.game_fee = Decimal("60.00")
+        self.league.save()
+        data = self._changes(self.token)
+        fees = {g["id"]: (g["fee_paid"], g["effective_fee"]) for g in data["games"]}
+        self.assertEqual(
+            fees,
+            {
+                first.pk: (True, "60.00"),
+                second.pk: (False, "60.00"),
+                third.pk: (False, "60.00"),
+            },
+        )
+        self.assertEqual([league["game_fee"] for league in data["leagues"]], ["60.00"])
+
+    def test_old_or_bad_tokens(self):
+        """Test expired tokens get a snapshot and malformed ones a 400."""
+        old = make_token(timezone.now() - timedelta(days=365))
+        self.assertTrue(self._changes(old)["reset"])
+        response = self.client.get(reverse("sync_changes"), {"token": "abc"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_site_delete_leaves_tombstone(self):
+        """Test deleted shared rows are reported to every user."""
+        pk = self.site.pk
+        self.site.delete()
+        self.assertEqual(self._changes(self.token)["deleted"]["site"], [pk])
+        self.assertTrue(Tombstone.objects.filter(model="site", object_id=pk).exists())
+
+    def test_upload_applies_batch(self):
+        """Test creates, partial updates and deletes apply together."""
+        edited, deleted, _ = self.games
+        response = self._upload(
+            [
+                {
+                    "action": "create",
+                    "ref": "a",
+                    "fields": {
+                        "date": "2025-04-05",
+                        "site": self.site.pk,
+                        "league": self.league.pk,
+                    },
+                },
+                {"action": "update", "id": edited.pk, "fields": {"fee_paid": True}},
+                {"action": "update", "id": edited.pk, "fields": {"position": "R"}},
+                {"action": "delete", "id": deleted.pk},
+            ]
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        created = Game.objects.get(pk=data["created"]["a"])
+        self.assertEqual(created.user, self.user)
+        edited.refresh_from_db()
+        self.assertTrue(edited.fee_paid)
+        self.assertEqual(edited.position, "R")
+        self.assertEqual(edited.league, self.league)
+        self.assertFalse(Game.objects.filter(pk=deleted.pk).exists())
+        self.assertEqual({g["id"] for g in data["games"]}, {created.pk, edited.pk})
+        self.assertEqual(data["deleted"]["game"], [deleted.pk])
+
+    def test_conflict_rejects_whole_batch(self):
+        """Test editing a game changed since the client's token applies nothing."""
+        changed, other, _ = self.games
+        self.client.post(reverse("toggle_fee_paid", args=[changed.pk]))
+        response = self._upload(
+            [
+                {"action": "update", "id": other.pk, "fields": {"position": "U"}},
+                {"action": "update", "id": changed.pk, "fields": {"position": "R"}},
+            ]
+        )
+        self.assertEqual(response.status_code, 409)
+        conflict = response.json()["conflicts"][0]
+        self.assertEqual((conflict["index"], conflict["id"]), (1, changed.pk))
+        self.assertTrue(conflict["game"]["fee_paid"])
+        other.refresh_from_db()
+        self.assertIsNone(other.position)
+
+    def test_upload_rejects_invalid_changes(self):
+        """Test invalid edits and other users' games are refused."""
+        foreign = Game.objects.get(user=self.other)
+        response = self._upload(
+            [
+                {
+                    "action": "create",
+                    "ref": "a",
+                    "fields": {
+                        "date": "2025-04-05",
+                        "site": self.site.pk,
+                        "league": self.league.pk,
+                    },
+                },
+                {"action": "create", "fields": {"date": "not a date"}},
+            ]
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["errors"][0]["index"], 1)
+        self.assertEqual(Game.objects.filter(user=self.user).count(), 3)
+        response = self._upload([{"action": "delete", "id": foreign.pk}])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Game.objects.filter(pk=foreign.pk).exists())
+        response = self._upload(
+            [{"action": "update", "id": foreign.pk, "fields": {"position": "R"}}]
+        )
+        self.assertEqual(response.status_code, 409)
+        response = self._upload([], token="yesterday")
+        self.assertEqual(response.status_code, 400)
+
+    def test_upload_rejects_unhashable_id(self):
+        """Test an update or delete whose id is not an integer is a 400."""
+        response = self._upload(
+            [
+                {"action": "update", "id": [1], "fields": {"position": "R"}},
+                {"action": "delete", "id": {"pk": 1}},
+            ]
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()["errors"],
+            [
+                {"index": 0, "errors": {"id": ["Must be an integer."]}},
+                {"index": 1, "errors": {"id": ["Must be an integer."]}},
+            ],
+        )
+        self.assertEqual(Game.objects.filter(user=self.user).count(), 3)
+
+
+class ApiGamesTest(TestCase):
+    """Tests for the keyset-paginated games API."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.client.login(username="testuser", password="testpass123")
+        self.site = Site.objects.create(name="Test Site", address="1 Field Rd")
+        self.league = League.objects.create(
+            organization="Test League",
+            assignor="Test Assignor",
+            game_fee=Decimal("50.00"),
+        )
+        self.other_league = League.objects.create(
+            organization="Other League",
+            assignor="Other Assignor",
+            game_fee=Decimal("30.00"),
+        )
+        # Doubleheaders, so pages split between games on the same date
+        self.games = [
+            Game.objects.create(
+                user=self.user,
+                date=date(2024 + n % 2, 3, 1 + n // 2),
+                site=self.site,
+                league=self.league if n % 3 else self.other_league,
+                fee_paid=n % 4 == 0,
+            )
+            for n in range(10)
+        ]
+        self.games.sort(key=lambda game: (game.date, game.pk))
+
+    def _get(self, **params):
+        return self.client.get(reverse("api_games"), params)
+
+    def test_cursor_pages_through_every_game(self):
+        """Test following ``next`` returns each game once, in order."""
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 3}
+            if cursor:
+                params["cursor"] = cursor
+            data = self._get(**params).json()
+            self.assertLessEqual(len(data["results"]), 3)
+            seen += [row["id"] for row in data["results"]]
+            cursor = data["next"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, [game.pk for game in self.games])
+
+    def test_sparse_fields_skip_joins(self):
+        """Test only the requested fields are fetched and returned."""
+        with CaptureQueriesContext(connection) as queries:
+            data = self._get(fields="date,fee_paid").json()
+        self.assertEqual(set(data["results"][0]), {"date", "fee_paid"})
+        sql = queries[-1]["sql"]
+        self.assertNotIn("JOIN", sql)
+        self.assertNotIn("mileage", sql)
+        data = self._get(fields="league,effective_fee").json()
+        self.assertEqual(
+            data["results"][0],
+            {"league": "Other League", "effective_fee": "30.00"},
+        )
+
+    def test_filters_match_game_list(self):
+        """Test the game list's filter params select games."""
+        data = self._get(
+            filter_year="2024", filter_league="Test League", filter_paid="unpaid"
+        ).json()
+        expected = [
+            game.pk
+            for game in self.games
+            if game.date.year == 2024
+            and game.league == self.league
+            and not game.fee_paid
+        ]
+        self.assertEqual([row["id"] for row in data["results"]], expected)
+        self.assertEqual(len(self._get().json()["results"]), 10)
+
+    def test_unchanged_page_is_not_modified(self):
+        """Test a matching ETag gets a 304 until the user's games change."""
+        response = self._get(fields="id")
+        etag = response["ETag"]
+        with self.assertNumQueries(4):  # session, user, page version, game totals
+            response = self.client.get(
+                reverse("api_games"), {"fields": "id"}, HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(self._get(fields="date")["ETag"], etag)
+
+        self.games[0].delete()
+        response = self.client.get(
+            reverse("api_games"), {"fields": "id"}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), 9)
+
+    def test_etag_follows_rows_changed_elsewhere(self):
+        """Test rows written without any cache bump, as by another process,
+        still change the ETag."""
+        etag = self._get(fields="id,mileage")["ETag"]
+        Game.objects.filter(pk=self.games[0].pk).update(
+            mileage=12.5, updated_at=timezone.now()
+        )
+        response = self.client.get(
+            reverse("api_games"), {"fields": "id,mileage"}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["mileage"], 12.5)
+
+    def test_bad_params(self):
+        """Test unknown fields, bad cursors and limits get a 400."""
+        for params in (
+            {"fields": "date,password"},
+            {"cursor": "not-a-cursor"},
+            {"limit": "0"},
+            {"limit": "10000"},
+        ):
+            response = self._get(**params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn("error", response.json())
+
+
+class PartialListUpdateTest(TestCase):
+    """Tests for the game list's htmx actions re-rendering only changed months."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.client.login(username="testuser", password="testpass123")
+        self.site = Site.objects.create(name="Test Site", address="1 Field Rd")
+        self.league = League.objects.create(
+            organization="Test League",
+            assignor="Test Assignor",
+            game_fee=Decimal("50.00"),
+        )
+        self.games = [
+            Game.objects.create(
+                user=self.user,
+                date=date(2025, month, 1 + week * 7),
+                site=self.site,
+                league=self.league,
+                mileage=10.0,
+            )
+            for month in range(1, 7)
+            for week in range(2)
+        ]
+        self.query = "filter_year=2025&filter_paid=all"
+
+    def _summary(self):
+        """The game list's summary, computed in full."""
+        response = self.client.get(f"{reverse('game_list')}?{self.query}")
+        return response.context["summary"]
+
+    def _posted(self, summary):
+        return {f"summary_{key}": str(value) for key, value in summary.items()}
+
+    def _htmx(self, url_name, pk=None, data=None):
+        url = reverse(url_name, args=[pk] if pk else [])
+        return self.client.post(
+            f"{url}?{self.query}", data or {}, headers={"HX-Request": "true"}
+        )
+
+    def _game_data(self, game, **changes):
+        data = {
+            "date": game.date.isoformat(),
+            "site": game.site_id,
+            "league": game.league_id,
+            "position": game.position or "",
+            "mileage": game.mileage,
+        }
+        return {**data, **changes}
+
+    def test_toggle_swaps_its_month_and_summary(self):
+        """Test a fee toggle returns its month and a summary matching a full one."""
+        game = self.games[4]  # March
+        response = self._htmx("toggle_fee_paid", game.pk, self._posted(self._summary()))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["HX-Reswap"], "none")
+        content = response.content.decode()
+        self.assertIn('id="month-2025-03" hx-swap-oob="outerHTML"', content)
+        self.assertNotIn("month-2025-04", content)
+        self.assertIn('id="list-summary" class', content)
+        self.assertEqual(response.context["summary"], self._summary())
+        self.assertEqual(response.context["summary"]["paid_fees"], Decimal("50.00"))
+        game.refresh_from_db()
+        self.assertTrue(game.fee_paid)
+
+    def test_posted_summary_reads_only_changed_months(self):
+        """Test the summary comes from the changed month's games, not every game."""
+        posted = self._posted(self._summary())
+        with CaptureQueriesContext(connection) as queries:
+            self._htmx("toggle_fee_paid", self.games[0].pk, posted)
+        grouped = [q["sql"] for q in queries if "GROUP BY" in q["sql"]]
+        self.assertEqual(len(grouped), 2)  # before and after the toggle
+        for sql in grouped:
+            self.assertIn('"tracker_game"."date" >=', sql)
+
+    def test_missing_summary_is_recomputed(self):
+        """Test a request without the page's summary gets a full one."""
+        response = self._htmx("delete_game", self.games[0].pk)
+        self.assertIn('id="month-2025-01"', response.content.decode())
+        self.assertEqual(response.context["summary"], self._summary())
+        self.assertEqual(response.context["summary"]["count"], 11)
+
+    def test_create_and_invalid_create(self):
+        """Test an added game returns its month; an invalid one a 422."""
+        summary = self._summary()
+        data = {
+            **self._game_data(self.games[0], date="2025-08-09"),
+            **self._posted(summary),
+        }
+        response = self._htmx("game_list", data=data)
+        self.assertIn('id="month-2025-08" hx-swap-oob', response.content.decode())
+        self.assertEqual(response.context["summary"]["count"], summary["count"] + 1)
+        self.assertEqual(response.context["summary"], self._summary())
+
+        response = self._htmx("add_game", data={"date": "2025-08-09"})
+        self.assertEqual(response.status_code, 422)
+        self.assertIn("Site", response.content.decode())
+
+    def test_edit_row_and_move_between_months(self):
+        """Test an inline edit form, then a date change returning both months."""
+        game = self.games[0]
+        response = self.client.get(
+            f"{reverse('edit_game', args=[game.pk])}?{self.query}",
+            headers={"HX-Request": "true"},
+        )
+        self.assertTemplateUsed(response, "game/_edit_row.html")
+        self.assertContains(response, f'id="id_game{game.pk}_site"')
+
+        data = {
+            **self._game_data(game, date="2025-05-20"),
+            **self._posted(self._summary()),
+        }
+        response = self._htmx("edit_game", game.pk, data)
+        content = response.content.decode()
+        self.assertIn('id="month-2025-01" hx-swap-oob', content)
+        self.assertIn('id="month-2025-05" hx-swap-oob', content)
+        self.assertEqual(response.context["summary"], self._summary())
+
+    def test_game_month(self):
+        """Test one month's rows are served alone, and a bad month is a 400."""
+        response = self.client.get(
+            reverse("game_month"), {"month": "2025-02", "filter_paid": "all"}
+        )
+        self.assertContains(response, 'id="month-2025-02"')
+        self.assertContains(response, "(2 games)")
+        self.assertNotContains(response, "hx-swap-oob")
+        response = self.client.get(reverse("game_month"), {"month": "Feb"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_plain_requests_are_unchanged(self):
+        """Test requests without htmx still get JSON and redirects."""
+        game = self.games[0]
+        response = self.client.post(reverse("toggle_fee_paid", args=[game.pk]))
+        self.assertEqual(response.json(), {"fee_paid": True})
+        response = self.client.post(reverse("delete_game", args=[game.pk]))
+        self.assertRedirects(response, reverse("game_list"))
@@ -0,0 +1,166 @@
+from itertools import groupby
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+
+from tracker.models import Game, Profile, Trip
+from tracker.routes import MAX_ROUTE_STOPS, plan_route
+from tracker.stats import refresh_stats, stats_keys
+from tracker.utils import DistanceError, distance_matrix_miles
+
+
+def trip_key(game: Game) -> tuple:
+    """The (user_id, date) trip ``game`` is driven on."""
+    return (game.user_id, game.date)
+
+
+def trip_miles(legs) -> float:
+    """Home -> each site -> home mileage, driving to each of ``legs`` separately.
+
+    ``legs`` are one-way miles from home, one per site. For a single site
+    this is the planned route; for several it bounds the planned loop.
+    """
+    return round(2 * sum(legs), 1)
+
+
+def _origins(user_ids) -> dict[int, str]:
+    """Home address of each of ``user_ids``, or DEFAULT_ADDRESS if unset."""
+    profiles = Profile.objects.filter(user_id__in=user_ids)
+    origins = {p.user_id: p.full_address for p in profiles}
+    return {uid: origins.get(uid) or settings.DEFAULT_ADDRESS for uid in user_ids}
+
+
+def plan_day_route(origin: str, sites, fetch: bool):
+    """Shortest home -> ``sites`` -> home route as ``(ordered sites, miles)``.
+
+    Distances come from ``distance_matrix_miles`` (one request for all
+    pairs when ``fetch``). Returns None if a pair is unknown or the day has
+    more than MAX_ROUTE_STOPS sites. Raises DistanceError if the request
+    fails.
+    """
+    if len(sites) > MAX_ROUTE_STOPS:
+        return None
+    stops = [site.address for site in sites]
+    miles = distance_matrix_miles([origin, *stops], fetch=fetch)
+    try:
+        order, total = plan_route(origin, stops, miles)
+    except KeyError:
+        return None
+    return sorted(sites, key=lambda site: order.index(site.address)), total
+
+
+def trip_fields(origin: str, games, fetch: bool = False) -> dict:
+    """Trip field values for one user's ``games`` on one date.
+
+    Mileage is always the home -> sites -> home loop. A single-site day is
+    there and back along the longest game's leg. A day with several sites
+    is planned for the shortest loop; until every distance is known its
+    mileage is ``trip_miles`` of each site's leg and it is marked
+    ``route_pending`` for ``run_distance_worker``.
+    """
+    legs = {}
+    for game in games:
+        site, miles = legs.get(game.site_id, (game.site, 0))
+        legs[game.site_id] = (site, max(miles, game.mileage))
+    sites = sorted((site for site, _ in legs.values() if site), key=lambda s: s.name)
+    mileage = trip_miles([max((g.mileage for g in games), default=0)])
+    pending = False
+    if len(sites) > 1:
+        try:
+            planned = plan_day_route(origin, sites, fetch)
+        except DistanceError:
+            planned, pending = None, True
+        else:
+            pending = planned is None and not fetch
+        if planned is None:
+            mileage = trip_miles(miles for _, miles in legs.values())
+        else:
+            sites, mileage = planned
+    return {
+        "origin": origin,
+        "route": [site.pk for site in sites],
+        "route_pending": pending,
+        "mileage": mileage,
+        "mileage_paid": mileage > 0 and all(g.mileage_paid for g in games),
+        "game_count": len(games),
+    }
+
+
+def sync_trip(user_id: int, date, fetch: bool | None = None) -> list[Game]:
+    """Recompute one trip from its games and link them to it.
+
+    The trip is deleted once it has no games. ``fetch`` (default: not
+    DISTANCE_LOOKUP_ASYNC) lets route planning call the Maps API. Returns
+    the trip's games so callers can refresh whatever depends on their
+    share of its mileage.
+    """
+    if fetch is None:
+        fetch = not settings.DISTANCE_LOOKUP_ASYNC
+    games = list(
+        Game.objects.select_related("league", "site").filter(user_id=user_id, date=date)
+    )
+    if not games:
+        Trip.objects.filter(user_id=user_id, date=date).delete()
+        return games
+    trip, _ = Trip.objects.update_or_create(
+        user_id=user_id,
+        date=date,
+        defaults=trip_fields(_origins([user_id])[user_id], games, fetch),
+    )
+    stale = [g.pk for g in games if g.trip_id != trip.pk]
+    if stale:
+        Game.objects.filter(pk__in=stale).update(trip=trip)
+    for game in games:
+        game.trip = trip
+    return games
+
+
+def refresh_trips(trips, buckets: dict, fetch: bool | None = None) -> list[Game]:
+    """Sync ``trips`` then refresh the rollup ``buckets`` (user_id -> keys).
+
+    A trip's mileage is shared between its games, so every game on a synced
+    trip has its buckets refreshed too. Returns the synced trips' games.
+    """
+    games = []
+    for user_id, date in trips:
+        if user_id:
+            games += sync_trip(user_id, date, fetch)
+    for game in games:
+        buckets.setdefault(game.user_id, set()).update(stats_keys(game))
+    for user_id, keys in buckets.items():
+        if user_id:
+            refresh_stats(user_id, keys)
+    return games
+
+
+def rebuild_trips(user_ids=None) -> int:
+    """Recreate all trips, or only those of ``user_ids``. Returns trips written.
+
+    Used after writes that skip the Game signals: bulk imports and Site
+    deletes. Routes are planned from cached distances only; the rest are
+    left ``route_pending`` for the worker.
+    """
+    games = Game.objects.filter(user__isnull=False)
+    trips = Trip.objects.all()
+    if user_ids is not None:
+        games = games.filter(user_id__in=user_ids)
+        trips = trips.filter(user_id__in=user_ids)
+    trips.delete()
+    days = groupby(
+        games.select_related("site").order_by("user_id", "date").iterator(),
+        key=trip_key,
+    )
+    origins = _origins(set(games.values_list("user_id", flat=True)))
+    new_trips = []
+    for (user_id, date), day_games in days:
+        new_trips.append(
+            Trip(
+                user_id=user_id,
+                date=date,
+                **trip_fields(origins[user_id], list(day_games)),
+            )
+        )
+    created = Trip.objects.bulk_create(new_trips, batch_size=1000)
+    same_day = Trip.objects.filter(user_id=OuterRef("user_id"), date=OuterRef("date"))
+    games.update(trip=Subquery(same_day.values("pk")[:1]))
+    return len(created)
@@ -26,11 +26,21 @@ urlpatterns = [
     path("games/", views.game_list, name="game_list"),
     path("game/<int:pk>/", views.game_detail, name="game_detail"),
     path("add_game/", views.game_create, name="add_game"),
+    path("import_games/", views.import_games, name="import_games"),
+    path("record_payment/", views.record_payment, name="record_payment"),
     path("edit_game/<int:pk>/", views.edit_game, name="edit_game"),
     path("delete_game/<int:pk>/", views.delete_game, name="delete_game"),
     path("game/<int:pk>/toggle-paid/", views.toggle_fee_paid, name="toggle_fee_paid"),
+    path("games/mark-paid/", views.mark_paid, name="mark_paid"),
+    path("games/month/", views.game_month, name="game_month"),
     path("site_distance/", views.site_distance, name="site_distance"),
+    path("metrics/distance/", views.distance_metrics_view, name="distance_metrics"),
     path("stats/", views.game_stats, name="game_stats"),
+    path("export/games.csv", views.export_games, name="export_games"),
+    path("export/stats.csv", views.export_stats, name="export_stats"),
+    path("api/games/", views.api_games, name="api_games"),
+    path("api/sync/", views.sync_changes, name="sync_changes"),
+    path("api/sync/upload/", views.sync_upload, name="sync_upload"),
 ]
 
 urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
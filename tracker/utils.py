@@ -1,20 +1,198 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import timedelta
+
 import googlemaps
+import requests
 from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from tracker.models import DistanceCache
+from tracker.timing import measure
+
+logger = logging.getLogger(__name__)
 
 MI_PER_M = 1 / 1609.344
+# Distance Matrix limit on destinations per request
+MATRIX_MAX_DESTINATIONS = 25
 
 
 class DistanceError(Exception):
     pass
 
 
-def distance_miles(origin: str, destination: str) -> float:
-    """Driving distance in miles between two addresses. 0.0 on failure."""
-    try:
-        gmaps = googlemaps.Client(key=settings.MAPS_API_KEY)
-        res = gmaps.distance_matrix(origin, destination, mode="driving")  # type: ignore
-    except Exception as e:
-        raise DistanceError(f"API request failed: {e}")
+def normalize_address(address: str) -> str:
+    """Canonical form of an address, used as the distance cache key."""
+    address = re.sub(r"\s*,\s*", ", ", address.strip().lower())
+    return re.sub(r"\s+", " ", address).strip(", ")
+
+
+class DistanceLRU:
+    """Small thread-safe in-process LRU of (origin, destination) -> miles.
+
+    Entries expire after ``ttl`` seconds so that invalidations made by other
+    worker processes are picked up without a shared cache.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[tuple[str, str], tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple[str, str]) -> float | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            miles, expires = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return miles
+
+    def set(self, key: tuple[str, str], miles: float) -> None:
+        with self._lock:
+            self._data[key] = (miles, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def forget(self, address: str) -> None:
+        """Drop every entry with ``address`` (normalized) at either end."""
+        with self._lock:
+            for key in [k for k in self._data if address in k]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+distance_lru = DistanceLRU(
+    maxsize=settings.DISTANCE_LRU_SIZE, ttl=settings.DISTANCE_LRU_TTL
+)
+
+
+class DistanceMetrics:
+    """Thread-safe in-process counters for distance lookups."""
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counts[name] += n
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+
+distance_metrics = DistanceMetrics()
+
+
+class MapsClient:
+    """Process-wide googlemaps.Client with pooled connections and a breaker.
+
+    The underlying client (and its requests session) is created on first use
+    and shared by all threads. After ``MAPS_BREAKER_THRESHOLD`` consecutive
+    failed requests the breaker opens and calls raise DistanceError without
+    touching the network for ``MAPS_BREAKER_COOLDOWN`` seconds; the first
+    call after that is let through and closes the breaker if it succeeds.
+    """
+
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._open_until = 0.0
+
+    def _get_client(self) -> googlemaps.Client:
+        with self._lock:
+            if self._client is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_maxsize=settings.MAPS_POOL_SIZE)
+                session.mount("https://", adapter)
+                self._client = googlemaps.Client(
+                    key=settings.MAPS_API_KEY,
+                    connect_timeout=settings.MAPS_CONNECT_TIMEOUT,
+                    read_timeout=settings.MAPS_READ_TIMEOUT,
+                    retry_timeout=settings.MAPS_RETRY_TIMEOUT,
+                    requests_session=session,
+                )
+            return self._client
+
+    @property
+    def is_open(self) -> bool:
+        return time.monotonic() < self._open_until
+
+    def _call(self, method: str, *args, **kwargs):
+        if self.is_open:
+            distance_metrics.incr("api_short_circuit")
+            raise DistanceError("Maps API unavailable (circuit open)")
+        distance_metrics.incr("api_call")
+        try:
+            with measure("maps"):
+                res = getattr(self._get_client(), method)(*args, **kwargs)
+        except Exception as e:
+            self._record(ok=False)
+            raise DistanceError(f"API request failed: {e}")
+        self._record(ok=True)
+        return res
+
+    def distance_matrix(self, origins, destinations) -> dict:
+        """Driving distance matrix response from one address or a list of them.
+
+        Raises DistanceError on failure.
+        """
+        return self._call("distance_matrix", origins, destinations, mode="driving")
+
+    def geocode(self, address: str) -> list[dict]:
+        """Geocoding results for ``address``. Raises DistanceError on failure."""
+        return self._call("geocode", address)
+
+    def _record(self, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self._failures = 0
+                self._open_until = 0.0
+                return
+            distance_metrics.incr("api_failure")
+            self._failures += 1
+            if self._failures >= settings.MAPS_BREAKER_THRESHOLD:
+                self._open_until = time.monotonic() + settings.MAPS_BREAKER_COOLDOWN
+                logger.warning(
+                    "Maps API failed %d times in a row; pausing calls for %ss",
+                    self._failures,
+                    settings.MAPS_BREAKER_COOLDOWN,
+                )
+
+    def reset(self) -> None:
+        """Drop the shared client and close the breaker (e.g. after settings change)."""
+        with self._lock:
+            self._client = None
+            self._failures = 0
+            self._open_until = 0.0
+
+
+maps_client = MapsClient()
+
+
+def _fetch_distance_miles(origin: str, destination: str) -> float:
+    """Driving distance in miles from the Distance Matrix API."""
+    res = maps_client.distance_matrix(origin, destination)
 
     try:
         el = res["rows"][0]["elements"][0]
@@ -26,3 +204,187 @@ def distance_miles(origin: str, destination: str) -> float:
     meters = el["distance"]["value"]
     distance = meters * MI_PER_M
     return round(distance, 1)
+
+
+def _fetch_distance_row(origin: str, destinations: list[str]) -> list[dict]:
+    """Distance Matrix elements from ``origin`` to each destination, in order."""
+    res = maps_client.distance_matrix(origin, destinations)
+    try:
+        elements = res["rows"][0]["elements"]
+    except (KeyError, IndexError, TypeError) as e:
+        raise DistanceError(f"Malformed response: {e}")
+    if len(elements) != len(destinations):
+        raise DistanceError("Malformed response: element count mismatch")
+    return elements
+
+
+def cached_distance_miles(origin: str, destination: str) -> float | None:
+    """Driving distance from the LRU or DistanceCache table, or None on a miss.
+
+    Never calls the Maps API, so it is safe to use inside a request.
+    """
+    key = (normalize_address(origin), normalize_address(destination))
+    miles = distance_lru.get(key)
+    if miles is not None:
+        distance_metrics.incr("lru_hit")
+        return miles
+
+    fresh_since = timezone.now() - timedelta(days=settings.DISTANCE_CACHE_TTL)
+    miles = (
+        DistanceCache.objects.filter(
+            origin=key[0], destination=key[1], fetched_at__gte=fresh_since
+        )
+        .values_list("miles", flat=True)
+        .first()
+    )
+    if miles is None:
+        distance_metrics.incr("miss")
+    else:
+        distance_metrics.incr("db_hit")
+        distance_lru.set(key, miles)
+    return miles
+
+
+def distance_miles(origin: str, destination: str) -> float:
+    """Driving distance in miles between two addresses.
+
+    Looks in the in-process LRU, then the DistanceCache table, and only calls
+    the Maps API on a miss or when the stored entry is older than
+    ``DISTANCE_CACHE_TTL``. Raises DistanceError if the API call fails.
+    """
+    miles = cached_distance_miles(origin, destination)
+    if miles is None:
+        key = (normalize_address(origin), normalize_address(destination))
+        miles = _fetch_distance_miles(origin, destination)
+        DistanceCache.objects.update_or_create(
+            origin=key[0], destination=key[1], defaults={"miles": miles}
+        )
+        distance_lru.set(key, miles)
+    return miles
+
+
+def distance_miles_many(origin: str, destinations) -> dict[str, float]:
+    """Driving distances in miles from ``origin`` to each of ``destinations``.
+
+    Same cache layers as ``distance_miles``, but all misses are sent as one
+    Distance Matrix request per ``MATRIX_MAX_DESTINATIONS`` destinations and
+    the DistanceCache lookups and writes are batched. Destinations the API
+    cannot route are left out of the result. Raises DistanceError if a
+    request fails.
+    """
+    origin_key = normalize_address(origin)
+    by_key = {normalize_address(d): d for d in destinations}
+    found = {}
+    for key in by_key:
+        miles = distance_lru.get((origin_key, key))
+        if miles is not None:
+            found[key] = miles
+
+    fresh_since = timezone.now() - timedelta(days=settings.DISTANCE_CACHE_TTL)
+    cached = DistanceCache.objects.filter(
+        origin=origin_key,
+        destination__in=[key for key in by_key if key not in found],
+        fetched_at__gte=fresh_since,
+    ).values_list("destination", "miles")
+    distance_metrics.incr("lru_hit", len(found))
+    for key, miles in cached:
+        found[key] = miles
+        distance_lru.set((origin_key, key), miles)
+        distance_metrics.incr("db_hit")
+
+    missing = [key for key in by_key if key not in found]
+    distance_metrics.incr("miss", len(missing))
+    fetched = {}
+    for start in range(0, len(missing), MATRIX_MAX_DESTINATIONS):
+        batch = missing[start : start + MATRIX_MAX_DESTINATIONS]
+        elements = _fetch_distance_row(origin, [by_key[key] for key in batch])
+        for key, el in zip(batch, elements):
+            if el.get("status") == "OK":
+                fetched[key] = round(el["distance"]["value"] * MI_PER_M, 1)
+    if fetched:
+        DistanceCache.objects.bulk_create(
+            [
+                DistanceCache(origin=origin_key, destination=key, miles=miles)
+                for key, miles in fetched.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["origin", "destination"],
+            update_fields=["miles", "fetched_at"],
+        )
+        for key, miles in fetched.items():
+            distance_lru.set((origin_key, key), miles)
+    found.update(fetched)
+    return {by_key[key]: miles for key, miles in found.items()}
+
+
+def distance_matrix_miles(addresses, fetch: bool = True) -> dict:
+    """Driving miles between every ordered pair of ``addresses``.
+
+    Returns ``{(from_address, to_address): miles}``. Pairs are read from the
+    same cache layers as ``distance_miles``; with ``fetch`` the misses are
+    sent as a single Distance Matrix request (all addresses as origins and
+    destinations), otherwise they are left out, as are pairs the API cannot
+    route. Raises DistanceError if the request fails.
+    """
+    by_key = {normalize_address(a): a for a in addresses}
+    pairs = [(a, b) for a in by_key for b in by_key if a != b]
+    found = {}
+    for pair in pairs:
+        miles = distance_lru.get(pair)
+        if miles is not None:
+            found[pair] = miles
+    distance_metrics.incr("lru_hit", len(found))
+
+    fresh_since = timezone.now() - timedelta(days=settings.DISTANCE_CACHE_TTL)
+    cached = DistanceCache.objects.filter(
+        origin__in=list(by_key),
+        destination__in=list(by_key),
+        fetched_at__gte=fresh_since,
+    ).values_list("origin", "destination", "miles")
+    for origin, destination, miles in cached:
+        if (origin, destination) not in found:
+            found[origin, destination] = miles
+            distance_lru.set((origin, destination), miles)
+            distance_metrics.incr("db_hit")
+
+    missing = [pair for pair in pairs if pair not in found]
+    distance_metrics.incr("miss", len(missing))
+    if missing and fetch:
+        keys = sorted({key for pair in missing for key in pair})
+        res = maps_client.distance_matrix(
+            [by_key[key] for key in keys], [by_key[key] for key in keys]
+        )
+        try:
+            rows = [row["elements"] for row in res["rows"]]
+        except (KeyError, TypeError) as e:
+            raise DistanceError(f"Malformed response: {e}")
+        if len(rows) != len(keys) or any(len(row) != len(keys) for row in rows):
+            raise DistanceError("Malformed response: element count mismatch")
+        fetched = {}
+        for origin, row in zip(keys, rows):
+            for destination, el in zip(keys, row):
+                pair = (origin, destination)
+                if origin != destination and el.get("status") == "OK":
+                    fetched[pair] = round(el["distance"]["value"] * MI_PER_M, 1)
+        DistanceCache.objects.bulk_create(
+            [
+                DistanceCache(origin=origin, destination=destination, miles=miles)
+                for (origin, destination), miles in fetched.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["origin", "destination"],
+            update_fields=["miles", "fetched_at"],
+        )
+        for pair, miles in fetched.items():
+            distance_lru.set(pair, miles)
+        found.update(fetched)
+    return {(by_key[a], by_key[b]): miles for (a, b), miles in found.items()}
+
+
+def forget_address(address: str) -> None:
+    """Invalidate cached distances to or from ``address``."""
+    key = normalize_address(address)
+    if not key:
+        return
+    DistanceCache.objects.filter(Q(origin=key) | Q(destination=key)).delete()
+    distance_lru.forget(key)
@@ -1,18 +1,49 @@
-from datetime import date
+import csv
+import hashlib
+import io
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
 from itertools import groupby
 
+from django.conf import settings
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.db.models import Case, Count, DecimalField, F, Q, Sum, When
-from django.db.models.functions import ExtractYear
-from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.middleware.csrf import get_token
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.defaultfilters import pluralize
 from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.utils.safestring import mark_safe
 from django.views.decorators.http import require_POST
 
-from tracker.forms import GameForm, ProfileForm, UserForm
-from tracker.models import Game, Site
-from tracker.utils import DistanceError, distance_miles
+from tracker import api, exports, importers, page_cache, payments, sync
+from tracker.filters import GameFilters
+from tracker.forms import (
+    GameForm,
+    GameImportForm,
+    PaymentForm,
+    ProfileForm,
+    UserForm,
+)
+from tracker.geo import preview_site_miles
+from tracker.models import Game, StatsRollup
+from tracker.stats import STATS_DIMENSIONS, TRIP_MILEAGE_SHARE
+from tracker.utils import distance_metrics, maps_client, normalize_address
 
 
 def home(request):
@@ -54,119 +85,354 @@ def profile_edit(request):
     )
 
 
-@login_required
-def game_list(request: HttpRequest) -> HttpResponse:
-    form = GameForm(user=request.user)
-    if request.method == "POST":
-        form = GameForm(request.POST, user=request.user)
-        if form.is_valid():
-            form.save()
-            return redirect("game_list")
+MONTHS_PER_PAGE = 6
 
-    games = Game.objects.select_related("league", "site").filter(user=request.user)
-    current_year = str(date.today().year)
-
-    f_year = request.GET.get("filter_year", current_year)
-    f_league = request.GET.get("filter_league", "")
-    f_assignor = request.GET.get("filter_assignor", "")
-    f_position = request.GET.get("filter_position", "")
-    f_site = request.GET.get("filter_site", "")
-    f_paid = request.GET.get("filter_paid", "unpaid")
-
-    summary_qs = games
-    eff_fee = Case(
-        When(fee__isnull=False, then=F("fee")),
-        default=F("league__game_fee"),
-        output_field=DecimalField(max_digits=6, decimal_places=2),
-    )
-    summary = summary_qs.aggregate(
-        count=Count("id"),
-        total_fees=Sum(eff_fee),
-        paid_fees=Sum(eff_fee, filter=Q(fee_paid=True)),
-        unpaid_fees=Sum(eff_fee, filter=Q(fee_paid=False, is_volunteer=False)),
-        total_mileage=Sum("mileage"),
-    )
 
-    games_list = list(
-        summary_qs.annotate(eff_fee_val=eff_fee).order_by("date", "site__name")
+def _facet_rows(games):
+    """Totals for ``games`` grouped by month and every filterable field."""
+    return (
+        games.order_by()
+        .values(
+            "league__organization",
+            "league__assignor",
+            "position",
+            "site__name",
+            "fee_paid",
+            "is_volunteer",
+            month=TruncMonth("date"),
+        )
+        .annotate(
+            count=Count("id"),
+            total_fees=Sum("effective_fee"),
+            total_mileage=Sum(TRIP_MILEAGE_SHARE),
+        )
     )
+
+
+def _options(rows, key):
+    """Sorted distinct non-empty values of ``key`` across facet rows."""
+    return sorted({row[key] for row in rows if row[key]})
+
+
+def _summarize(rows):
+    """Game list summary metrics, totalled from facet rows."""
+    summary = dict(count=0, total_fees=0, paid_fees=0, unpaid_fees=0, total_mileage=0.0)
+    for row in rows:
+        fees = row["total_fees"] or 0
+        summary["count"] += row["count"]
+        summary["total_fees"] += fees
+        summary["total_mileage"] += row["total_mileage"] or 0
+        if row["fee_paid"]:
+            summary["paid_fees"] += fees
+        elif not row["is_volunteer"]:
+            summary["unpaid_fees"] += fees
+    return summary
+
+
+def _list_filters(params, rows) -> tuple[GameFilters, dict[str, list]]:
+    """Game list filters from ``params`` and the dropdown options in ``rows``."""
+    available = {
+        "year": sorted({row["month"].year for row in rows}, reverse=True),
+        "league": _options(rows, "league__organization"),
+        "assignor": _options(rows, "league__assignor"),
+        "position": _options(rows, "position"),
+        "site": _options(rows, "site__name"),
+    }
+    filters = GameFilters.from_query(params, default_year=str(date.today().year))
+    return filters.within(available), available
+
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _month_games(user, months):
+    """``user``'s games in ``months`` (each the first of a month)."""
+    in_months = Q()
+    for month in months:
+        in_months |= Q(date__gte=month, date__lt=_next_month(month))
+    return Game.objects.filter(in_months, user=user)
+
+
+@dataclass(slots=True)
+class GameRow:
+    """The fields of a game (and its league, site and trip) the game list shows."""
+
+    id: int
+    date: date
+    league: str | None
+    assignor: str | None
+    position: str | None
+    site_id: int | None
+    site: str | None
+    effective_fee: Decimal | None
+    fee_paid: bool
+    is_volunteer: bool
+    mileage_pending: bool
+    trip_mileage: float | None
+    trip_mileage_paid: bool | None
+    trip_route: list | None
+
+
+# The column or lookup behind each GameRow field, in field order
+GAME_ROW_COLUMNS = (
+    "id",
+    "date",
+    "league__organization",
+    "league__assignor",
+    "position",
+    "site_id",
+    "site__name",
+    "effective_fee",
+    "fee_paid",
+    "is_volunteer",
+    "mileage_pending",
+    "trip__mileage",
+    "trip__mileage_paid",
+    "trip__route",
+)
+
+
+def game_rows(games):
+    """``games`` as GameRows, built as the rows stream in, not Game instances."""
+    for row in games.values_list(*GAME_ROW_COLUMNS).iterator():
+        yield GameRow(*row)
+
+
+def _group_by_month(rows):
+    """Group GameRows (ordered by date, site) into months and day trips."""
     games_by_month = []
     for month_label, month_group in groupby(
-        games_list, key=lambda g: g.date.strftime("%B %Y")
+        rows, key=lambda g: g.date.strftime("%B %Y")
     ):
         month_games = list(month_group)
-        date_site_groups = []
-        for (gdate, sid), ds_iter in groupby(
-            month_games, key=lambda g: (g.date, g.site_id)
-        ):
-            ds_games = list(ds_iter)
-            site_name = ds_games[0].site.name if ds_games[0].site else ""
-            trip_mileage = max((g.mileage for g in ds_games), default=0)
-            trip_mileage_paid = trip_mileage > 0 and all(
-                g.mileage_paid for g in ds_games
-            )
-            date_site_groups.append(
-                (gdate, site_name, trip_mileage, trip_mileage_paid, ds_games)
+        trip_groups = []
+        for gdate, trip_iter in groupby(month_games, key=lambda g: g.date):
+            trip_games = list(trip_iter)
+            first = trip_games[0]
+            names = {g.site_id: g.site for g in trip_games if g.site_id}
+            route = first.trip_route or []
+            stops = [names[pk] for pk in route if pk in names] or list(names.values())
+            trip_groups.append(
+                (
+                    gdate,
+                    " → ".join(dict.fromkeys(stops)),
+                    first.trip_mileage or 0.0,
+                    bool(first.trip_mileage_paid),
+                    trip_games,
+                )
             )
-        games_by_month.append((month_label, date_site_groups, len(month_games)))
-    expand_month = (
-        games_by_month[-1][0] if games_by_month else date.today().strftime("%B %Y")
-    )
+        games_by_month.append((month_label, trip_groups, len(month_games)))
+    return games_by_month
+
+
+def _is_htmx(request: HttpRequest) -> bool:
+    return request.headers.get("HX-Request") == "true"
 
-    available_years = list(
-        games.annotate(year=ExtractYear("date"))
-        .values_list("year", flat=True)
-        .distinct()
-        .order_by("-year")
-    )
-    available_leagues = list(
-        games.filter(league__isnull=False)
-        .values_list("league__organization", flat=True)
-        .distinct()
-        .order_by("league__organization")
-    )
-    available_assignors = list(
-        games.filter(league__isnull=False)
-        .values_list("league__assignor", flat=True)
-        .distinct()
-        .order_by("league__assignor")
-    )
-    available_positions = list(
-        games.filter(position__isnull=False)
-        .exclude(position="")
-        .values_list("position", flat=True)
-        .distinct()
-        .order_by("position")
-    )
-    available_sites = list(
-        games.filter(site__isnull=False)
-        .values_list("site__name", flat=True)
-        .distinct()
-        .order_by("site__name")
-    )
 
+def _month_blocks(user, filters: GameFilters, months) -> list[dict]:
+    """Template context for each of ``months``' rows of the game list."""
+    if not months:
+        return []
+    games = filters.apply(_month_games(user, months))
+    grouped = {
+        month_label: (date_site_groups, month_count)
+        for month_label, date_site_groups, month_count in _group_by_month(
+            game_rows(games.order_by("date", "site__name"))
+        )
+    }
+    blocks = []
+    for month in months:
+        date_site_groups, month_count = grouped.get(f"{month:%B %Y}", ([], 0))
+        blocks.append(
+            {
+                "month_key": f"{month:%Y-%m}",
+                "month_label": f"{month:%B %Y}",
+                "date_site_groups": date_site_groups,
+                "month_count": month_count,
+                "expand": True,
+                "filter_query": filters.querystring(),
+            }
+        )
+    return blocks
+
+
+def _posted_summary(data) -> dict | None:
+    """The game list summary a page sent along as ``summary_*`` fields."""
+    try:
+        return {
+            "count": int(data["summary_count"]),
+            "total_fees": Decimal(data["summary_total_fees"]),
+            "paid_fees": Decimal(data["summary_paid_fees"]),
+            "unpaid_fees": Decimal(data["summary_unpaid_fees"]),
+            "total_mileage": float(data["summary_total_mileage"]),
+        }
+    except (KeyError, ValueError, ArithmeticError):
+        return None
+
+
+def _list_update(request: HttpRequest, days, change) -> HttpResponse:
+    """Run ``change`` and answer htmx with just the game list months it touched.
+
+    The response swaps in the blocks of the months of ``days`` and the
+    summary, out of band. The summary is the page's own (``summary_*``)
+    moved by how much those months' totals changed, so no other month's
+    games are read; without it, it is recomputed over every game.
+    """
+    user = request.user
+    filters = GameFilters.from_query(request.GET)
+    months = sorted({day.replace(day=1) for day in days}, reverse=True)
+
+    def month_summary():
+        rows = _facet_rows(_month_games(user, months))
+        return _summarize(row for row in rows if filters.matches(row))
+
+    summary = _posted_summary(request.POST)
+    if summary is None:
+        change()
+        rows = _facet_rows(Game.objects.filter(user=user))
+        summary = _summarize(row for row in rows if filters.matches(row))
+    else:
+        before = month_summary()
+        change()
+        after = month_summary()
+        summary = {key: summary[key] + after[key] - before[key] for key in summary}
+    context = {"blocks": _month_blocks(user, filters, months), "summary": summary}
+    response = render(request, "game/_list_update.html", context)
+    response["HX-Reswap"] = "none"
+    return response
+
+
+def _create_game(request: HttpRequest, form: GameForm) -> HttpResponse:
+    """Save a valid new game: htmx gets its month, other requests a redirect."""
+    if _is_htmx(request):
+        return _list_update(request, [form.cleaned_data["date"]], form.save)
+    form.save()
+    return redirect("game_list")
+
+
+def _form_errors(form: GameForm) -> HttpResponse:
+    """A new game's validation errors as text, for htmx to show."""
+    lines = [
+        f"{form.fields[name].label if name in form.fields else 'Game'}: {error}"
+        for name, errors in form.errors.items()
+        for error in errors
+    ]
+    return HttpResponse("\n".join(lines), status=422, content_type="text/plain")
+
+
+@login_required
+def game_list(request: HttpRequest) -> HttpResponse:
+    form = GameForm(user=request.user)
+    if request.method == "POST":
+        form = GameForm(request.POST, user=request.user)
+        if form.is_valid():
+            return _create_game(request, form)
+        if _is_htmx(request):
+            return _form_errors(form)
+
+    # Served from the cache until this user's games, leagues or sites change
+    variant = f"{request.GET.urlencode()}|{date.today()}"
+    context = page_cache.cached_page(
+        request.user.pk,
+        "game_list",
+        variant,
+        lambda: _game_list_context(request.user, request.GET),
+    )
+    month_fragments, games_by_month = _month_fragments(request, context)
     context = {
+        **context,
+        "month_fragments": month_fragments,
         "games_by_month": games_by_month,
-        "expand_month": expand_month,
         "title": "Game List",
         "form": form,
-        "summary": summary,
-        "current_year": current_year,
-        "f_year": f_year,
-        "f_league": f_league,
-        "f_assignor": f_assignor,
-        "f_position": f_position,
-        "f_site": f_site,
-        "f_paid": f_paid,
-        "available_years": available_years,
-        "available_leagues": available_leagues,
-        "available_assignors": available_assignors,
-        "available_positions": available_positions,
-        "available_sites": available_sites,
+        "site_miles": _site_miles(request.user),
     }
     return render(request, "game/list.html", context)
 
 
+# Stands in for the CSRF token in cached month blocks, which outlive it
+CSRF_PLACEHOLDER = "csrf-token-placeholder"
+
+
+def _month_fragments(request: HttpRequest, context: dict) -> tuple[list, list]:
+    """Rendered month blocks of a game list page, cached per month.
+
+    A month's block is rendered again only after one of its games changes
+    (or anything wider, like a league's name), so past months are served
+    from the cache. Returns the blocks in page order and, as
+    ``_group_by_month`` gives them, the months that had to be rendered.
+    """
+    filters = context["filters"]
+    expand_month = context["expand_month"]
+    rendered = []
+
+    def render_months(months):
+        fragments = {}
+        for month, block in zip(months, _month_blocks(request.user, filters, months)):
+            block["expand"] = block["month_label"] == expand_month
+            rendered.append(
+                (block["month_label"], block["date_site_groups"], block["month_count"])
+            )
+            block["csrf_token"] = CSRF_PLACEHOLDER
+            fragments[month] = render_to_string("game/_month.html", block)
+        return fragments
+
+    variants = {
+        month: f"{filters.querystring()}|{f'{month:%B %Y}' == expand_month}"
+        for month in context["page_months"]
+    }
+    fragments = page_cache.cached_months(
+        request.user.pk, "game_list_month", variants, render_months
+    )
+    token = get_token(request)
+    month_fragments = [
+        mark_safe(fragments[month].replace(CSRF_PLACEHOLDER, token))
+        for month in context["page_months"]
+    ]
+    return month_fragments, rendered
+
+
+def _game_list_context(user, params) -> dict:
+    """The game list's months, summary and filter options for ``params``."""
+    games = Game.objects.select_related("league", "site").filter(user=user)
+
+    # One grouped scan yields the dropdown options, the summary and the months
+    rows = list(_facet_rows(games))
+    filters, available = _list_filters(params, rows)
+    matching = [row for row in rows if filters.matches(row)]
+    summary = _summarize(matching)
+
+    # Page through months newest-first so only the visible slice is fetched
+    months = Paginator(
+        sorted({row["month"] for row in matching}, reverse=True), MONTHS_PER_PAGE
+    ).get_page(params.get("page"))
+    # Oldest first on the page; their rows come from _month_fragments
+    page_months = sorted(months.object_list)
+    expand_month = f"{page_months[-1] if page_months else date.today():%B %Y}"
+
+    return {
+        "filters": filters,
+        "page_months": page_months,
+        "expand_month": expand_month,
+        "months_page": months,
+        "filter_query": filters.querystring(),
+        "summary": summary,
+        "current_year": str(date.today().year),
+        "f_year": filters.year,
+        "f_league": filters.league,
+        "f_assignor": filters.assignor,
+        "f_position": filters.position,
+        "f_site": filters.site,
+        "f_paid": filters.paid,
+        "available_years": available["year"],
+        "available_leagues": available["league"],
+        "available_assignors": available["assignor"],
+        "available_positions": available["position"],
+        "available_sites": available["site"],
+    }
+
+
 @login_required
 def game_detail(request: HttpRequest, pk: int) -> HttpResponse:
     game = get_object_or_404(Game, pk=pk, user=request.user)
@@ -179,22 +445,101 @@ def game_create(request: HttpRequest) -> HttpResponse:
     if request.method == "POST":
         form = GameForm(request.POST, user=request.user)
         if form.is_valid():
-            form.save()
-            return redirect("game_list")
-    context = {"form": form, "title": "Add Game"}
+            return _create_game(request, form)
+        if _is_htmx(request):
+            return _form_errors(form)
+    context = {
+        "form": form,
+        "title": "Add Game",
+        "site_miles": _site_miles(request.user),
+    }
     return render(request, "game/add.html", context)
 
 
+@login_required
+def import_games(request: HttpRequest) -> HttpResponse:
+    form = GameImportForm()
+    if request.method == "POST":
+        form = GameImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data["file"]
+            lines = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+            rows = importers.parse_games(lines, importers.detect_format(upload.name))
+            try:
+                with transaction.atomic():
+                    result = importers.import_games(request.user, rows)
+            except UnicodeDecodeError:
+                messages.error(request, "The file must be UTF-8 encoded text.")
+                return redirect("import_games")
+            except csv.Error as e:
+                messages.error(request, f"Could not read this CSV file: {e}.")
+                return redirect("import_games")
+            messages.success(
+                request,
+                f"Imported {result.created} games"
+                f" ({result.duplicates} already on your schedule).",
+            )
+            for error in result.errors[:10]:
+                messages.error(request, error)
+            if len(result.errors) > 10:
+                messages.error(request, f"...and {len(result.errors) - 10} more.")
+            return redirect("game_list")
+    context = {"form": form, "title": "Import Games"}
+    return render(request, "game/import.html", context)
+
+
+@login_required
+def record_payment(request: HttpRequest) -> HttpResponse:
+    """Record a deposit and mark paid the unpaid games it covers."""
+    form = PaymentForm(initial={"date": date.today()})
+    if request.method == "POST":
+        form = PaymentForm(request.POST)
+        if form.is_valid():
+            payment = form.save(commit=False)
+            payment.user = request.user
+            payment.save()
+            matched = payments.reconcile(payment)
+            total = sum((game.effective_fee for game in matched), Decimal("0"))
+            messages.success(
+                request,
+                f"Matched {len(matched)} game{pluralize(len(matched))}"
+                f" totalling ${total:,.2f} to the ${payment.amount:,.2f} payment.",
+            )
+            if total != payment.amount:
+                messages.warning(
+                    request,
+                    f"${payment.amount - total:,.2f} could not be matched"
+                    " to unpaid games.",
+                )
+            return redirect("game_list")
+    context = {"form": form, "title": "Record Payment"}
+    return render(request, "game/payment.html", context)
+
+
 @login_required
 def edit_game(request: HttpRequest, pk: int) -> HttpResponse:
+    """Edit a game on its own page, or inline in the game list via htmx."""
     game = get_object_or_404(Game, pk=pk, user=request.user)
+    old_date = game.date
     if request.method == "POST":
         form = GameForm(request.POST, instance=game, user=request.user)
         if form.is_valid():
+            if _is_htmx(request):
+                return _list_update(request, [old_date, game.date], form.save)
             form.save()
             return redirect("game_list")
     else:
         form = GameForm(instance=game, user=request.user)
+    if _is_htmx(request):
+        # the row sits beside the Add Game form, so keep its field ids apart
+        form.auto_id = f"id_game{game.pk}_%s"
+        context = {
+            "form": form,
+            "game": game,
+            "month_key": f"{old_date:%Y-%m}",
+            "filter_query": GameFilters.from_query(request.GET).querystring(),
+        }
+        return render(request, "game/_edit_row.html", context)
     context = {"form": form, "title": "Edit Game"}
     return render(request, "game/edit.html", context)
 
@@ -208,6 +553,8 @@ def delete_game(request: HttpRequest, pk: int) -> HttpResponse:
     """
     game = get_object_or_404(Game, pk=pk, user=request.user)
     if request.method == "POST":
+        if _is_htmx(request):
+            return _list_update(request, [game.date], game.delete)
         game.delete()
         return redirect("game_list")
     context = {"game": game, "title": "Delete Game"}
@@ -216,73 +563,228 @@ def delete_game(request: HttpRequest, pk: int) -> HttpResponse:
 
 @login_required
 @require_POST
-def toggle_fee_paid(request: HttpRequest, pk: int) -> JsonResponse:
+def toggle_fee_paid(request: HttpRequest, pk: int) -> HttpResponse:
     game = get_object_or_404(Game, pk=pk, user=request.user)
-    game.fee_paid = not game.fee_paid
-    game.save(update_fields=["fee_paid"])
+
+    def toggle():
+        game.fee_paid = not game.fee_paid
+        game.save(update_fields=["fee_paid"])
+
+    if _is_htmx(request):
+        return _list_update(request, [game.date], toggle)
+    toggle()
     return JsonResponse({"fee_paid": game.fee_paid})
 
 
+@login_required
+def game_month(request: HttpRequest) -> HttpResponse:
+    """One month's rows of the game list (``month`` YYYY-MM, ``filter_*``)."""
+    try:
+        month = datetime.strptime(request.GET.get("month", ""), "%Y-%m").date()
+    except ValueError:
+        return HttpResponse("Month must be YYYY-MM.", status=400)
+    filters = GameFilters.from_query(request.GET)
+    context = _month_blocks(request.user, filters, [month])[0]
+    return render(request, "game/_month.html", context)
+
+
+@login_required
+@require_POST
+def mark_paid(request: HttpRequest) -> JsonResponse:
+    """Mark a selection, month, league or assignor of games paid at once.
+
+    ``game`` (repeatable), ``month`` (YYYY-MM), ``league`` and ``assignor``
+    choose the games, combined; ``paid`` (repeatable: fee, mileage) says
+    what to mark. Returns the games changed per field and the game list
+    summary for the ``filter_*`` params sent along.
+    """
+    games = Game.objects.filter(user=request.user)
+    scoped = False
+    if "game" in request.POST:
+        ids = request.POST.getlist("game")
+        if not all(pk.isdigit() for pk in ids):
+            return JsonResponse({"error": "Invalid game id."}, status=400)
+        games, scoped = games.filter(pk__in=ids), True
+    if request.POST.get("month"):
+        try:
+            month = datetime.strptime(request.POST["month"], "%Y-%m").date()
+        except ValueError:
+            return JsonResponse({"error": "Month must be YYYY-MM."}, status=400)
+        games = games.filter(date__year=month.year, date__month=month.month)
+        scoped = True
+    for param, lookup in (
+        ("league", "league__organization"),
+        ("assignor", "league__assignor"),
+    ):
+        if request.POST.get(param):
+            games, scoped = games.filter(**{lookup: request.POST[param]}), True
+    paid = set(request.POST.getlist("paid", ["fee"]))
+    if not scoped or not paid or not paid <= {"fee", "mileage"}:
+        return JsonResponse(
+            {"error": "Choose games and what to mark paid (fee, mileage)."},
+            status=400,
+        )
+    changed = payments.mark_paid(games, fees="fee" in paid, mileage="mileage" in paid)
+    rows = list(_facet_rows(Game.objects.filter(user=request.user)))
+    filters, _ = _list_filters(request.POST, rows)
+    summary = _summarize(row for row in rows if filters.matches(row))
+    return JsonResponse({"updated": changed, "summary": summary})
+
+
 @login_required
 def game_stats(request: HttpRequest) -> HttpResponse:
-    base_qs = Game.objects.filter(user=request.user)
-    eff_fee = Case(
-        When(fee__isnull=False, then=F("fee")),
-        default=F("league__game_fee"),
-        output_field=DecimalField(max_digits=6, decimal_places=2),
-    )
-    stat_annotations = dict(
-        count=Count("id"),
-        total_fees=Sum(eff_fee),
-        paid_fees=Sum(eff_fee, filter=Q(fee_paid=True)),
-        unpaid_fees=Sum(eff_fee, filter=Q(fee_paid=False, is_volunteer=False)),
-        total_mileage=Sum("mileage"),
-    )
-    by_year = (
-        base_qs.annotate(year=ExtractYear("date"))
-        .values("year")
-        .annotate(**stat_annotations)
-        .order_by("-year")
-    )
-    by_league = (
-        base_qs.values("league__organization")
-        .annotate(**stat_annotations)
-        .order_by("league__organization")
-    )
-    by_assignor = (
-        base_qs.values("league__assignor")
-        .annotate(**stat_annotations)
-        .order_by("league__assignor")
-    )
-    by_position = (
-        base_qs.values("position").annotate(**stat_annotations).order_by("position")
-    )
-    by_site = (
-        base_qs.values("site__name").annotate(**stat_annotations).order_by("site__name")
+    by_dimension = page_cache.cached_page(
+        request.user.pk, "game_stats", "", lambda: _stats_by_dimension(request.user)
     )
     context = {
         "title": "Stats",
-        "by_year": by_year,
-        "by_league": by_league,
-        "by_assignor": by_assignor,
-        "by_position": by_position,
-        "by_site": by_site,
+        "by_year": by_dimension["year"],
+        "by_league": by_dimension["league"],
+        "by_assignor": by_dimension["assignor"],
+        "by_position": by_dimension["position"],
+        "by_site": by_dimension["site"],
     }
     return render(request, "game/stats.html", context)
 
 
+def _stats_by_dimension(user) -> dict[str, list[StatsRollup]]:
+    """``user``'s rollup rows for each stats dimension, in display order."""
+    # Totals are maintained in StatsRollup by tracker.signals
+    by_dimension = {dimension: [] for dimension in STATS_DIMENSIONS}
+    for row in StatsRollup.objects.filter(user=user).order_by("key"):
+        by_dimension[row.dimension].append(row)
+    by_dimension["year"].reverse()
+    return by_dimension
+
+
+def _csv_download(rows, filename: str) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(exports.stream_csv(rows), content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
 @login_required
-def site_distance(request):
-    site_id = request.GET.get("site")
-    miles = 0
-    if site_id and request.user.profile.location:
+def export_games(request: HttpRequest) -> StreamingHttpResponse:
+    # Same filter params as game_list, but every year and paid state by default
+    filters = GameFilters.from_query(request.GET, default_paid="all")
+    games = filters.apply(Game.objects.filter(user=request.user))
+    filename = f"games-{filters.year or 'all'}.csv"
+    return _csv_download(exports.game_export_rows(games), filename)
+
+
+@login_required
+def export_stats(request: HttpRequest) -> StreamingHttpResponse:
+    return _csv_download(exports.stats_export_rows(request.user), "stats.csv")
+
+
+@staff_member_required
+def distance_metrics_view(request: HttpRequest) -> JsonResponse:
+    """Distance lookup counters and breaker state for this worker process."""
+    return JsonResponse(
+        {"counts": distance_metrics.snapshot(), "circuit_open": maps_client.is_open}
+    )
+
+
+def _site_miles(user) -> dict[int, float]:
+    """Preview miles from ``user``'s home to every site, by site pk.
+
+    Cached per user and home address for DISTANCE_PREVIEW_TTL seconds, so a
+    changed address starts a fresh map.
+    """
+    origin = settings.DEFAULT_ADDRESS
+    if hasattr(user, "profile") and user.profile.full_address:
+        origin = user.profile.full_address
+    digest = hashlib.md5(normalize_address(origin).encode()).hexdigest()
+    key = f"site_miles:{user.pk}:{digest}"
+    miles = cache.get(key)
+    if miles is None:
+        miles = preview_site_miles(origin)
+        cache.set(key, miles, settings.DISTANCE_PREVIEW_TTL)
+    return miles
+
+
+@login_required
+def site_distance(request: HttpRequest) -> HttpResponse:
+    """Preview miles to one site as JSON, for sites missing from the page's map."""
+    site_id = request.GET.get("site", "")
+    miles = _site_miles(request.user).get(int(site_id)) if site_id.isdigit() else None
+    response = JsonResponse({"site": site_id, "miles": miles})
+    etag = quote_etag(hashlib.md5(response.content).hexdigest())
+    response = get_conditional_response(request, etag=etag, response=response)
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, max_age=settings.DISTANCE_PREVIEW_TTL)
+    return response
+
+
+@login_required
+def sync_changes(request: HttpRequest) -> JsonResponse:
+    """Games, sites and leagues changed since the ``token`` param, as JSON.
+
+    Omit ``token`` for a full snapshot. Deleted rows are listed by id under
+    ``deleted``; the response's ``token`` is the one to present next.
+    """
+    try:
+        payload = sync.changes(request.user, request.GET.get("token") or None)
+    except sync.InvalidToken:
+        return JsonResponse({"error": "Invalid token."}, status=400)
+    return JsonResponse(payload)
+
+
+@login_required
+@require_POST
+def sync_upload(request: HttpRequest) -> JsonResponse:
+    """Apply a batch of offline game edits sent as JSON, all or nothing.
+
+    The body is ``{"token": ..., "changes": [...]}`` with the token of the
+    client's last sync. Conflicting edits (409) or invalid ones (400) are
+    listed by index and nothing is applied; otherwise the response holds
+    the ids of created games under ``created`` and everything changed since
+    the token, as ``sync_changes`` would return it.
+    """
+    try:
+        body = json.loads(request.body)
+        token = body["token"]
+        since = sync.read_token(token)
+        changes = body["changes"]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse(
+            {"error": 'Send {"token": ..., "changes": [...]} as JSON.'}, status=400
+        )
+    if not isinstance(changes, list) or len(changes) > sync.MAX_UPLOAD_CHANGES:
+        return JsonResponse(
+            {"error": f"Send a list of at most {sync.MAX_UPLOAD_CHANGES} changes."},
+            status=400,
+        )
+    result = sync.apply_changes(request.user, since, changes)
+    if result.conflicts:
+        return JsonResponse(
+            {"conflicts": result.conflicts, "errors": result.errors}, status=409
+        )
+    if result.errors:
+        return JsonResponse({"errors": result.errors}, status=400)
+    payload = sync.changes(request.user, token)
+    return JsonResponse({"created": result.created, **payload})
+
+
+@login_required
+def api_games(request: HttpRequest) -> JsonResponse:
+    """A page of the user's games as JSON; see ``api.game_page`` for params.
+
+    The ETag is built from the matching games' count and latest
+    ``updated_at``, read from the database, plus the user's page version
+    for renamed leagues and sites. A client revalidating a page nothing has
+    changed gets a 304 without the games themselves being read.
+    """
+    version = page_cache.page_version(request.user.pk)
+    state = api.games_state(request.user, request.GET)
+    key = f"{request.user.pk}:{version}:{state}:{request.GET.urlencode()}"
+    etag = quote_etag(hashlib.md5(key.encode()).hexdigest())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
         try:
-            site = Site.objects.get(pk=site_id)
-            miles = distance_miles(request.user.profile.location, site.address)
-        except DistanceError:
-            miles = 0
-
-    form = GameForm()  # empty form just for rendering the field
-    form.fields["mileage"].initial = miles
-    html = render_to_string("game/_mileage_field.html", {"form": form}, request)
-    return HttpResponse(html)
+            response = JsonResponse(api.game_page(request.user, request.GET))
+        except api.InvalidQuery as e:
+            return JsonResponse({"error": str(e)}, status=400)
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response